@@ -4,6 +4,7 @@ setup_logging()
 
 from browser_use.agent.prompts import SystemPrompt as SystemPrompt
 from browser_use.agent.service import Agent as Agent
+from browser_use.agent.trajectory_cache.service import TrajectoryCache as TrajectoryCache
 from browser_use.agent.views import ActionModel as ActionModel
 from browser_use.agent.views import ActionResult as ActionResult
 from browser_use.agent.views import AgentHistoryList as AgentHistoryList
@@ -23,5 +24,6 @@ __all__ = [
 	'ActionResult',
 	'ActionModel',
 	'AgentHistoryList',
+	'TrajectoryCache',
 	'BrowserContextConfig',
 ]
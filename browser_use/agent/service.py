@@ -23,7 +23,7 @@ from langchain_core.messages import (
 )
 
 # from lmnr.sdk.decorators import observe
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from browser_use.agent.gif import create_history_gif
 from browser_use.agent.memory.service import Memory
@@ -37,6 +37,7 @@ from browser_use.agent.message_manager.utils import (
 	save_conversation,
 )
 from browser_use.agent.prompts import AgentMessagePrompt, PlannerPrompt, SystemPrompt
+from browser_use.agent.trajectory_cache.service import TrajectoryCache, is_task_independent
 from browser_use.agent.views import (
 	REQUIRED_LLM_API_ENV_VARS,
 	ActionResult,
@@ -136,6 +137,7 @@ class Agent(Generic[Context]):
 		validate_output: bool = False,
 		message_context: str | None = None,
 		generate_gif: bool | str = False,
+		capture_screenshots: bool | None = None,
 		available_file_paths: list[str] | None = None,
 		include_attributes: list[str] = [
 			'title',
@@ -164,6 +166,8 @@ class Agent(Generic[Context]):
 		source: str | None = None,
 		history_file: str | None = None,
 		history_task: str | None = None,
+		replay_match_threshold: float = 0.8,
+		trajectory_cache: TrajectoryCache | None = None,
 	):
 		if page_extraction_llm is None:
 			page_extraction_llm = llm
@@ -187,6 +191,7 @@ class Agent(Generic[Context]):
 			validate_output=validate_output,
 			message_context=message_context,
 			generate_gif=generate_gif,
+			capture_screenshots=capture_screenshots,
 			available_file_paths=available_file_paths,
 			include_attributes=include_attributes,
 			max_actions_per_step=max_actions_per_step,
@@ -197,8 +202,12 @@ class Agent(Generic[Context]):
 			is_planner_reasoning=is_planner_reasoning,
 			save_playwright_script_path=save_playwright_script_path,
 			extend_planner_system_message=extend_planner_system_message,
+			replay_match_threshold=replay_match_threshold,
 		)
 
+		# Model outputs that succeeded in earlier runs, replayed instead of calling the LLM
+		self.trajectory_cache = trajectory_cache
+
 		# Memory settings
 		self.enable_memory = enable_memory
 		self.memory_config = memory_config
@@ -454,10 +463,19 @@ class Agent(Generic[Context]):
 		result: list[ActionResult] = []
 		step_start_time = time.time()
 		tokens = 0
+		# set when the model output came from the LLM and should be cached once it succeeded
+		trajectory_key: str | None = None
 
 		try:
-			state = await self.browser_context.get_state(cache_clickable_elements_hashes=True)
+			state = await self.browser_context.get_state(
+				cache_clickable_elements_hashes=True, include_screenshot=self._needs_screenshots()
+			)
 			current_page = await self.browser_context.get_current_page()
+			if state.blocked_requests and state.blocked_requests.count:
+				logger.info(
+					f'🚫 Blocked {state.blocked_requests.count} requests since the previous state '
+					f'(~{state.blocked_requests.estimated_bytes // 1000} KB)'
+				)
 
 			# generate procedural memory if needed
 			if self.enable_memory and self.memory and self.state.n_steps % self.memory.config.memory_interval == 0:
@@ -522,7 +540,9 @@ class Agent(Generic[Context]):
 					if len(self.state.history.history) == 0:
 						predict_history = self.history.get_next_action(None)
 					else:
-						predict_history = self.history.get_next_action(self.state.history.history[-1]) # 用回放来构造 model_output
+						predict_history = self.history.get_next_action(
+							self.state.history.history[-1], self.settings.replay_match_threshold
+						)  # 用回放来构造 model_output
 
 					if isinstance(predict_history, AgentHistory):
 						logger.info('History found, using it')
@@ -535,10 +555,19 @@ class Agent(Generic[Context]):
 								action,
 								state,
 							)
-							if updated_action is not None:
-								predict_history.model_output.action[i] = updated_action
-
-						model_output = predict_history.model_output
+							if updated_action is None:
+								# the element is not on the page, or no similar element is confident enough
+								logger.info(f'Could not find element of recorded action {i} in current page')
+								break
+							predict_history.model_output.action[i] = updated_action
+						else:
+							model_output = predict_history.model_output
+
+				if model_output is None and self.trajectory_cache and not (step_info and step_info.is_last_step()):
+					trajectory_key = self._get_trajectory_key(state)
+					model_output = await self._get_cached_model_output(trajectory_key, state)
+					if model_output is not None:
+						trajectory_key = None
 
 				if model_output is None:
 					logger.info('No history found, calling model')
@@ -606,6 +635,9 @@ class Agent(Generic[Context]):
 
 			self.state.last_result = result
 
+			if trajectory_key is not None:
+				self._store_trajectory(trajectory_key, state, model_output, result)
+
 			if len(result) > 0 and result[-1].is_done:
 				logger.info(f'📄 Result: {result[-1].extracted_content}')
 
@@ -698,6 +730,86 @@ class Agent(Generic[Context]):
 
 		return [ActionResult(error=error_msg, include_in_memory=True)]
 
+	def _needs_screenshots(self) -> bool:
+		"""
+		Whether the state of a step needs a screenshot: for the LLM or the planner, the GIF, or the new step callback
+		(which gets the state). Hooks that want one without those set capture_screenshots or call
+		browser_context.take_screenshot().
+		"""
+		if self.settings.capture_screenshots is not None:
+			return self.settings.capture_screenshots
+		return (
+			self.settings.use_vision
+			or (self.settings.planner_llm is not None and self.settings.use_vision_for_planner)
+			or bool(self.settings.generate_gif)
+			or self.register_new_step_callback is not None
+		)
+
+	def _get_trajectory_key(self, state: BrowserState) -> str:
+		previous_actions = []
+		if self.state.history.history and self.state.history.history[-1].model_output:
+			previous_actions = [action.model_dump(exclude_unset=True) for action in self.state.history.history[-1].model_output.action]
+		assert self.trajectory_cache is not None
+		task = self.task if self.trajectory_cache.scope_to_task else None
+		return TrajectoryCache.make_key(state.url, state.selector_map, previous_actions, task=task)
+
+	async def _get_cached_model_output(self, trajectory_key: str, state: BrowserState) -> AgentOutput | None:
+		"""The cached model output for this state, with its element indices updated to the current page"""
+		assert self.trajectory_cache is not None
+		entry = self.trajectory_cache.get(trajectory_key)
+		if entry is None:
+			return None
+
+		# the clicks and texts of another task are only right for that task
+		if entry.task.split() != self.task.split() and not all(
+			is_task_independent(action) for action in entry.model_output.get('action', [])
+		):
+			logger.debug('Trajectory cache hit recorded by another task, its actions depend on the task')
+			self.trajectory_cache.stats.rejections += 1
+			return None
+
+		try:
+			model_output = self.AgentOutput.model_validate(entry.model_output)
+			interacted_elements = TypeAdapter(list[DOMHistoryElement | None]).validate_python(entry.interacted_element)
+		except ValidationError as e:
+			# written with other actions registered
+			logger.debug(f'Dropping trajectory cache entry that does not validate: {e}')
+			self.trajectory_cache.remove(trajectory_key)
+			self.trajectory_cache.stats.rejections += 1
+			return None
+
+		for i, action in enumerate(model_output.action):
+			historical_element = interacted_elements[i] if i < len(interacted_elements) else None
+			updated_action = await self._update_action_indices(historical_element, action, state)
+			if updated_action is None:
+				logger.info(f'Trajectory cache hit, but the element of action {i} is not on the current page')
+				self.trajectory_cache.stats.rejections += 1
+				return None
+			model_output.action[i] = updated_action
+
+		logger.info(f'♻️ Trajectory cache hit, replaying {len(model_output.action)} cached actions')
+		return model_output
+
+	def _store_trajectory(
+		self, trajectory_key: str, state: BrowserState, model_output: AgentOutput, result: list[ActionResult]
+	) -> None:
+		"""Cache a model output of the LLM once all its actions succeeded, except final answers which depend on the run"""
+		assert self.trajectory_cache is not None
+		if any(r.error for r in result) or any(r.is_done for r in result):
+			return
+		if any('done' in action.model_dump(exclude_unset=True) for action in model_output.action):
+			return
+
+		interacted_elements = AgentHistory.get_interacted_element(model_output, state.selector_map)
+		self.trajectory_cache.put(
+			trajectory_key,
+			self.task,
+			state.url,
+			# unset actions stay unset, ActionModel.set_index relies on it
+			model_output.model_dump(exclude_unset=True),
+			[element.to_dict() if element else None for element in interacted_elements],
+		)
+
 	def _make_history_item(
 		self,
 		model_output: AgentOutput | None,
@@ -982,6 +1094,9 @@ class Agent(Generic[Context]):
 				)
 			)
 
+			if self.trajectory_cache:
+				logger.info(f'Trajectory cache: {self.trajectory_cache.stats}')
+
 			if self.settings.save_playwright_script_path:
 				logger.info(
 					f'Agent run finished. Attempting to save Playwright script to: {self.settings.save_playwright_script_path}'
@@ -1026,7 +1141,7 @@ class Agent(Generic[Context]):
 
 		for i, action in enumerate(actions):
 			if action.get_index() is not None and i != 0:
-				new_state = await self.browser_context.get_state(cache_clickable_elements_hashes=False)
+				new_state = await self.browser_context.get_state(cache_clickable_elements_hashes=False, include_screenshot=False)
 				new_selector_map = new_state.selector_map
 
 				# Detect index change after previous action
@@ -1051,6 +1166,8 @@ class Agent(Generic[Context]):
 			try:
 				await self._raise_if_stopped_or_paused()
 
+				# the requests the action starts are waited for before the next action
+				action_started = asyncio.get_running_loop().time()
 				result = await self.controller.act(
 					action,
 					self.browser_context,
@@ -1066,7 +1183,9 @@ class Agent(Generic[Context]):
 				if results[-1].is_done or results[-1].error or i == len(actions) - 1:
 					break
 
-				await asyncio.sleep(self.browser_context.config.wait_between_actions)
+				await self.browser_context.wait_for_page_quiet(
+					timeout=self.browser_context.config.wait_between_actions, since=action_started
+				)
 				# hash all elements. if it is a subset of cached_state its fine - else break (new elements on page)
 
 			except asyncio.CancelledError:
@@ -1093,7 +1212,9 @@ class Agent(Generic[Context]):
 		)
 
 		if self.browser_context.session:
-			state = await self.browser_context.get_state(cache_clickable_elements_hashes=False)
+			state = await self.browser_context.get_state(
+				cache_clickable_elements_hashes=False, include_screenshot=self.settings.use_vision
+			)
 			content = AgentMessagePrompt(
 				state=state,
 				result=self.state.last_result,
@@ -1203,7 +1324,7 @@ class Agent(Generic[Context]):
 
 	async def _execute_history_step(self, history_item: AgentHistory, delay: float) -> list[ActionResult]:
 		"""Execute a single step from history with element validation"""
-		state = await self.browser_context.get_state(cache_clickable_elements_hashes=False)
+		state = await self.browser_context.get_state(cache_clickable_elements_hashes=False, include_screenshot=False)
 		if not state or not history_item.model_output:
 			raise ValueError('Invalid state or model output')
 		updated_actions = []
@@ -1236,9 +1357,18 @@ class Agent(Generic[Context]):
 		if not historical_element or not current_state.element_tree:
 			return action
 
-		current_element = HistoryTreeProcessor.find_history_element_in_tree(historical_element, current_state.element_tree)
+		current_element = HistoryTreeProcessor.find_history_element_in_state(historical_element, current_state)
+
+		if current_element is None:
+			match = current_state.element_matcher.match(historical_element)
+			if match is None or match.confidence < self.settings.replay_match_threshold:
+				return None
+			logger.info(
+				f'Element changed in DOM, re-identified it as index {match.element.highlight_index} (confidence {match.confidence:.2f})'
+			)
+			current_element = match.element
 
-		if not current_element or current_element.highlight_index is None:
+		if current_element.highlight_index is None:
 			return None
 
 		old_index = action.get_index()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+from browser_use.agent.trajectory_cache.views import TrajectoryCacheEntry, TrajectoryCacheStats
+from browser_use.dom.views import SelectorMap
+from browser_use.telemetry.service import xdg_cache_home
+
+logger = logging.getLogger(__name__)
+
+# path segments that identify a record rather than a page: numbers, UUIDs, hashes and other long tokens with digits
+ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{8,}|[0-9a-f-]{36}|(?=.*\d)[\w-]{16,})$', re.IGNORECASE)
+# attributes that describe what an element is for, its text and labels are left out since they change with the page content
+FINGERPRINT_ATTRIBUTES = ('type', 'role', 'name', 'placeholder')
+
+
+def normalize_url_pattern(url: str) -> str:
+	"""scheme://host/path?keys with id-like path segments replaced by ':id', query values and fragment dropped"""
+	parsed = urlparse(url)
+	segments = [':id' if ID_SEGMENT.match(segment) else segment for segment in parsed.path.split('/')]
+	pattern = f'{parsed.scheme}://{parsed.netloc.lower()}{"/".join(segments)}'
+	query_keys = sorted({key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+	if query_keys:
+		pattern += '?' + '&'.join(query_keys)
+	return pattern
+
+
+def interactive_elements_fingerprint(selector_map: SelectorMap) -> str:
+	"""
+	Digest of the distinct kinds of interactive elements on a page.
+	Kinds are counted once, so a result list with a few more or fewer items keeps its fingerprint.
+	"""
+	kinds = set()
+	for element in selector_map.values():
+		attributes = ','.join(f'{key}={element.attributes[key]}' for key in FINGERPRINT_ATTRIBUTES if key in element.attributes)
+		kinds.add(f'{element.tag_name}[{attributes}]')
+	return hashlib.sha256('\n'.join(sorted(kinds)).encode()).hexdigest()
+
+
+def is_task_independent(action: dict) -> bool:
+	"""
+	Whether an action (as dumped by ActionModel.model_dump(exclude_unset=True)) means the same for every task:
+	it neither targets an element (which item was clicked) nor carries text (what was typed or searched).
+	"""
+	return all(
+		'index' not in (params or {}) and not any(isinstance(value, str) for value in (params or {}).values())
+		for params in action.values()
+	)
+
+
+class TrajectoryCache:
+	"""
+	On-disk cache of the model outputs that succeeded in a page state, shared by all agents and runs using the directory.
+
+	An entry is keyed by the task, the URL pattern, the interactive elements of the page and the actions of the previous
+	step, and stored as one JSON file. Without `scope_to_task` the task is left out of the key, and an entry of another
+	task is only replayed when its actions are task independent (see `is_task_independent`). The file modification
+	time is the last use: when the cache grows beyond `max_entries` or `max_bytes`, the least recently used entries are
+	evicted.
+	"""
+
+	def __init__(
+		self,
+		cache_dir: str | Path | None = None,
+		max_entries: int = 1000,
+		max_bytes: int = 50 * 1024 * 1024,
+		scope_to_task: bool = True,
+	):
+		self.cache_dir = Path(cache_dir) if cache_dir else xdg_cache_home() / 'browser_use' / 'trajectories'
+		self.scope_to_task = scope_to_task
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.stats = TrajectoryCacheStats()
+
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+		# key -> file size, least recently used first
+		self._entries: OrderedDict[str, int] = OrderedDict()
+		files = []
+		for path in self.cache_dir.glob('*.json'):
+			try:
+				stat = path.stat()
+			except OSError:
+				continue
+			files.append((stat.st_mtime, path.stem, stat.st_size))
+		for _, key, size in sorted(files):
+			self._entries[key] = size
+
+	@staticmethod
+	def make_key(url: str, selector_map: SelectorMap, previous_actions: list[dict], task: str | None = None) -> str:
+		"""
+		previous_actions: the actions of the previous step as dumped by ActionModel.model_dump(exclude_unset=True),
+		their element indices are left out since they differ between runs
+		task: only given when entries are scoped to a task
+		"""
+		actions = [
+			{name: {key: value for key, value in (params or {}).items() if key != 'index'} for name, params in action.items()}
+			for action in previous_actions
+		]
+		parts = [
+			normalize_url_pattern(url),
+			interactive_elements_fingerprint(selector_map),
+			json.dumps(actions, sort_keys=True, default=str),
+		]
+		if task is not None:
+			parts.append(' '.join(task.split()))
+		return hashlib.sha256('\x00'.join(parts).encode()).hexdigest()
+
+	def get(self, key: str) -> TrajectoryCacheEntry | None:
+		path = self._path(key)
+		try:
+			entry = TrajectoryCacheEntry.model_validate_json(path.read_text(encoding='utf-8'))
+		except FileNotFoundError:
+			self._entries.pop(key, None)
+			self.stats.misses += 1
+			return None
+		except Exception as e:
+			logger.debug(f'Dropping unreadable trajectory cache entry {key}: {e}')
+			self.remove(key)
+			self.stats.misses += 1
+			return None
+
+		os.utime(path)
+		if key not in self._entries:
+			# written by another process
+			self._entries[key] = path.stat().st_size
+		self._entries.move_to_end(key)
+		self.stats.hits += 1
+		return entry
+
+	def put(self, key: str, task: str, url: str, model_output: dict, interacted_element: list[dict | None]) -> None:
+		entry = TrajectoryCacheEntry(
+			key=key,
+			task=task,
+			url_pattern=normalize_url_pattern(url),
+			model_output=model_output,
+			interacted_element=interacted_element,
+			created_at=time.time(),
+		)
+		data = entry.model_dump_json()
+		path = self._path(key)
+		# write a temporary file first, other processes never read a partial entry
+		temporary_path = path.with_suffix(f'.{os.getpid()}.tmp')
+		temporary_path.write_text(data, encoding='utf-8')
+		os.replace(temporary_path, path)
+
+		self._entries[key] = len(data.encode())
+		self._entries.move_to_end(key)
+		self.stats.stores += 1
+		self._evict()
+
+	def remove(self, key: str) -> None:
+		self._entries.pop(key, None)
+		self._path(key).unlink(missing_ok=True)
+
+	def _evict(self) -> None:
+		total_bytes = sum(self._entries.values())
+		while self._entries and (len(self._entries) > self.max_entries or total_bytes > self.max_bytes):
+			key, size = self._entries.popitem(last=False)
+			self._path(key).unlink(missing_ok=True)
+			total_bytes -= size
+			self.stats.evictions += 1
+
+	def _path(self, key: str) -> Path:
+		return self.cache_dir / f'{key}.json'
+
+	def __len__(self) -> int:
+		return len(self._entries)
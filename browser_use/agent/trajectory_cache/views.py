@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class TrajectoryCacheEntry(BaseModel):
+	"""The model output that succeeded in a page state, with the elements its actions interacted with"""
+
+	key: str
+	task: str
+	url_pattern: str
+	model_output: dict
+	# DOMHistoryElement.to_dict() per action, used to find the elements again on the current page
+	interacted_element: list[dict | None]
+	created_at: float
+
+
+class TrajectoryCacheStats(BaseModel):
+	hits: int = 0
+	misses: int = 0
+	# hits that could not be used since their elements were not found on the current page, the LLM was called instead
+	rejections: int = 0
+	stores: int = 0
+	evictions: int = 0
@@ -21,6 +21,7 @@ from browser_use.browser.browser import BrowserConfig
 from browser_use.browser.context import BrowserContextConfig
 from browser_use.browser.views import BrowserStateHistory
 from browser_use.controller.registry.views import ActionModel
+from browser_use.dom.element_matcher.service import ElementMatcher
 from browser_use.dom.history_tree_processor.service import (
 	DOMElementNode,
 	DOMHistoryElement,
@@ -57,6 +58,8 @@ class AgentSettings(BaseModel):
 	validate_output: bool = False
 	message_context: str | None = None
 	generate_gif: bool | str = False
+	# take a screenshot in every step: None decides from use_vision, the planner, generate_gif and register_new_step_callback
+	capture_screenshots: bool | None = None
 	available_file_paths: list[str] | None = None
 	override_system_message: str | None = None
 	extend_system_message: str | None = None
@@ -84,6 +87,9 @@ class AgentSettings(BaseModel):
 	# Playwright script generation setting
 	save_playwright_script_path: str | None = None  # Path to save the generated Playwright script
 
+	# Replay: confidence a similar element needs to replace a recorded one that is not found exactly
+	replay_match_threshold: float = 0.8
+
 
 class AgentState(BaseModel):
 	"""Holds all state information for an Agent"""
@@ -420,7 +426,14 @@ class AgentHistoryList(BaseModel):
 	# 1. 当前执行到了哪一步, 匹配机制需要优化：以已经执行了的控件来判断
 	# 2. 预测的下一步，需要能否正确从当前网页找到相应控件
 	# 3. 如果不能正确预测， 转llm来执行
-	def get_next_action(self, exec_history: AgentHistory) -> AgentHistory:
+	def get_next_action(self, exec_history: AgentHistory, match_threshold: float | None = None) -> AgentHistory:
+		"""
+		The recorded step after the one whose interacted elements match those of `exec_history`.
+
+		Elements are matched by their hashes. With `match_threshold`, a step whose elements are all at least that
+		similar (see ElementMatcher.similarity) is accepted when no step matches exactly, since the executed elements
+		may have been re-identified from changed ones.
+		"""
 		# 如果 exec_history 是none，返回history的第一个
 		if exec_history is None:
 			return self.history[0]
@@ -451,6 +464,20 @@ class AgentHistoryList(BaseModel):
 			
 			# 所有元素都匹配
 			return True
+
+		def similarity_of_interacted_elements(e1: list[DOMHistoryElement], e2: list[DOMHistoryElement]) -> float | None:
+			# 长度不同或None的位置不同时不可比，否则取最不相似的一对
+			if len(e1) != len(e2):
+				return None
+
+			similarities = [1.0]
+			for el1, el2 in zip(e1, e2):
+				if el1 is None or el2 is None:
+					if el1 != el2:
+						return None
+					continue
+				similarities.append(ElementMatcher.similarity(el1, el2))
+			return min(similarities)
 		
 		# 在历史记录中查找匹配的步骤
 		current_step_index = -1
@@ -463,6 +490,15 @@ class AgentHistoryList(BaseModel):
 				current_step_index = i
 				break
 		
+		# 没有完全匹配的步骤时，用相似度找最接近的步骤
+		if current_step_index == -1 and match_threshold is not None:
+			best_similarity = -1.0
+			for i, history_item in enumerate(self.history):
+				similarity = similarity_of_interacted_elements(current_elements, history_item.state.interacted_element)
+				if similarity is not None and similarity >= match_threshold and similarity > best_similarity:
+					best_similarity = similarity
+					current_step_index = i
+
 		# 如果没有找到匹配的步骤，抛出异常
 		if current_step_index == -1:
 			return None
@@ -11,22 +11,33 @@ import os
 import re
 import time
 import uuid
+import weakref
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
 import anyio
-from patchright._impl._errors import TimeoutError
 from patchright.async_api import Browser as PlaywrightBrowser
 from patchright.async_api import (
 	BrowserContext as PlaywrightBrowserContext,
 )
 from patchright.async_api import (
+	CDPSession,
 	ElementHandle,
 	FrameLocator,
 	Page,
 )
 from pydantic import BaseModel, ConfigDict, Field
 
+from browser_use.browser.downloads.service import DownloadManager
+from browser_use.browser.network_settle.service import ACTION_RESOURCE_TYPES, NetworkIdleWatcher, SettleProfiles
+from browser_use.browser.request_policy.service import RequestBlocker
+from browser_use.browser.request_policy.views import RequestPolicy
+from browser_use.browser.response_replay.service import ResponseReplayer
+from browser_use.browser.response_replay.views import ResponseReplayConfig
+from browser_use.browser.screencast.service import PageScreencast
+from browser_use.browser.screencast.views import ScreencastFrame
+from browser_use.browser.tab_registry.service import TabRegistry
 from browser_use.browser.views import (
 	BrowserError,
 	BrowserState,
@@ -35,7 +46,8 @@ from browser_use.browser.views import (
 )
 from browser_use.dom.clickable_element_processor.service import ClickableElementProcessor
 from browser_use.dom.service import DomService
-from browser_use.dom.views import DOMElementNode, SelectorMap
+from browser_use.dom.snapshot_patcher.service import DomSnapshotPatcher
+from browser_use.dom.views import DOMElementNode, DOMPageInfo, SelectorMap
 from browser_use.utils import time_execution_async, time_execution_sync
 
 if TYPE_CHECKING:
@@ -51,6 +63,9 @@ BROWSER_NAVBAR_HEIGHT = {
 	'linux': 90,
 }.get(platform.system().lower(), 85)
 
+# how long a screenshot waits for the screencast to paint the highlight overlay the extraction just drew
+SCREENCAST_OVERLAY_FRAME_TIMEOUT = 0.2
+
 
 class BrowserContextConfig(BaseModel):
 	"""
@@ -73,8 +88,14 @@ class BrowserContextConfig(BaseModel):
 	    maximum_wait_page_load_time: 5.0
 	        Maximum time to wait for page load before proceeding anyway
 
+	    adaptive_page_load_wait: False
+	        Learn the minimum wait per domain from how long its recent page loads took until their last relevant request finished (90th percentile), instead of using minimum_wait_page_load_time. Sites that are stable right away are not padded, slow sites are not captured before they usually are stable. minimum_wait_page_load_time is used until a load of the domain was observed. The quiet window (wait_for_network_idle_page_load_time) is shortened the same way to the longest pause between the requests of recent loads, once three loads were observed. Only loads that made requests are learned from.
+
 	    wait_between_actions: 1.0
-	        Time to wait between multiple per step actions
+	        Maximum time to wait for the page to be quiet between multiple per step actions
+
+	    page_quiet_time: 0.05
+	        How long the page has to be without DOM mutations, scrolling, ending animations and pending requests to count as quiet after an action
 
 	    window_width: 1280
 	    window_height: 1100
@@ -88,7 +109,10 @@ class BrowserContextConfig(BaseModel):
 	        Path to save video recordings
 
 	    save_downloads_path: None
-	        Path to save downloads to
+	        Path to save downloads to. The downloads of all tabs are saved as they happen.
+
+	    download_correlation_window: 0.5
+	        Seconds after the start of a click in which a download that starts is reported as downloaded by the click. Clicks on links (<a href>) and on elements with a download attribute wait the whole window, since their downloads may start without a navigation. Other clicks only wait while a navigation they started has no response yet or turned into an attachment, and return right away otherwise.
 
 	    trace_path: None
 	        Path to save trace files. It will auto name the file with the TRACE_PATH/{context_id}.zip
@@ -105,6 +129,45 @@ class BrowserContextConfig(BaseModel):
 	    viewport_expansion: 0
 	        Viewport expansion in pixels. This amount will increase the number of elements which are included in the state what the LLM will see. If set to -1, all elements will be included (this leads to high token usage). If set to 0, only the elements which are visible in the viewport will be included.
 
+	    incremental_dom_snapshots: False
+	        Keep the extracted DOM tree of each page between steps and only transfer the nodes that changed since the last step (tracked in the page with a MutationObserver). Saves most of the extraction time on large, mostly static pages.
+
+	    columnar_dom_transfer: False
+	        Transfer the extracted DOM as integer columns with an interned string table instead of one JSON object per node. Lowers serialization time and peak memory on very large pages.
+
+	    dom_text_mode: 'full'
+	        'full' extracts the text of every element. 'leaf' only extracts text nodes and the (capped) text of interactive elements, which avoids copying the text of every subtree at every ancestor on large pages.
+
+	    dom_xpath_mode: 'all'
+	        'all' extracts the XPath of every element. 'highlighted' only extracts the XPath of interactive elements, iframes and shadow hosts, the XPath of any other element is resolved on demand with DOMElementNode.get_xpath().
+
+	    dom_max_nodes: None
+	        Stop the DOM extraction after visiting this many nodes. The viewport is extracted first and the rest of the page outwards from it, BrowserState.truncation tells where the extraction stopped. Bounds the time the page's main thread is blocked on huge pages.
+
+	    dom_time_budget_ms: None
+	        Stop the DOM extraction after this many milliseconds, same prioritization as dom_max_nodes.
+
+	    screenshot_format: 'png'
+	        Image format of the screenshots sent to the LLM: 'png', 'jpeg' or 'webp'. JPEG and WebP screenshots are several times smaller. Full-page screenshots, and screenshots of browsers without CDP, are taken with Playwright, which cannot encode WebP: they are JPEG instead.
+
+	    screenshot_quality: None
+	        Compression quality of JPEG and WebP screenshots, from 0 to 100. None uses the browser default.
+
+	    screenshot_max_dimension: None
+	        Downscale screenshots so that neither side exceeds this many pixels, e.g. 1024. The browser renders the screenshot at the smaller size, which also lowers the image token cost. Screenshots taken with Playwright (full pages, browsers without CDP) are only rendered at one pixel per CSS pixel and can still exceed it.
+
+	    screencast: False
+	        Stream the agent's tab with a CDP screencast and keep its latest frames. A screenshot is then taken from the newest frame when it was painted after the last change of the page, and only captured directly when the frame is stale. The frames are available from get_screencast_frames() (e.g. for debugging).
+
+	    screencast_buffer_size: 10
+	        Number of screencast frames kept per tab.
+
+	    request_policy: None
+	        Requests the pages are not allowed to make, by resource type, URL pattern, domain list, the built-in tracker list or for third-party scripts. RequestPolicy.text_only() blocks images, media, fonts, trackers and third-party scripts for agents without vision, RequestPolicy.vision() only media and trackers. BrowserState.blocked_requests reports what was blocked since the previous state. Note that routing the requests disables the HTTP cache of the browser.
+
+	    response_replay: None
+	        Serve the responses from a recorded HAR (e.g. one saved with save_har_path) and/or a content-addressed response store directory instead of the network, for deterministic and offline runs. Requests are matched by method, URL and POST body, with configurable rules (ignore_query_params, normalize_timestamps). Requests without a recorded response fail as if offline, unless fallback_to_network is set; with record their network responses are added to the store.
+
 	    allowed_domains: None
 	        List of allowed domains that can be accessed. If None, all domains are allowed.
 	        Example: ['example.com', 'api.example.com']
@@ -148,7 +211,9 @@ class BrowserContextConfig(BaseModel):
 	minimum_wait_page_load_time: float = 0.25
 	wait_for_network_idle_page_load_time: float = 0.5
 	maximum_wait_page_load_time: float = 5
+	adaptive_page_load_wait: bool = False
 	wait_between_actions: float = 0.5
+	page_quiet_time: float = 0.05
 
 	disable_security: bool = False  # disable_security=True is dangerous as any malicious URL visited could embed an iframe for the user's bank, and use their cookies to steal money
 
@@ -158,6 +223,7 @@ class BrowserContextConfig(BaseModel):
 
 	save_recording_path: str | None = None
 	save_downloads_path: str | None = None
+	download_correlation_window: float = Field(default=0.5, ge=0)
 	save_har_path: str | None = None
 	trace_path: str | None = None
 	locale: str | None = None
@@ -165,6 +231,19 @@ class BrowserContextConfig(BaseModel):
 
 	highlight_elements: bool = True
 	viewport_expansion: int = 0
+	incremental_dom_snapshots: bool = False
+	columnar_dom_transfer: bool = False
+	dom_text_mode: Literal['full', 'leaf'] = 'full'
+	dom_xpath_mode: Literal['all', 'highlighted'] = 'all'
+	dom_max_nodes: int | None = None
+	dom_time_budget_ms: int | None = None
+	screenshot_format: Literal['png', 'jpeg', 'webp'] = 'png'
+	screenshot_quality: int | None = Field(default=None, ge=0, le=100)
+	screenshot_max_dimension: int | None = Field(default=None, gt=0)
+	screencast: bool = False
+	screencast_buffer_size: int = Field(default=10, gt=0)
+	request_policy: RequestPolicy | None = None
+	response_replay: ResponseReplayConfig | None = None
 	allowed_domains: list[str] | None = None
 	include_dynamic_attributes: bool = True
 	http_credentials: dict[str, str] | None = None
@@ -201,6 +280,30 @@ class BrowserSession:
 
 		self.cached_state_clickable_elements_hashes: CachedStateClickableElementsHashes | None = None
 
+		# the open tabs with their URL and title, kept up to date from browser events
+		self.tabs = TabRegistry(context)
+
+		# CDP sessions attached to the pages, for the commands Playwright has no API for
+		self.cdp_sessions: weakref.WeakKeyDictionary[Page, CDPSession] = weakref.WeakKeyDictionary()
+
+		# screencasts of the pages when screencast is enabled, None for pages where it could not be started
+		self.screencasts: weakref.WeakKeyDictionary[Page, PageScreencast | None] = weakref.WeakKeyDictionary()
+
+		# serves the responses of the pages from a recording when response_replay is set
+		self.response_replayer: ResponseReplayer | None = None
+
+		# the requests of each page since the session started, for waiting on the requests an action started
+		self.request_watchers: weakref.WeakKeyDictionary[Page, NetworkIdleWatcher] = weakref.WeakKeyDictionary()
+
+		# blocks requests by the request_policy when it is set
+		self.request_blocker: RequestBlocker | None = None
+
+		# saves the downloads of all tabs when save_downloads_path is set
+		self.downloads: DownloadManager | None = None
+
+		# DOM trees kept between steps when incremental_dom_snapshots is enabled, dropped together with their page
+		self.dom_snapshot_patchers: weakref.WeakKeyDictionary[Page, DomSnapshotPatcher] = weakref.WeakKeyDictionary()
+
 
 @dataclass
 class BrowserContextState:
@@ -225,6 +328,9 @@ class BrowserContext:
 
 		self.state = state or BrowserContextState()
 
+		# settle times of the page loads per domain, kept across sessions of the context
+		self.settle_profiles = SettleProfiles()
+
 		# Initialize these as None - they'll be set up when needed
 		self.session: BrowserSession | None = None
 
@@ -258,6 +364,17 @@ class BrowserContext:
 					logger.debug(f'Failed to remove CDP listener: {e}')
 				self._page_event_handler = None
 
+			await self.session.tabs.close()
+			try:
+				self.session.context.remove_listener('page', self._watch_requests)
+			except Exception as e:
+				logger.debug(f'Failed to remove the request watcher listener: {e}')
+			if self.session.downloads is not None:
+				await self.session.downloads.close()
+			for screencast in self.session.screencasts.values():
+				if screencast is not None:
+					await screencast.stop()
+
 			await self.save_cookies()
 
 			if self.config.trace_path:
@@ -316,6 +433,20 @@ class BrowserContext:
 			context=context,
 			cached_state=None,
 		)
+		await self.session.tabs.start()
+		for page in pages:
+			self._watch_requests(page)
+		context.on('page', self._watch_requests)
+		# the route added last runs first: blocked requests are neither replayed nor recorded
+		if self.config.response_replay:
+			self.session.response_replayer = ResponseReplayer(self.config.response_replay)
+			await self.session.response_replayer.start(context)
+		if self.config.request_policy:
+			self.session.request_blocker = RequestBlocker(self.config.request_policy)
+			await self.session.request_blocker.start(context)
+		if self.config.save_downloads_path:
+			self.session.downloads = DownloadManager(context, self.config.save_downloads_path)
+			self.session.downloads.start()
 
 		current_page = None
 		if self.browser.config.cdp_url:
@@ -484,15 +615,11 @@ class BrowserContext:
 		session = await self.get_session()
 
 		agent_tab_valid = (
-			self.agent_current_page
-			and self.agent_current_page in session.context.pages
-			and not self.agent_current_page.is_closed()
+			self.agent_current_page and self.agent_current_page in session.tabs and not self.agent_current_page.is_closed()
 		)
 
 		human_current_page_valid = (
-			self.human_current_page
-			and self.human_current_page in session.context.pages
-			and not self.human_current_page.is_closed()
+			self.human_current_page and self.human_current_page in session.tabs and not self.human_current_page.is_closed()
 		)
 
 		# Case 1: Both references are valid - nothing to do
@@ -512,7 +639,7 @@ class BrowserContext:
 		# Case 4: Neither reference is valid - recover from available tabs
 		non_extension_pages = [
 			page
-			for page in session.context.pages
+			for page in session.tabs.pages
 			if not page.url.startswith('chrome-extension://') and not page.url.startswith('chrome://')
 		]
 
@@ -550,28 +677,20 @@ class BrowserContext:
 		session = await self.get_session()
 
 		# First check if agent_current_page is valid
-		if (
-			self.agent_current_page
-			and self.agent_current_page in session.context.pages
-			and not self.agent_current_page.is_closed()
-		):
+		if self.agent_current_page and self.agent_current_page in session.tabs and not self.agent_current_page.is_closed():
 			return self.agent_current_page
 
 		# If we're here, reconcile tab state and try again
 		await self._reconcile_tab_state()
 
 		# After reconciliation, agent_current_page should be valid
-		if (
-			self.agent_current_page
-			and self.agent_current_page in session.context.pages
-			and not self.agent_current_page.is_closed()
-		):
+		if self.agent_current_page and self.agent_current_page in session.tabs and not self.agent_current_page.is_closed():
 			return self.agent_current_page
 
 		# If still invalid, fall back to first page method as last resort
 		logger.warning('⚠️  Failed to get agent current page, falling back to first page')
-		if session.context.pages:
-			page = session.context.pages[0]
+		if session.tabs.pages:
+			page = session.tabs.pages[0]
 			self.agent_current_page = page
 			self.human_current_page = page
 			return page
@@ -733,179 +852,65 @@ class BrowserContext:
 		except Exception as e:
 			logger.debug(f'Failed to set viewport size for page: {e}')
 
-	async def _wait_for_stable_network(self):
+	async def _wait_for_stable_network(self, minimum_wait: float | None = None):
+		"""
+		Wait until the relevant requests of the page finished and the network was quiet for
+		wait_for_network_idle_page_load_time, and at least the minimum wait passed.
+		"""
 		page = await self.get_agent_current_page()
 
-		pending_requests = set()
-		last_activity = asyncio.get_event_loop().time()
-
-		# Define relevant resource types and content types
-		RELEVANT_RESOURCE_TYPES = {
-			'document',
-			'stylesheet',
-			'image',
-			'font',
-			'script',
-			'iframe',
-		}
-
-		RELEVANT_CONTENT_TYPES = {
-			'text/html',
-			'text/css',
-			'application/javascript',
-			'image/',
-			'font/',
-			'application/json',
-		}
-
-		# Additional patterns to filter out
-		IGNORED_URL_PATTERNS = {
-			# Analytics and tracking
-			'analytics',
-			'tracking',
-			'telemetry',
-			'beacon',
-			'metrics',
-			# Ad-related
-			'doubleclick',
-			'adsystem',
-			'adserver',
-			'advertising',
-			# Social media widgets
-			'facebook.com/plugins',
-			'platform.twitter',
-			'linkedin.com/embed',
-			# Live chat and support
-			'livechat',
-			'zendesk',
-			'intercom',
-			'crisp.chat',
-			'hotjar',
-			# Push notifications
-			'push-notifications',
-			'onesignal',
-			'pushwoosh',
-			# Background sync/heartbeat
-			'heartbeat',
-			'ping',
-			'alive',
-			# WebRTC and streaming
-			'webrtc',
-			'rtmp://',
-			'wss://',
-			# Common CDNs for dynamic content
-			'cloudfront.net',
-			'fastly.net',
-		}
-
-		async def on_request(request):
-			# Filter by resource type
-			if request.resource_type not in RELEVANT_RESOURCE_TYPES:
-				return
-
-			# Filter out streaming, websocket, and other real-time requests
-			if request.resource_type in {
-				'websocket',
-				'media',
-				'eventsource',
-				'manifest',
-				'other',
-			}:
-				return
-
-			# Filter out by URL patterns
-			url = request.url.lower()
-			if any(pattern in url for pattern in IGNORED_URL_PATTERNS):
-				return
-
-			# Filter out data URLs and blob URLs
-			if url.startswith(('data:', 'blob:')):
-				return
-
-			# Filter out requests with certain headers
-			headers = request.headers
-			if headers.get('purpose') == 'prefetch' or headers.get('sec-fetch-dest') in [
-				'video',
-				'audio',
-			]:
-				return
-
-			nonlocal last_activity
-			pending_requests.add(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request started: {request.url} ({request.resource_type})')
-
-		async def on_response(response):
-			request = response.request
-			if request not in pending_requests:
-				return
-
-			# Filter by content type if available
-			content_type = response.headers.get('content-type', '').lower()
-
-			# Skip if content type indicates streaming or real-time data
-			if any(
-				t in content_type
-				for t in [
-					'streaming',
-					'video',
-					'audio',
-					'webm',
-					'mp4',
-					'event-stream',
-					'websocket',
-					'protobuf',
-				]
-			):
-				pending_requests.remove(request)
-				return
-
-			# Only process relevant content types
-			if not any(ct in content_type for ct in RELEVANT_CONTENT_TYPES):
-				pending_requests.remove(request)
-				return
-
-			# Skip if response is too large (likely not essential for page load)
-			content_length = response.headers.get('content-length')
-			if content_length and int(content_length) > 5 * 1024 * 1024:  # 5MB
-				pending_requests.remove(request)
-				return
-
-			nonlocal last_activity
-			pending_requests.remove(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request resolved: {request.url} ({content_type})')
-
-		# Attach event listeners
-		page.on('request', on_request)
-		page.on('response', on_response)
+		def get_minimum_wait() -> float:
+			# the page may navigate while waiting, the minimum wait is the one of the domain it is on
+			return minimum_wait if minimum_wait is not None else self._get_minimum_wait_page_load_time(page.url)
 
+		idle_time = self._get_network_idle_time(page.url)
+		watcher = NetworkIdleWatcher(page)
+		watcher.start()
 		try:
-			# Wait for idle time
-			start_time = asyncio.get_event_loop().time()
-			while True:
-				await asyncio.sleep(0.1)
-				now = asyncio.get_event_loop().time()
-				if len(pending_requests) == 0 and (now - last_activity) >= self.config.wait_for_network_idle_page_load_time:
-					break
-				if now - start_time > self.config.maximum_wait_page_load_time:
-					logger.debug(
-						f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(pending_requests)} '
-						f'pending requests: {[r.url for r in pending_requests]}'
-					)
-					break
-
+			stable = await watcher.wait(
+				idle_time=idle_time,
+				timeout=self.config.maximum_wait_page_load_time,
+				minimum_wait=get_minimum_wait,
+			)
 		finally:
-			# Clean up event listeners
-			page.remove_listener('request', on_request)
-			page.remove_listener('response', on_response)
+			watcher.stop()
 
-		logger.debug(f'⚖️  Network stabilized for {self.config.wait_for_network_idle_page_load_time} seconds')
+		if not stable:
+			logger.debug(
+				f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(watcher.pending)} '
+				f'pending requests: {[r.url for r in watcher.pending]}'
+			)
+			return
+
+		# timed out loads are not learned from, a long-polling request would make every page of the domain wait the maximum.
+		# Neither are waits without requests (e.g. getting the state of a page that did not change), they are no page loads
+		if watcher.request_count:
+			self.settle_profiles.record(page.url, watcher.settle_time, watcher.longest_gap)
+		logger.debug(f'⚖️  Network stabilized {watcher.settle_time:.2f}s after the start, quiet for {idle_time:.2f} seconds')
+
+	def _get_minimum_wait_page_load_time(self, url: str) -> float:
+		"""The minimum wait for a page load, learned per domain when adaptive_page_load_wait is enabled"""
+		if self.config.adaptive_page_load_wait:
+			learned = self.settle_profiles.minimum_wait(url)
+			if learned is not None:
+				return min(learned, self.config.maximum_wait_page_load_time)
+		return self.config.minimum_wait_page_load_time
+
+	def _get_network_idle_time(self, url: str) -> float:
+		"""
+		How long the network has to be quiet for a page load, learned per domain when adaptive_page_load_wait is
+		enabled, and never longer than wait_for_network_idle_page_load_time
+		"""
+		if self.config.adaptive_page_load_wait:
+			learned = self.settle_profiles.idle_time(url)
+			if learned is not None:
+				return min(learned, self.config.wait_for_network_idle_page_load_time)
+		return self.config.wait_for_network_idle_page_load_time
 
 	async def _wait_for_page_and_frames_load(self, timeout_overwrite: float | None = None):
 		"""
 		Ensures page is fully loaded before continuing.
-		Waits for either network to be idle or minimum WAIT_TIME, whichever is longer.
+		Waits for the network to be idle and at least the minimum wait time, timeout_overwrite overrides the minimum.
 		Also checks if the loaded URL is allowed.
 		"""
 		# Start timing
@@ -913,7 +918,7 @@ class BrowserContext:
 
 		# Wait for page load
 		try:
-			await self._wait_for_stable_network()
+			await self._wait_for_stable_network(minimum_wait=timeout_overwrite or None)
 
 			# Check if the loaded URL is allowed
 			page = await self.get_agent_current_page()
@@ -922,17 +927,114 @@ class BrowserContext:
 			raise e
 		except Exception:
 			logger.warning('⚠️  Page load failed, continuing...')
-			pass
+			# the network could not be watched, wait the configured minimum instead
+			remaining = max((timeout_overwrite or self.config.minimum_wait_page_load_time) - (time.time() - start_time), 0)
+			if remaining > 0:
+				await asyncio.sleep(remaining)
+
+		logger.debug(f'--Page loaded in {time.time() - start_time:.2f} seconds')
+
+	async def wait_for_page_quiet(self, timeout: float, quiet_time: float | None = None, since: float | None = None) -> bool:
+		"""
+		Wait until the page is quiet: no DOM mutations, no scrolling, no running animations that end, and no pending
+		requests for the page resources or the data its scripts load, for quiet_time seconds (page_quiet_time by default).
+
+		since: event loop time when the action that is settling started, the requests it started are waited for
+		even when they started before this call. Requests that were pending before are not. Defaults to now,
+		use settle_after() to wait after an action.
+
+		Returns False when the page was not quiet within timeout seconds.
+		"""
+		quiet_time = self.config.page_quiet_time if quiet_time is None else quiet_time
+		page = await self.get_agent_current_page()
+		loop = asyncio.get_running_loop()
+		started = loop.time()
+		since = started if since is None else min(since, started)
+		deadline = started + timeout
+
+		watcher = self._watch_requests(page)
+		while loop.time() < deadline:
+			if not await watcher.wait(idle_time=quiet_time, timeout=deadline - since, since=since):
+				return False
+
+			dom_started = loop.time()
+			try:
+				dom_quiet = await page.evaluate(
+					"""
+					async ({ quietMs, timeoutMs }) => {
+						const start = performance.now();
+						let lastChange = start;
+						const onChange = () => { lastChange = performance.now(); };
+						const observer = new MutationObserver(onChange);
+						observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+						document.addEventListener('scroll', onChange, { capture: true, passive: true });
+
+						// spinners and other infinite animations never end, they do not keep the page busy
+						const endingAnimations = () => document.getAnimations().filter(animation =>
+							animation.playState === 'running' && animation.effect &&
+							animation.effect.getComputedTiming().endTime !== Infinity);
 
-		# Calculate remaining time to meet minimum WAIT_TIME
-		elapsed = time.time() - start_time
-		remaining = max((timeout_overwrite or self.config.minimum_wait_page_load_time) - elapsed, 0)
+						try {
+							while (true) {
+								const now = performance.now();
+								const animations = endingAnimations();
+								if (!animations.length && now - lastChange >= quietMs) return true;
+								if (now - start >= timeoutMs) return false;
+
+								const deadline = start + timeoutMs;
+								const sleep = new Promise(resolve => setTimeout(resolve, Math.min(animations.length ? deadline : lastChange + quietMs, deadline) - now));
+								if (animations.length) {
+									await Promise.race([Promise.all(animations.map(animation => animation.finished.catch(() => {}))), sleep]);
+									lastChange = performance.now();
+								} else {
+									await sleep;
+								}
+							}
+						} finally {
+							observer.disconnect();
+							document.removeEventListener('scroll', onChange, { capture: true });
+						}
+					}
+					""",
+					{'quietMs': quiet_time * 1000, 'timeoutMs': max(deadline - dom_started, 0) * 1000},
+				)
+			except Exception as e:
+				# a navigation replaced the document, its requests are followed by the watcher
+				logger.debug(f'Waiting for the new document, the page navigated while waiting for it to be quiet: {e}')
+				try:
+					await page.wait_for_load_state('domcontentloaded', timeout=max(deadline - loop.time(), 0) * 1000)
+				except Exception:
+					return False
+				continue
 
-		logger.debug(f'--Page loaded in {elapsed:.2f} seconds, waiting for additional {remaining:.2f} seconds')
+			if not dom_quiet:
+				return False
+			# the network has to have been quiet while the DOM was
+			if not watcher.pending_since(since) and watcher.last_activity <= dom_started:
+				return True
+		return False
 
-		# Sleep remaining time if needed
-		if remaining > 0:
-			await asyncio.sleep(remaining)
+	@asynccontextmanager
+	async def settle_after(self, timeout: float, quiet_time: float | None = None):
+		"""
+		Wait for the page to be quiet after the block (see wait_for_page_quiet), including the requests the block started:
+
+		    async with browser.settle_after(timeout=0.5):
+		        await page.keyboard.press('Enter')
+		"""
+		since = asyncio.get_running_loop().time()
+		yield
+		await self.wait_for_page_quiet(timeout=timeout, quiet_time=quiet_time, since=since)
+
+	def _watch_requests(self, page: Page) -> NetworkIdleWatcher:
+		"""The watcher following the requests of the page since the session started, or since now for pages it missed"""
+		watcher = self.session.request_watchers.get(page) if self.session else None
+		if watcher is None:
+			watcher = NetworkIdleWatcher(page, resource_types=ACTION_RESOURCE_TYPES)
+			watcher.start()
+			if self.session:
+				self.session.request_watchers[page] = watcher
+		return watcher
 
 	def _is_url_allowed(self, url: str) -> bool:
 		"""Check if a URL is allowed based on the whitelist configuration."""
@@ -1030,7 +1132,7 @@ class BrowserContext:
 			self.human_current_page = None
 
 		# Switch to the first available tab if any exist
-		if session.context.pages:
+		if session.tabs.pages:
 			await self.switch_to_tab(0)
 			# switch_to_tab already updates both tab references
 
@@ -1118,15 +1220,17 @@ class BrowserContext:
 		return structure
 
 	@time_execution_sync('--get_state')  # This decorator might need to be updated to handle async
-	async def get_state(self, cache_clickable_elements_hashes: bool) -> BrowserState:
+	async def get_state(self, cache_clickable_elements_hashes: bool, include_screenshot: bool = True) -> BrowserState:
 		"""Get the current state of the browser
 
 		cache_clickable_elements_hashes: bool
 			If True, cache the clickable elements hashes for the current state. This is used to calculate which elements are new to the llm (from last message) -> reduces token usage.
+		include_screenshot: bool
+			If False, the state has no screenshot, which saves capturing one. take_screenshot() captures one on demand.
 		"""
 		await self._wait_for_page_and_frames_load()
 		session = await self.get_session()
-		updated_state = await self._get_updated_state()
+		updated_state = await self._get_updated_state(include_screenshot=include_screenshot)
 
 		# Find out which elements are new
 		# Do this only if url has not changed
@@ -1158,29 +1262,53 @@ class BrowserContext:
 
 		return session.cached_state
 
-	async def _get_updated_state(self, focus_element: int = -1) -> BrowserState:
-		"""Update and return state."""
-		session = await self.get_session()
+	async def _get_updated_state(self, focus_element: int = -1, include_screenshot: bool = True) -> BrowserState:
+		"""
+		Update and return state.
 
-		# Check if current page is still valid, if not switch to another available page
+		The extractor call also removes the previous highlights and reads the scroll position and title, the screenshot
+		and the tab info are then taken concurrently. The page is only checked for liveness when the extractor fails.
+		"""
+		session = await self.get_session()
 		try:
 			page = await self.get_agent_current_page()
-			# Test if page is still accessible
-			await page.evaluate('1')
 		except Exception as e:
 			logger.debug(f'👋  Current page is no longer accessible: {str(e)}')
 			raise BrowserError('Browser closed: no valid pages available')
 
 		try:
-			await self.remove_highlights()
-			dom_service = DomService(page)
-			content = await dom_service.get_clickable_elements(
-				focus_element=focus_element,
-				viewport_expansion=self.config.viewport_expansion,
-				highlight_elements=self.config.highlight_elements,
+			started = time.perf_counter()
+			snapshot_patcher = None
+			if self.config.incremental_dom_snapshots:
+				snapshot_patcher = session.dom_snapshot_patchers.setdefault(page, DomSnapshotPatcher())
+			dom_service = DomService(
+				page,
+				snapshot_patcher=snapshot_patcher,
+				columnar=self.config.columnar_dom_transfer,
+				text_mode=self.config.dom_text_mode,
+				xpath_mode=self.config.dom_xpath_mode,
+				track_changes=self.config.screencast,
 			)
+			try:
+				content = await dom_service.get_clickable_elements(
+					focus_element=focus_element,
+					viewport_expansion=self.config.viewport_expansion,
+					highlight_elements=self.config.highlight_elements,
+					max_nodes=self.config.dom_max_nodes,
+					time_budget_ms=self.config.dom_time_budget_ms,
+				)
+			except Exception:
+				await self._raise_if_page_closed(page)
+				raise
+			dom_finished = time.perf_counter()
 
-			tabs_info = await self.get_tabs_info()
+			if include_screenshot:
+				screenshot_b64, tabs_info = await asyncio.gather(
+					self.take_screenshot(page_info=content.page_info), self.get_tabs_info()
+				)
+			else:
+				screenshot_b64, tabs_info = None, await self.get_tabs_info()
+			finished = time.perf_counter()
 
 			# Get all cross-origin iframes within the page and open them in new tabs
 			# mark the titles of the new tabs so the LLM knows to check them for additional content
@@ -1202,9 +1330,6 @@ class BrowserContext:
 			# 		)
 			# 	)
 
-			screenshot_b64 = await self.take_screenshot()
-			pixels_above, pixels_below = await self.get_scroll_info(page)
-
 			# Find the agent's active tab ID
 			agent_current_page_id = 0
 			if self.agent_current_page:
@@ -1213,18 +1338,37 @@ class BrowserContext:
 						agent_current_page_id = tab_info.page_id
 						break
 
+			request_blocker = self.session.request_blocker if self.session else None
+			blocked_requests = request_blocker.take_step_stats() if request_blocker is not None else None
+
+			page_info = content.page_info
+			assert page_info is not None
+			timings = {'dom': dom_finished - started, 'screenshot_and_tabs': finished - dom_finished, 'total': finished - started}
+			logger.debug(
+				'State captured in %.0f ms (dom %.0f ms, screenshot and tabs %.0f ms)',
+				timings['total'] * 1000,
+				timings['dom'] * 1000,
+				timings['screenshot_and_tabs'] * 1000,
+			)
+
 			self.current_state = BrowserState(
 				element_tree=content.element_tree,
 				selector_map=content.selector_map,
 				url=page.url,
-				title=await page.title(),
+				title=page_info.title,
 				tabs=tabs_info,
 				screenshot=screenshot_b64,
-				pixels_above=pixels_above,
-				pixels_below=pixels_below,
+				pixels_above=page_info.pixels_above,
+				pixels_below=page_info.pixels_below,
+				truncation=content.truncation,
+				page_info=page_info,
+				timings=timings,
+				blocked_requests=blocked_requests,
 			)
 
 			return self.current_state
+		except BrowserError:
+			raise
 		except Exception as e:
 			logger.error(f'❌  Failed to update state: {str(e)}')
 			# Return last known good state if available
@@ -1232,33 +1376,143 @@ class BrowserContext:
 				return self.current_state
 			raise
 
+	async def _raise_if_page_closed(self, page: Page) -> None:
+		"""Tells a closed browser apart from a page that failed to evaluate, with one more round trip"""
+		try:
+			await page.evaluate('1')
+		except Exception as e:
+			logger.debug(f'👋  Current page is no longer accessible: {str(e)}')
+			raise BrowserError('Browser closed: no valid pages available')
+
 	# region - Browser Actions
 	@time_execution_async('--take_screenshot')
-	async def take_screenshot(self, full_page: bool = False) -> str:
+	async def take_screenshot(self, full_page: bool = False, page_info: DOMPageInfo | None = None) -> str:
 		"""
-		Returns a base64 encoded screenshot of the current page.
+		Returns a base64 encoded screenshot of the current page, in the configured screenshot_format.
+
+		The viewport is captured with CDP Page.captureScreenshot, which returns the image base64 encoded and
+		downscales it in the browser. Full pages, and browsers without CDP, are captured with Playwright, see
+		BrowserContextConfig.screenshot_format and screenshot_max_dimension for its limits.
+		With screencast enabled, the newest screencast frame is returned instead when it is newer than
+		`page_info.last_change`, after briefly waiting for a frame that shows a just drawn highlight overlay.
+		page_info: the scroll position and viewport of the page, read from the page (after waiting for it to load) when
+		not given.
 		"""
 		page = await self.get_agent_current_page()
 
 		# We no longer force tabs to the foreground as it disrupts user focus
 		# await page.bring_to_front()
-		await page.wait_for_load_state()
+		if page_info is None:
+			# a state capture (which passes page_info) has waited for the page load already
+			await page.wait_for_load_state()
+
+		if not full_page and self.config.screencast:
+			screencast = await self._get_screencast(page)
+			if screencast is not None and page_info is not None and page_info.last_change is not None:
+				overlay_change = page_info.last_overlay_change
+				if overlay_change is not None and overlay_change > page_info.last_change:
+					# the overlay is a paint away from the next frame, waiting for it is cheaper than a capture
+					frame = await screencast.wait_for_frame_since(overlay_change, timeout=SCREENCAST_OVERLAY_FRAME_TIMEOUT)
+				else:
+					frame = screencast.frame_since(page_info.last_change)
+				if frame is not None:
+					return frame.data
+				logger.debug('Screencast frame is older than the last change of the page, capturing a screenshot')
 
-		screenshot = await page.screenshot(
-			full_page=full_page,
-			animations='disabled',
-		)
+		if not full_page:
+			try:
+				return await self._capture_viewport_screenshot(page, page_info)
+			except Exception as e:
+				logger.debug(f'CDP screenshot failed, taking it with Playwright: {e}')
+
+		options = {}
+		if self.config.screenshot_format != 'png':
+			if self.config.screenshot_format == 'webp':
+				logger.warning('Playwright cannot encode WebP, taking the screenshot as JPEG')
+			options.update(type='jpeg', quality=self.config.screenshot_quality)
+		if self.config.screenshot_max_dimension:
+			# Playwright cannot scale to a size, one image pixel per CSS pixel is the smallest it renders
+			options['scale'] = 'css'
+		screenshot = await page.screenshot(full_page=full_page, animations='disabled', **options)
 
-		screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
+		# a large screenshot takes a few milliseconds to encode, dont block the event loop meanwhile
+		screenshot_b64 = await asyncio.to_thread(lambda: base64.b64encode(screenshot).decode('utf-8'))
 
 		# await self.remove_highlights()
 
 		return screenshot_b64
 
+	async def _capture_viewport_screenshot(self, page: Page, page_info: DOMPageInfo | None) -> str:
+		if page_info is not None:
+			scroll_x, scroll_y = page_info.scroll_x, page_info.scroll_y
+			width, height, device_pixel_ratio = page_info.viewport_width, page_info.viewport_height, page_info.device_pixel_ratio
+		else:
+			scroll_x, scroll_y, width, height, device_pixel_ratio = await page.evaluate(
+				'() => [window.scrollX, window.scrollY, window.innerWidth, window.innerHeight, window.devicePixelRatio]'
+			)
+
+		params = {'format': self.config.screenshot_format, 'optimizeForSpeed': True, 'captureBeyondViewport': False}
+		if self.config.screenshot_quality is not None and self.config.screenshot_format != 'png':
+			params['quality'] = self.config.screenshot_quality
+		if width > 0 and height > 0:
+			# the clip is in page coordinates, its scale applies on top of the device pixel ratio
+			scale = 1.0
+			if self.config.screenshot_max_dimension:
+				scale = min(1.0, self.config.screenshot_max_dimension / (max(width, height) * device_pixel_ratio))
+			params['clip'] = {'x': scroll_x, 'y': scroll_y, 'width': width, 'height': height, 'scale': scale}
+
+		cdp_session = await self._get_cdp_session(page)
+		try:
+			result = await cdp_session.send('Page.captureScreenshot', params)
+		except Exception:
+			# the session may be detached, the next screenshot attaches a new one
+			session = await self.get_session()
+			session.cdp_sessions.pop(page, None)
+			raise
+		return result['data']
+
+	async def get_screencast_frames(self) -> list[ScreencastFrame]:
+		"""The latest screencast frames of the agent's current tab, oldest first (empty without screencast)"""
+		session = await self.get_session()
+		screencast = session.screencasts.get(await self.get_agent_current_page())
+		return list(screencast.frames) if screencast else []
+
+	async def _get_screencast(self, page: Page) -> PageScreencast | None:
+		"""The screencast of a page, started on first use: its first screenshot is still captured directly"""
+		session = await self.get_session()
+		if page in session.screencasts:
+			return session.screencasts[page]
+
+		try:
+			screencast = PageScreencast(
+				await self._get_cdp_session(page),
+				max_frames=self.config.screencast_buffer_size,
+				# screencasts only send JPEG and PNG frames
+				format='png' if self.config.screenshot_format == 'png' else 'jpeg',
+				quality=self.config.screenshot_quality,
+				max_dimension=self.config.screenshot_max_dimension,
+			)
+			await screencast.start()
+		except Exception as e:
+			logger.debug(f'Failed to start the screencast of {page.url}, capturing screenshots directly: {e}')
+			screencast = None
+		session.screencasts[page] = screencast
+		return screencast
+
+	async def _get_cdp_session(self, page: Page) -> CDPSession:
+		"""The CDP session of a page, attached once and kept until the page is gone"""
+		session = await self.get_session()
+		cdp_session = session.cdp_sessions.get(page)
+		if cdp_session is None:
+			cdp_session = await session.context.new_cdp_session(page)
+			session.cdp_sessions[page] = cdp_session
+		return cdp_session
+
 	@time_execution_async('--remove_highlights')
 	async def remove_highlights(self):
 		"""
-		Removes all highlight overlays and labels created by the highlightElement function.
+		Removes all highlight overlays and labels created by buildDomTree.js, together with the
+		scroll/resize listeners that keep them positioned.
 		Handles cases where the page might be closed or inaccessible.
 		"""
 		try:
@@ -1266,6 +1520,11 @@ class BrowserContext:
 			await page.evaluate(
 				"""
                 try {
+                    // Detach the shared scroll/resize listeners of the highlights
+                    if (window.__browserUseOverlays) {
+                        window.__browserUseOverlays.teardown();
+                    }
+
                     // Remove the highlight container and all its contents
                     const container = document.getElementById('playwright-highlight-container');
                     if (container) {
@@ -1617,8 +1876,8 @@ class BrowserContext:
 			disabled = await disabled_handle.json_value() if disabled_handle else False
 
 			# always click the element first to make sure it's in the focus
-			await element_handle.click()
-			await asyncio.sleep(0.1)
+			async with self.settle_after(timeout=0.1):
+				await element_handle.click()
 
 			try:
 				if (await is_contenteditable.json_value() or tag_name == 'input') and not (readonly or disabled):
@@ -1652,32 +1911,27 @@ class BrowserContext:
 			if element_handle is None:
 				raise Exception(f'Element: {repr(element_node)} not found')
 
+			downloads = self.session.downloads if self.session else None
+			# links download without a navigation the download manager could see coming (download attribute, blob URLs)
+			download_expected = 'download' in element_node.attributes or (
+				element_node.tag_name == 'a' and 'href' in element_node.attributes
+			)
+
 			async def perform_click(click_func):
 				"""Performs the actual click, handling both download
 				and navigation scenarios."""
-				if self.config.save_downloads_path:
-					try:
-						# Try short-timeout expect_download to detect a file download has been been triggered
-						async with page.expect_download(timeout=5000) as download_info:
-							await click_func()
-						download = await download_info.value
-						# Determine file path
-						suggested_filename = download.suggested_filename
-						unique_filename = await self._get_unique_filename(self.config.save_downloads_path, suggested_filename)
-						download_path = os.path.join(self.config.save_downloads_path, unique_filename)
-						await download.save_as(download_path)
-						logger.debug(f'⬇️  Download triggered. Saved file to: {download_path}')
-						return download_path
-					except TimeoutError:
-						# If no download is triggered, treat as normal click
-						logger.debug('No download triggered within timeout. Checking navigation...')
-						await page.wait_for_load_state()
-						await self._check_and_handle_navigation(page)
-				else:
-					# Standard click logic if no download is expected
-					await click_func()
-					await page.wait_for_load_state()
-					await self._check_and_handle_navigation(page)
+				click_started = asyncio.get_running_loop().time()
+				await click_func()
+				await page.wait_for_load_state()
+				await self._check_and_handle_navigation(page)
+
+				if downloads is not None:
+					# downloads are saved in the background, report one the click started
+					download = await downloads.wait_for_download(
+						since=click_started, timeout=self.config.download_correlation_window, expected=download_expected
+					)
+					if download is not None:
+						return download.path
 
 			try:
 				return await perform_click(lambda: element_handle.click(timeout=1500))
@@ -1700,25 +1954,13 @@ class BrowserContext:
 	async def get_tabs_info(self) -> list[TabInfo]:
 		"""Get information about all tabs"""
 		session = await self.get_session()
-
-		tabs_info = []
-		for page_id, page in enumerate(session.context.pages):
-			try:
-				tab_info = TabInfo(page_id=page_id, url=page.url, title=await asyncio.wait_for(page.title(), timeout=1))
-			except TimeoutError:
-				# page.title() can hang forever on tabs that are crashed/disappeared/about:blank
-				# we dont want to try automating those tabs because they will hang the whole script
-				logger.debug('⚠  Failed to get tab info for tab #%s: %s (ignoring)', page_id, page.url)
-				tab_info = TabInfo(page_id=page_id, url='about:blank', title='ignore this tab and do not use it')
-			tabs_info.append(tab_info)
-
-		return tabs_info
+		return await session.tabs.get_tabs_info()
 
 	@time_execution_async('--switch_to_tab')
 	async def switch_to_tab(self, page_id: int) -> None:
 		"""Switch to a specific tab by its page_id"""
 		session = await self.get_session()
-		pages = session.context.pages
+		pages = session.tabs.pages
 
 		if page_id >= len(pages):
 			raise BrowserError(f'No tab found with page_id: {page_id}')
@@ -1731,11 +1973,12 @@ class BrowserContext:
 
 		# Update target ID if using CDP
 		if self.browser.config.cdp_url:
-			targets = await self._get_cdp_targets()
-			for target in targets:
-				if target['url'] == page.url:
-					self.state.target_id = target['targetId']
-					break
+			target_id = session.tabs.target_id(page)
+			if target_id is None:
+				targets = await self._get_cdp_targets()
+				target_id = next((target['targetId'] for target in targets if target['url'] == page.url), None)
+			if target_id is not None:
+				self.state.target_id = target_id
 
 		# Update both tab references - agent wants this tab, and it's now in the foreground
 		self.agent_current_page = page
@@ -1862,16 +2105,6 @@ class BrowserContext:
 		session.cached_state = None
 		self.state.target_id = None
 
-	async def _get_unique_filename(self, directory, filename):
-		"""Generate a unique filename by appending (1), (2), etc., if a file already exists."""
-		base, ext = os.path.splitext(filename)
-		counter = 1
-		new_filename = filename
-		while os.path.exists(os.path.join(directory, new_filename)):
-			new_filename = f'{base} ({counter}){ext}'
-			counter += 1
-		return new_filename
-
 	async def _get_cdp_targets(self) -> list[dict]:
 		"""Get all CDP targets directly using CDP protocol"""
 		if not self.browser.config.cdp_url or not self.session:
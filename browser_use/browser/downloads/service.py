@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from browser_use.browser.downloads.views import DownloadRecord
+
+if TYPE_CHECKING:
+	from patchright.async_api import BrowserContext as PlaywrightBrowserContext
+	from patchright.async_api import Download, Page, Request, Response
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadManager:
+	"""
+	Saves every download of the browser context to a directory as it happens, whichever tab it starts in.
+
+	Downloads are picked up from the Playwright `download` events of the pages and saved in the background, so an action
+	does not have to expect a download: it asks afterwards which downloads started since it began.
+
+	A download is announced by the navigation that turns into it: while a navigation the action started has no response
+	yet, or its response is an attachment, a download may still start and is waited for. Downloads without a navigation
+	(`<a download>`, blob URLs, scripts) announce nothing, the action tells when it expects one.
+	"""
+
+	def __init__(self, context: 'PlaywrightBrowserContext', save_dir: str):
+		self.context = context
+		self.save_dir = save_dir
+		self.downloads: list[DownloadRecord] = []
+		# set when a download started or a navigation got its response or ended
+		self._changed = asyncio.Event()
+		# navigations without a response yet, and navigations answered with an attachment or aborted, with the time they started
+		self._pending_navigations: dict['Request', float] = {}
+		self._attachments: dict['Request', float] = {}
+		# file names of the downloads being saved, which are not on disk yet
+		self._reserved_filenames: set[str] = set()
+		# keeps the save tasks alive until they are done
+		self._tasks: set[asyncio.Task] = set()
+
+	def start(self) -> None:
+		for page in self.context.pages:
+			self._add(page)
+		self.context.on('page', self._add)
+
+	async def close(self) -> None:
+		"""Stop following new tabs and wait for the downloads being saved, the browser deletes them with the context"""
+		self.context.remove_listener('page', self._add)
+		if self._tasks:
+			await asyncio.gather(*self._tasks, return_exceptions=True)
+
+	def started_since(self, timestamp: float) -> list[DownloadRecord]:
+		"""The downloads started at or after `timestamp` (event loop time)"""
+		return [record for record in self.downloads if record.started_at >= timestamp]
+
+	def download_expected(self, since: float) -> bool:
+		"""Whether a navigation started at or after `since` may still turn into a download"""
+		return any(started >= since for started in [*self._pending_navigations.values(), *self._attachments.values()])
+
+	async def wait_for_download(self, since: float, timeout: float, expected: bool = False) -> DownloadRecord | None:
+		"""
+		The first download started at or after `since`. When none did, a download is only waited for while one is
+		expected (`expected`, or see download_expected), until `timeout` seconds after `since`.
+
+		Returns None as soon as the events already received are handled when no download is expected.
+		"""
+		loop = asyncio.get_running_loop()
+		# the download event of the action may be received but not dispatched yet
+		await asyncio.sleep(0)
+		while True:
+			started = self.started_since(since)
+			if started:
+				return started[0]
+			remaining = since + timeout - loop.time()
+			if remaining <= 0 or not (expected or self.download_expected(since)):
+				return None
+			self._changed.clear()
+			try:
+				await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+			except asyncio.TimeoutError:
+				pass
+
+	def _add(self, page: 'Page') -> None:
+		page.on('download', self._on_download)
+		page.on('request', self._on_request)
+		page.on('response', self._on_response)
+		page.on('requestfinished', self._on_request_finished)
+		page.on('requestfailed', self._on_request_failed)
+
+	def _on_request(self, request: 'Request') -> None:
+		if request.resource_type == 'document' and request.is_navigation_request():
+			self._pending_navigations[request] = asyncio.get_running_loop().time()
+
+	def _on_response(self, response: 'Response') -> None:
+		started = self._pending_navigations.pop(response.request, None)
+		if started is None:
+			return
+		if response.headers.get('content-disposition', '').lower().startswith('attachment'):
+			# the download event follows
+			self._attachments[response.request] = started
+		self._changed.set()
+
+	def _on_request_finished(self, request: 'Request') -> None:
+		if self._pending_navigations.pop(request, None) is not None:
+			self._changed.set()
+
+	def _on_request_failed(self, request: 'Request') -> None:
+		started = self._pending_navigations.pop(request, None)
+		if started is not None:
+			# the browser aborts a navigation that turns into a download, the download event may follow
+			self._attachments[request] = started
+			self._changed.set()
+
+	def _on_download(self, download: 'Download') -> None:
+		record = DownloadRecord(
+			url=download.url,
+			suggested_filename=download.suggested_filename,
+			path=os.path.join(self.save_dir, self._reserve_filename(download.suggested_filename)),
+			started_at=asyncio.get_running_loop().time(),
+		)
+		self.downloads.append(record)
+		# the attachment turned into this download, or into none the browser reports (e.g. a blocked one)
+		self._attachments.clear()
+		self._changed.set()
+		logger.debug(f'⬇️  Download started: {record.url}')
+
+		task = asyncio.create_task(self._save(record, download))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _save(self, record: DownloadRecord, download: 'Download') -> None:
+		try:
+			# the browser writes the file while it downloads, save_as copies (or streams from a remote browser) once it finished
+			await download.save_as(record.path)
+			record.finished = True
+			logger.debug(f'⬇️  Download finished. Saved file to: {record.path}')
+		except Exception as e:
+			record.error = str(e)
+			logger.warning(f'⚠️  Failed to save download {record.url}: {e}')
+		finally:
+			self._reserved_filenames.discard(os.path.basename(record.path))
+
+	def _reserve_filename(self, filename: str) -> str:
+		"""A file name that is neither on disk nor taken by another download, by appending (1), (2), etc."""
+		base, ext = os.path.splitext(filename)
+		counter = 1
+		new_filename = filename
+		while new_filename in self._reserved_filenames or os.path.exists(os.path.join(self.save_dir, new_filename)):
+			new_filename = f'{base} ({counter}){ext}'
+			counter += 1
+		self._reserved_filenames.add(new_filename)
+		return new_filename
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class DownloadRecord:
+	"""A download of the browser context, saved to the downloads directory"""
+
+	url: str
+	suggested_filename: str
+	# where the file is saved, reserved when the download starts
+	path: str
+	# event loop time when the download started
+	started_at: float
+	finished: bool = False
+	error: str | None = None
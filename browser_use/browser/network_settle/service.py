@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlparse
+
+from browser_use.browser.network_settle.views import SettleProfile
+
+if TYPE_CHECKING:
+	from patchright.async_api import Page, Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Requests a page needs to be rendered
+RELEVANT_RESOURCE_TYPES = {
+	'document',
+	'stylesheet',
+	'image',
+	'font',
+	'script',
+	'iframe',
+}
+
+# Requests an action may be waiting for: the page resources, and the data requested by the scripts of the page
+ACTION_RESOURCE_TYPES = RELEVANT_RESOURCE_TYPES | {'fetch', 'xhr'}
+
+RELEVANT_CONTENT_TYPES = (
+	'text/html',
+	'text/css',
+	'application/javascript',
+	'image/',
+	'font/',
+	'application/json',
+)
+
+# Responses that are streamed or real-time data
+IGNORED_CONTENT_TYPES = (
+	'streaming',
+	'video',
+	'audio',
+	'webm',
+	'mp4',
+	'event-stream',
+	'websocket',
+	'protobuf',
+)
+
+# Additional patterns to filter out
+IGNORED_URL_PATTERNS = (
+	# Analytics and tracking
+	'analytics',
+	'tracking',
+	'telemetry',
+	'beacon',
+	'metrics',
+	# Ad-related
+	'doubleclick',
+	'adsystem',
+	'adserver',
+	'advertising',
+	# Social media widgets
+	'facebook.com/plugins',
+	'platform.twitter',
+	'linkedin.com/embed',
+	# Live chat and support
+	'livechat',
+	'zendesk',
+	'intercom',
+	'crisp.chat',
+	'hotjar',
+	# Push notifications
+	'push-notifications',
+	'onesignal',
+	'pushwoosh',
+	# Background sync/heartbeat
+	'heartbeat',
+	'ping',
+	'alive',
+	# WebRTC and streaming
+	'webrtc',
+	'rtmp://',
+	'wss://',
+	# Common CDNs for dynamic content
+	'cloudfront.net',
+	'fastly.net',
+)
+
+# one scan of the URL for all the patterns
+IGNORED_URL_PATTERN = re.compile('|'.join(re.escape(pattern) for pattern in IGNORED_URL_PATTERNS))
+
+# Responses larger than this are likely not essential for the page load
+MAX_RELEVANT_CONTENT_LENGTH = 5 * 1024 * 1024
+
+
+def is_relevant_request(request: 'Request', resource_types: set[str] = RELEVANT_RESOURCE_TYPES) -> bool:
+	"""Whether the page has to wait for the request before it is stable"""
+	if request.resource_type not in resource_types:
+		return False
+
+	url = request.url.lower()
+	if url.startswith(('data:', 'blob:')) or IGNORED_URL_PATTERN.search(url):
+		return False
+
+	headers = request.headers
+	return headers.get('purpose') != 'prefetch' and headers.get('sec-fetch-dest') not in ('video', 'audio')
+
+
+def is_relevant_response(response: 'Response') -> bool:
+	"""Whether the response still matters for the page once its headers are known"""
+	content_type = response.headers.get('content-type', '').lower()
+	if any(t in content_type for t in IGNORED_CONTENT_TYPES):
+		return False
+	if not any(ct in content_type for ct in RELEVANT_CONTENT_TYPES):
+		return False
+	content_length = response.headers.get('content-length')
+	return not (content_length and content_length.isdigit() and int(content_length) > MAX_RELEVANT_CONTENT_LENGTH)
+
+
+class NetworkIdleWatcher:
+	"""
+	Follows the relevant requests of a page from the Playwright request events, and wakes a waiter when the last
+	pending one finished, instead of polling the pending requests.
+	"""
+
+	def __init__(self, page: 'Page', resource_types: set[str] = RELEVANT_RESOURCE_TYPES):
+		self.page = page
+		self.resource_types = resource_types
+		# the pending relevant requests with the time they started
+		self._pending: dict['Request', float] = {}
+		self.started = asyncio.get_running_loop().time()
+		# when a relevant request last started or finished
+		self.last_activity = self.started
+		self.request_count = 0
+		# the longest time no relevant request was pending before another one started
+		self.longest_gap = 0.0
+		self._activity = asyncio.Event()
+
+	def start(self) -> None:
+		self.page.on('request', self._on_request)
+		self.page.on('response', self._on_response)
+		self.page.on('requestfailed', self._on_request_failed)
+
+	def stop(self) -> None:
+		self.page.remove_listener('request', self._on_request)
+		self.page.remove_listener('response', self._on_response)
+		self.page.remove_listener('requestfailed', self._on_request_failed)
+
+	@property
+	def pending(self) -> set['Request']:
+		return set(self._pending)
+
+	def pending_since(self, since: float) -> set['Request']:
+		"""The pending requests that started at or after `since` (event loop time)"""
+		return {request for request, started in self._pending.items() if started >= since}
+
+	@property
+	def settle_time(self) -> float:
+		"""Seconds from the start until the last relevant request finished, 0 when there was none"""
+		return self.last_activity - self.started
+
+	async def wait(
+		self, idle_time: float, timeout: float, minimum_wait: Callable[[], float] = lambda: 0, since: float | None = None
+	) -> bool:
+		"""
+		Wait until no relevant request was pending for `idle_time` seconds and `minimum_wait()` seconds passed since
+		`since`, at most `timeout` seconds after `since`.
+
+		`since` (event loop time) defaults to the start of the watcher. A watcher that follows a page across actions is
+		given the start of the action: the requests the action started before the wait are waited for, requests that
+		were pending before it (e.g. long polling) are not.
+
+		Returns False on timeout.
+		"""
+		loop = asyncio.get_running_loop()
+		since = self.started if since is None else since
+		deadline = since + timeout
+		while True:
+			now = loop.time()
+			if not self.pending_since(since):
+				stable_at = max(self.last_activity + idle_time, since + minimum_wait())
+				if now >= stable_at:
+					return True
+				wake_at = min(stable_at, deadline)
+			else:
+				wake_at = deadline
+			if now >= deadline:
+				return False
+
+			self._activity.clear()
+			try:
+				await asyncio.wait_for(self._activity.wait(), timeout=wake_at - now)
+			except asyncio.TimeoutError:
+				pass
+
+	def _on_request(self, request: 'Request') -> None:
+		if is_relevant_request(request, self.resource_types):
+			if not self._pending:
+				self.longest_gap = max(self.longest_gap, asyncio.get_running_loop().time() - self.last_activity)
+			self.request_count += 1
+			self._on_activity()
+			self._pending[request] = self.last_activity
+
+	def _on_response(self, response: 'Response') -> None:
+		request = response.request
+		if self._pending.pop(request, None) is None:
+			return
+		# responses that do not matter for the page do not delay the quiet window
+		if is_relevant_response(response):
+			self._on_activity()
+		else:
+			self._activity.set()
+
+	def _on_request_failed(self, request: 'Request') -> None:
+		if self._pending.pop(request, None) is not None:
+			self._on_activity()
+
+	def _on_activity(self) -> None:
+		self.last_activity = asyncio.get_running_loop().time()
+		self._activity.set()
+
+
+class SettleProfiles:
+	"""
+	The settle times of the recent page loads per domain, from which the minimum wait of the next page load on the
+	domain is learned: a high quantile of the recent settle times, so a page is not captured before most of the pages
+	of the site were stable, and sites that are stable right away are not padded.
+
+	The quiet window is learned the same way from the longest pause between the requests of each load, plus
+	`idle_margin`. It is only learned from `min_idle_samples` loads on, since a too short window captures the page
+	between two requests.
+	"""
+
+	def __init__(self, max_samples: int = 20, quantile: float = 0.9, min_idle_samples: int = 3, idle_margin: float = 0.1):
+		self.max_samples = max_samples
+		self.quantile = quantile
+		self.min_idle_samples = min_idle_samples
+		self.idle_margin = idle_margin
+		self._profiles: dict[str, SettleProfile] = {}
+
+	@staticmethod
+	def domain(url: str) -> str | None:
+		return urlparse(url).hostname
+
+	def record(self, url: str, settle_time: float, idle_gap: float = 0.0) -> None:
+		domain = self.domain(url)
+		if domain is None:
+			return
+		profile = self._profiles.setdefault(
+			domain, SettleProfile(samples=deque(maxlen=self.max_samples), idle_gaps=deque(maxlen=self.max_samples))
+		)
+		profile.samples.append(settle_time)
+		profile.idle_gaps.append(idle_gap)
+
+	def minimum_wait(self, url: str) -> float | None:
+		"""The learned minimum wait for a page load on the domain of the URL, None while nothing was recorded"""
+		domain = self.domain(url)
+		profile = self._profiles.get(domain) if domain else None
+		if profile is None or not profile.samples:
+			return None
+		return self._quantile(profile.samples)
+
+	def idle_time(self, url: str) -> float | None:
+		"""The learned quiet window for a page load on the domain of the URL, None while too few loads were recorded"""
+		domain = self.domain(url)
+		profile = self._profiles.get(domain) if domain else None
+		if profile is None or len(profile.idle_gaps) < self.min_idle_samples:
+			return None
+		return self._quantile(profile.idle_gaps) + self.idle_margin
+
+	def _quantile(self, samples: Iterable[float]) -> float:
+		ordered = sorted(samples)
+		return ordered[min(int(len(ordered) * self.quantile), len(ordered) - 1)]
@@ -0,0 +1,12 @@
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SettleProfile:
+	"""How long the pages of a domain took to become stable"""
+
+	# seconds from the start of a wait until the last relevant request of the page finished, most recent last
+	samples: deque[float] = field(default_factory=deque)
+	# the longest time without a pending relevant request before another one started, per page load
+	idle_gaps: deque[float] = field(default_factory=deque)
@@ -0,0 +1,147 @@
+import logging
+import re
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from browser_use.browser.request_policy.views import BlockedRequestStats, RequestPolicy
+
+if TYPE_CHECKING:
+	from patchright.async_api import BrowserContext as PlaywrightBrowserContext
+	from patchright.async_api import Request, Route
+
+logger = logging.getLogger(__name__)
+
+# Common analytics, advertising and session recording services, blocked with their subdomains
+TRACKER_DOMAINS = (
+	'google-analytics.com',
+	'googletagmanager.com',
+	'googletagservices.com',
+	'googlesyndication.com',
+	'googleadservices.com',
+	'doubleclick.net',
+	'adservice.google.com',
+	'connect.facebook.net',
+	'analytics.twitter.com',
+	'ads-twitter.com',
+	'snap.licdn.com',
+	'bat.bing.com',
+	'clarity.ms',
+	'hotjar.com',
+	'fullstory.com',
+	'mouseflow.com',
+	'crazyegg.com',
+	'segment.com',
+	'segment.io',
+	'mixpanel.com',
+	'amplitude.com',
+	'heap.io',
+	'heapanalytics.com',
+	'scorecardresearch.com',
+	'quantserve.com',
+	'chartbeat.com',
+	'newrelic.com',
+	'nr-data.net',
+	'criteo.com',
+	'criteo.net',
+	'taboola.com',
+	'outbrain.com',
+	'adnxs.com',
+	'adsrvr.org',
+	'rubiconproject.com',
+	'pubmatic.com',
+	'openx.net',
+	'amazon-adsystem.com',
+	'moatads.com',
+	'mc.yandex.ru',
+)
+
+# Typical transfer size of a response per resource type, to estimate what blocking saved
+TYPICAL_TRANSFER_SIZES = {
+	'image': 15_000,
+	'media': 500_000,
+	'font': 30_000,
+	'script': 20_000,
+	'stylesheet': 10_000,
+	'document': 30_000,
+}
+DEFAULT_TRANSFER_SIZE = 5_000
+
+
+def _site(hostname: str) -> str:
+	"""The last two labels of the hostname, a cheap approximation of its registrable domain"""
+	return '.'.join(hostname.rsplit('.', 2)[-2:])
+
+
+class RequestBlocker:
+	"""
+	Applies a RequestPolicy to all the requests of a browser context, with a context route, and counts what it blocked.
+
+	Requests that are not blocked fall back to the other routes of the context.
+	"""
+
+	def __init__(self, policy: RequestPolicy):
+		self.policy = policy
+		url_patterns = [re.escape(pattern.lower()) for pattern in policy.block_url_patterns]
+		self._url_pattern = re.compile('|'.join(url_patterns)) if url_patterns else None
+		domains = [*policy.block_domains, *(TRACKER_DOMAINS if policy.block_trackers else ())]
+		# the domain (or a path on it) after the scheme and any subdomains, at the start of the URL
+		self._domain_pattern = (
+			re.compile(
+				r'^[a-z][a-z0-9+.-]*://([^/?#]*\.)?(' + '|'.join(re.escape(domain.lower()) for domain in domains) + r')([/:?#]|$)'
+			)
+			if domains
+			else None
+		)
+		self.total = BlockedRequestStats()
+		self._since_last_step = BlockedRequestStats()
+
+	async def start(self, context: 'PlaywrightBrowserContext') -> None:
+		await context.route('**/*', self._handle)
+
+	def block_reason(self, request: 'Request') -> str | None:
+		"""Why the policy blocks the request, None when it is allowed"""
+		resource_type = request.resource_type
+		if resource_type in self.policy.block_resource_types:
+			return f'resource type {resource_type}'
+
+		url = request.url.lower()
+		if url.startswith(('data:', 'blob:')):
+			return None
+		if self._url_pattern is not None and self._url_pattern.search(url):
+			return 'URL pattern'
+		if self._domain_pattern is not None and self._domain_pattern.match(url):
+			return 'blocked domain'
+		if self.policy.block_third_party_scripts and resource_type == 'script' and self._is_third_party(request):
+			return 'third-party script'
+		return None
+
+	def take_step_stats(self) -> BlockedRequestStats:
+		"""The requests blocked since the last call"""
+		stats, self._since_last_step = self._since_last_step, BlockedRequestStats()
+		return stats
+
+	async def _handle(self, route: 'Route') -> None:
+		request = route.request
+		reason = self.block_reason(request)
+		if reason is None:
+			await route.fallback()
+			return
+
+		for stats in (self.total, self._since_last_step):
+			stats.count += 1
+			stats.estimated_bytes += TYPICAL_TRANSFER_SIZES.get(request.resource_type, DEFAULT_TRANSFER_SIZE)
+			stats.by_resource_type[request.resource_type] = stats.by_resource_type.get(request.resource_type, 0) + 1
+		logger.debug(f'🚫  Blocked {request.url} ({reason})')
+		await route.abort('blockedbyclient')
+
+	@staticmethod
+	def _is_third_party(request: 'Request') -> bool:
+		try:
+			frame_url = request.frame.url
+		except Exception:
+			# requests of service workers have no frame
+			return False
+		page_host, request_host = urlparse(frame_url).hostname, urlparse(request.url).hostname
+		if not page_host or not request_host:
+			return False
+		return _site(page_host) != _site(request_host)
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel, ConfigDict
+
+
+class RequestPolicy(BaseModel):
+	"""
+	Which requests of the pages are blocked, see BrowserContextConfig.request_policy.
+
+	The presets `text_only()` and `vision()` fit agents that read the page as text, and agents that also look at
+	screenshots.
+	"""
+
+	model_config = ConfigDict(extra='forbid')
+
+	# Playwright resource types, e.g. 'image', 'media', 'font', 'stylesheet', 'script'
+	block_resource_types: set[str] = set()
+	# substrings of the URLs to block, case insensitive
+	block_url_patterns: list[str] = []
+	# domains to block together with their subdomains, e.g. from a tracker or ad block list
+	block_domains: list[str] = []
+	# block the domains of the built-in list of common analytics, advertising and session recording services
+	block_trackers: bool = False
+	# block scripts from other sites than the page loading them
+	block_third_party_scripts: bool = False
+
+	@classmethod
+	def text_only(cls) -> 'RequestPolicy':
+		"""For agents that only read the DOM: no images, media, fonts, trackers or third-party scripts"""
+		return cls(block_resource_types={'image', 'media', 'font'}, block_trackers=True, block_third_party_scripts=True)
+
+	@classmethod
+	def vision(cls) -> 'RequestPolicy':
+		"""For agents that also see screenshots: the page renders as usual, without media and trackers"""
+		return cls(block_resource_types={'media'}, block_trackers=True)
+
+
+@dataclass
+class BlockedRequestStats:
+	"""The requests blocked by the request policy"""
+
+	count: int = 0
+	# rough estimate from the typical transfer size of each resource type, the blocked responses are never seen
+	estimated_bytes: int = 0
+	by_resource_type: dict[str, int] = field(default_factory=dict)
@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from browser_use.browser.response_replay.views import ResponseReplayConfig, ResponseReplayStats, StoredResponse
+
+if TYPE_CHECKING:
+	from patchright.async_api import BrowserContext as PlaywrightBrowserContext
+	from patchright.async_api import Request, Route
+
+logger = logging.getLogger(__name__)
+
+# Unix timestamps in seconds or milliseconds, optionally with a fraction
+TIMESTAMP = re.compile(r'^(\d{10})(\d{3})?(\.\d+)?$')
+# seconds since the epoch a cache buster can plausibly have: 2010-01-01 to 2040-01-01
+TIMESTAMP_RANGE = range(1_262_304_000, 2_208_988_800)
+TIMESTAMP_PLACEHOLDER = ':ts'
+
+# Headers that describe the transfer of the recorded body, not the decoded body that is replayed
+TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# a response served by the replayer: status, headers and body
+ReplayedResponse = tuple[int, dict[str, str], bytes]
+
+
+def is_timestamp(value: str) -> bool:
+	match = TIMESTAMP.match(value)
+	return match is not None and int(match.group(1)) in TIMESTAMP_RANGE
+
+
+def normalize_request_url(url: str, config: ResponseReplayConfig) -> str:
+	"""
+	The URL as it is matched: lowercase host, no fragment, sorted query without the ignored parameters.
+	Path segments are kept as they are, a number there is far more often an id than a cache buster.
+	"""
+	parsed = urlparse(url)
+
+	query = []
+	if '*' not in config.ignore_query_params:
+		for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+			if key in config.ignore_query_params:
+				continue
+			if config.normalize_timestamps and is_timestamp(value):
+				value = TIMESTAMP_PLACEHOLDER
+			query.append((key, value))
+
+	normalized = f'{parsed.scheme}://{parsed.netloc.lower()}{parsed.path}'
+	if query:
+		normalized += '?' + urlencode(sorted(query))
+	return normalized
+
+
+def request_key(method: str, url: str, post_data: bytes | None, config: ResponseReplayConfig) -> str:
+	key = f'{method.upper()} {normalize_request_url(url, config)}'
+	if config.match_post_data and post_data:
+		key += f' {hashlib.sha256(post_data).hexdigest()}'
+	return key
+
+
+def replayable_headers(headers: dict[str, str]) -> dict[str, str]:
+	return {name: value for name, value in headers.items() if name.lower() not in TRANSFER_HEADERS}
+
+
+def load_har(har_path: str | Path, config: ResponseReplayConfig) -> dict[str, list[ReplayedResponse]]:
+	"""The responses of a HAR by request key, in the order they were recorded"""
+	har_path = Path(har_path)
+	har = json.loads(har_path.read_text(encoding='utf-8'))
+
+	responses: dict[str, list[ReplayedResponse]] = {}
+	for entry in har['log']['entries']:
+		request, response = entry['request'], entry['response']
+		if response.get('status', 0) <= 0:
+			# failed or aborted while recording
+			continue
+
+		content = response.get('content', {})
+		if '_file' in content:
+			# recorded with the contents attached next to the HAR
+			body = (har_path.parent / content['_file']).read_bytes()
+		elif content.get('encoding') == 'base64':
+			body = base64.b64decode(content.get('text', ''))
+		else:
+			body = content.get('text', '').encode('utf-8')
+
+		post_data = request.get('postData', {}).get('text')
+		key = request_key(request['method'], request['url'], post_data.encode('utf-8') if post_data else None, config)
+		headers = {}
+		for header in response.get('headers', []):
+			name = header['name'].lower()
+			# repeated headers, e.g. set-cookie, are joined like Playwright joins them
+			headers[name] = f'{headers[name]}\n{header["value"]}' if name in headers else header['value']
+		responses.setdefault(key, []).append((response['status'], replayable_headers(headers), body))
+	return responses
+
+
+class ResponseStore:
+	"""
+	Responses on disk, one JSON file per request key and the bodies in files named by the SHA-256 of their content,
+	so a body shared by many requests (e.g. a library on every page) is stored once.
+	"""
+
+	def __init__(self, directory: str | Path):
+		self.directory = Path(directory)
+		self.responses_dir = self.directory / 'responses'
+		self.bodies_dir = self.directory / 'bodies'
+		self.responses_dir.mkdir(parents=True, exist_ok=True)
+		self.bodies_dir.mkdir(parents=True, exist_ok=True)
+
+	def get(self, key: str) -> ReplayedResponse | None:
+		try:
+			stored = StoredResponse.model_validate_json(self._response_path(key).read_text(encoding='utf-8'))
+			body = (self.bodies_dir / stored.body_hash).read_bytes()
+		except FileNotFoundError:
+			return None
+		except Exception as e:
+			logger.debug(f'Ignoring unreadable stored response for {key}: {e}')
+			return None
+		return stored.status, stored.headers, body
+
+	def put(self, key: str, url: str, status: int, headers: dict[str, str], body: bytes) -> None:
+		body_hash = hashlib.sha256(body).hexdigest()
+		body_path = self.bodies_dir / body_hash
+		if not body_path.exists():
+			self._write(body_path, body)
+		stored = StoredResponse(key=key, url=url, status=status, headers=replayable_headers(headers), body_hash=body_hash)
+		self._write(self._response_path(key), stored.model_dump_json().encode('utf-8'))
+
+	def _response_path(self, key: str) -> Path:
+		return self.responses_dir / f'{hashlib.sha256(key.encode()).hexdigest()}.json'
+
+	@staticmethod
+	def _write(path: Path, data: bytes) -> None:
+		# write a temporary file first, other processes never read a partial file
+		temporary_path = path.with_suffix(f'.{os.getpid()}.tmp')
+		temporary_path.write_bytes(data)
+		os.replace(temporary_path, path)
+
+
+class ResponseReplayer:
+	"""
+	Serves the requests of a browser context from a recorded HAR and a response store, with a context route.
+
+	Requests without a recorded response fail as if the browser were offline, or go to the network with
+	fallback_to_network, where their responses are recorded to the store with record.
+	"""
+
+	def __init__(self, config: ResponseReplayConfig):
+		self.config = config
+		self.store = ResponseStore(config.store_dir) if config.store_dir else None
+		self.stats = ResponseReplayStats()
+		self._har_responses: dict[str, list[ReplayedResponse]] = {}
+
+	async def start(self, context: 'PlaywrightBrowserContext') -> None:
+		if self.config.har_path:
+			self._har_responses = await asyncio.to_thread(load_har, self.config.har_path, self.config)
+			logger.debug(f'Replaying {sum(map(len, self._har_responses.values()))} responses from {self.config.har_path}')
+		await context.route('**/*', self._handle)
+
+	def request_key(self, request: 'Request') -> str:
+		return request_key(request.method, request.url, request.post_data_buffer, self.config)
+
+	async def get_response(self, key: str) -> ReplayedResponse | None:
+		"""The recorded response of the request key, repeated requests get the responses of the HAR in recorded order"""
+		har_responses = self._har_responses.get(key)
+		if har_responses:
+			# the last response is served again once the others were replayed
+			return har_responses.pop(0) if len(har_responses) > 1 else har_responses[0]
+		if self.store is not None:
+			return await asyncio.to_thread(self.store.get, key)
+		return None
+
+	async def _handle(self, route: 'Route') -> None:
+		request = route.request
+		if request.url.startswith(('data:', 'blob:')):
+			await route.fallback()
+			return
+
+		key = self.request_key(request)
+		response = await self.get_response(key)
+		if response is not None:
+			self.stats.hits += 1
+			status, headers, body = response
+			await route.fulfill(status=status, headers=headers, body=body)
+			return
+
+		self.stats.misses += 1
+		if not self.config.fallback_to_network:
+			logger.debug(f'No recorded response for {key}')
+			await route.abort('internetdisconnected')
+			return
+
+		if not self.config.record or self.store is None:
+			await route.fallback()
+			return
+
+		# redirects are recorded as they are, the browser follows them while replaying
+		try:
+			network_response = await route.fetch(max_redirects=0)
+			body = await network_response.body()
+		except Exception as e:
+			# an unhandled error would leave the request hanging until the page times it out
+			logger.debug(f'Failed to fetch {request.url} to record it: {e}')
+			await route.abort('failed')
+			return
+
+		try:
+			await asyncio.to_thread(self.store.put, key, request.url, network_response.status, network_response.headers, body)
+			self.stats.stores += 1
+		except Exception as e:
+			logger.warning(f'Failed to record the response of {request.url}: {e}')
+		await route.fulfill(status=network_response.status, headers=replayable_headers(network_response.headers), body=body)
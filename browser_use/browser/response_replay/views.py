@@ -0,0 +1,51 @@
+from pydantic import BaseModel, ConfigDict, model_validator
+
+
+class ResponseReplayConfig(BaseModel):
+	"""
+	Where the responses are replayed from and how requests are matched to them, see BrowserContextConfig.response_replay.
+	"""
+
+	model_config = ConfigDict(extra='forbid')
+
+	# HAR recorded e.g. with BrowserContextConfig.save_har_path, with the response contents embedded or next to it
+	har_path: str | None = None
+	# directory of the content-addressed response store, searched after the HAR
+	store_dir: str | None = None
+	# send requests without a recorded response to the network, otherwise they fail as if offline
+	fallback_to_network: bool = False
+	# save the responses from the network to store_dir, so the next run can be replayed
+	record: bool = False
+	# query parameters left out when matching, '*' leaves out the whole query
+	ignore_query_params: list[str] = []
+	# match query values that are Unix timestamps between 2010 and 2040 (cache busters) whatever their value
+	normalize_timestamps: bool = True
+	# match the body of POST requests too
+	match_post_data: bool = True
+
+	@model_validator(mode='after')
+	def check_source(self) -> 'ResponseReplayConfig':
+		if not self.har_path and not self.store_dir:
+			raise ValueError('response_replay needs a har_path or a store_dir to replay from')
+		if self.record and not self.store_dir:
+			raise ValueError('response_replay.record needs a store_dir to record to')
+		return self
+
+
+class StoredResponse(BaseModel):
+	"""A response of the store, its body is stored once per content under its SHA-256"""
+
+	key: str
+	url: str
+	status: int
+	headers: dict[str, str]
+	body_hash: str
+
+
+class ResponseReplayStats(BaseModel):
+	# requests served from the HAR or the store
+	hits: int = 0
+	# requests without a recorded response
+	misses: int = 0
+	# responses saved to the store
+	stores: int = 0
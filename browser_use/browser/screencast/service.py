@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from collections import deque
+from typing import TYPE_CHECKING, Literal
+
+from browser_use.browser.screencast.views import ScreencastFrame
+
+if TYPE_CHECKING:
+	from patchright.async_api import CDPSession
+
+logger = logging.getLogger(__name__)
+
+
+class PageScreencast:
+	"""
+	Keeps the latest frames of the CDP screencast of a page (Page.startScreencast) in a ring buffer.
+
+	The browser sends a frame whenever the page is repainted, so the newest frame shows the page as it is, unless
+	the page changed after the frame was painted and the next frame is still on its way. `frame_since()` tells
+	these apart with the time of the last change of the page.
+	"""
+
+	def __init__(
+		self,
+		cdp_session: 'CDPSession',
+		max_frames: int = 10,
+		format: Literal['jpeg', 'png'] = 'jpeg',
+		quality: int | None = None,
+		max_dimension: int | None = None,
+	):
+		self.cdp_session = cdp_session
+		self.format = format
+		self.quality = quality
+		self.max_dimension = max_dimension
+		self.frames: deque[ScreencastFrame] = deque(maxlen=max_frames)
+		# set (and replaced) whenever a frame arrives
+		self._frame_added = asyncio.Event()
+		# keeps the frame acknowledgements alive until they are sent
+		self._tasks: set[asyncio.Task] = set()
+
+	async def start(self) -> None:
+		self.cdp_session.on('Page.screencastFrame', self._on_frame)
+		params = {'format': self.format, 'everyNthFrame': 1}
+		if self.quality is not None and self.format == 'jpeg':
+			params['quality'] = self.quality
+		if self.max_dimension:
+			# the frames are scaled down to fit both
+			params['maxWidth'] = params['maxHeight'] = self.max_dimension
+		await self.cdp_session.send('Page.startScreencast', params)
+
+	async def stop(self) -> None:
+		self.cdp_session.remove_listener('Page.screencastFrame', self._on_frame)
+		for task in self._tasks:
+			task.cancel()
+		try:
+			await self.cdp_session.send('Page.stopScreencast')
+		except Exception as e:
+			logger.debug(f'Failed to stop the screencast: {e}')
+
+	@property
+	def latest_frame(self) -> ScreencastFrame | None:
+		return self.frames[-1] if self.frames else None
+
+	def frame_since(self, timestamp: float) -> ScreencastFrame | None:
+		"""The newest frame if it was painted at or after `timestamp` (seconds since the epoch), None when it is stale"""
+		frame = self.latest_frame
+		if frame is None or frame.timestamp is None or frame.timestamp < timestamp:
+			return None
+		return frame
+
+	async def wait_for_frame_since(self, timestamp: float, timeout: float) -> ScreencastFrame | None:
+		"""Like `frame_since()`, but waits up to `timeout` seconds for the next frames while the newest one is stale"""
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + timeout
+		while (frame := self.frame_since(timestamp)) is None:
+			remaining = deadline - loop.time()
+			if remaining <= 0:
+				return None
+			try:
+				await asyncio.wait_for(self._frame_added.wait(), timeout=remaining)
+			except asyncio.TimeoutError:
+				return None
+		return frame
+
+	def _on_frame(self, event: dict) -> None:
+		metadata = event.get('metadata', {})
+		self.frames.append(ScreencastFrame(data=event['data'], timestamp=metadata.get('timestamp'), metadata=metadata))
+		self._frame_added.set()
+		self._frame_added = asyncio.Event()
+
+		# the browser sends the next frame only once this one is acknowledged
+		task = asyncio.create_task(self._acknowledge(event['sessionId']))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _acknowledge(self, session_id: int) -> None:
+		try:
+			await self.cdp_session.send('Page.screencastFrameAck', {'sessionId': session_id})
+		except Exception as e:
+			logger.debug(f'Failed to acknowledge a screencast frame: {e}')
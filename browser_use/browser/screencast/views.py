@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ScreencastFrame:
+	"""A frame of a CDP screencast, as sent by Page.screencastFrame"""
+
+	# base64 encoded JPEG or PNG of the viewport
+	data: str
+	# seconds since the epoch when the browser painted the frame, None when the browser did not report it
+	timestamp: float | None
+	# Page.ScreencastFrameMetadata: scroll offsets, page scale factor and device size of the frame
+	metadata: dict = field(default_factory=dict)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from browser_use.browser.tab_registry.views import TabRecord
+from browser_use.browser.views import TabInfo
+
+if TYPE_CHECKING:
+	from patchright.async_api import BrowserContext as PlaywrightBrowserContext
+	from patchright.async_api import CDPSession, Frame, Page
+
+logger = logging.getLogger(__name__)
+
+
+def target_title(target_info: dict) -> str:
+	"""The title of a CDP target, Chrome reports the URL as title of pages without one where page.title() returns ''"""
+	title, url = target_info.get('title', ''), target_info.get('url', '')
+	return '' if title in (url, url.split('://', 1)[-1]) else title
+
+
+class TabRegistry:
+	"""
+	The open tabs of a browser context in opening order (the order of `context.pages`), with their URL and title.
+
+	The registry follows the Playwright `page`, `close` and `framenavigated` events, and the CDP
+	`Target.targetInfoChanged` events for the titles, so listing the tabs or checking whether a page is still open
+	needs no round trip to the browser. Titles the registry does not know (no CDP, or the target of a new tab is not
+	resolved yet) are read from the page when the tabs are listed.
+	"""
+
+	def __init__(self, context: 'PlaywrightBrowserContext'):
+		self.context = context
+		# opening order
+		self._records: dict['Page', TabRecord] = {}
+		self._records_by_target_id: dict[str, TabRecord] = {}
+		self._cdp_session: 'CDPSession | None' = None
+		# keeps the target resolution tasks alive until they are done
+		self._tasks: set[asyncio.Task] = set()
+
+	async def start(self) -> None:
+		"""Register the open tabs and follow the tabs opened later"""
+		browser = self.context.browser
+		if browser is not None:
+			try:
+				self._cdp_session = await browser.new_browser_cdp_session()
+				self._cdp_session.on('Target.targetInfoChanged', self._on_target_info_changed)
+				await self._cdp_session.send('Target.setDiscoverTargets', {'discover': True})
+			except Exception as e:
+				logger.debug(f'Tab titles are read from the pages, CDP target events are not available: {e}')
+				self._cdp_session = None
+
+		# no await from here on, so no page is missed between listing the open ones and following new ones
+		for page in self.context.pages:
+			self._add(page)
+		self.context.on('page', self._add)
+
+	async def close(self) -> None:
+		self.context.remove_listener('page', self._add)
+		for task in self._tasks:
+			task.cancel()
+		if self._cdp_session is not None:
+			try:
+				await self._cdp_session.detach()
+			except Exception as e:
+				logger.debug(f'Failed to detach the tab registry CDP session: {e}')
+			self._cdp_session = None
+
+	@property
+	def pages(self) -> list['Page']:
+		return list(self._records)
+
+	def target_id(self, page: 'Page') -> str | None:
+		record = self._records.get(page)
+		return record.target_id if record else None
+
+	def __contains__(self, page: object) -> bool:
+		return page in self._records
+
+	def __len__(self) -> int:
+		return len(self._records)
+
+	async def get_tabs_info(self, title_timeout: float = 1) -> list[TabInfo]:
+		"""The open tabs, their page_id is the position in `pages`"""
+		records = list(self._records.values())
+		titles = await asyncio.gather(*(self._get_title(record, title_timeout) for record in records))
+
+		tabs_info = []
+		for page_id, (record, title) in enumerate(zip(records, titles)):
+			if title is None:
+				# page.title() can hang forever on tabs that are crashed/disappeared/about:blank
+				# we dont want to try automating those tabs because they will hang the whole script
+				tabs_info.append(TabInfo(page_id=page_id, url='about:blank', title='ignore this tab and do not use it'))
+			else:
+				tabs_info.append(TabInfo(page_id=page_id, url=record.url, title=title))
+		return tabs_info
+
+	async def _get_title(self, record: TabRecord, timeout: float) -> str | None:
+		if record.title is not None:
+			return record.title
+		try:
+			title = await asyncio.wait_for(record.page.title(), timeout=timeout)
+		except Exception as e:
+			logger.debug('⚠  Failed to get tab info for tab %s (ignoring): %s', record.url, e)
+			return None
+		# a navigation may have started meanwhile, its title is read next time
+		if record.title is None and record.url == record.page.url:
+			record.title = title
+		return title
+
+	def _add(self, page: 'Page') -> None:
+		if page in self._records:
+			return
+		record = TabRecord(page=page, url=page.url)
+		self._records[page] = record
+
+		page.on('close', self._remove)
+		page.on('framenavigated', lambda frame: self._on_navigated(record, frame))
+		# the title is usually set by the time the DOM is loaded, it may be missing when the navigation is committed
+		page.on('domcontentloaded', lambda page: self._forget_title(record))
+
+		if self._cdp_session is not None:
+			task = asyncio.create_task(self._resolve_target(record))
+			self._tasks.add(task)
+			task.add_done_callback(self._tasks.discard)
+
+	def _remove(self, page: 'Page') -> None:
+		record = self._records.pop(page, None)
+		if record and record.target_id:
+			self._records_by_target_id.pop(record.target_id, None)
+
+	def _on_navigated(self, record: TabRecord, frame: 'Frame') -> None:
+		if frame.parent_frame is not None:
+			return
+		record.url = frame.url
+		self._forget_title(record)
+
+	def _forget_title(self, record: TabRecord) -> None:
+		# titles of resolved targets are kept up to date by the CDP events
+		if record.target_id is None:
+			record.title = None
+
+	async def _resolve_target(self, record: TabRecord) -> None:
+		"""Find the CDP target of a tab, its title changes are followed from then on"""
+		try:
+			cdp_session = await self.context.new_cdp_session(record.page)
+			target_info = (await cdp_session.send('Target.getTargetInfo'))['targetInfo']
+			await cdp_session.detach()
+		except Exception as e:
+			logger.debug(f'Failed to resolve the CDP target of tab {record.url}: {e}')
+			return
+
+		if record.page not in self._records:
+			return
+		record.target_id = target_info['targetId']
+		record.title = target_title(target_info)
+		self._records_by_target_id[record.target_id] = record
+
+	def _on_target_info_changed(self, event: dict) -> None:
+		target_info = event['targetInfo']
+		record = self._records_by_target_id.get(target_info['targetId'])
+		if record is not None:
+			record.title = target_title(target_info)
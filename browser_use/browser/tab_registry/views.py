@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+	from patchright.async_api import Page
+
+
+@dataclass
+class TabRecord:
+	"""What the tab registry knows about an open tab"""
+
+	page: 'Page'
+	url: str
+	# None while unknown: the CDP target of the tab is not resolved (yet) and the title was not read since the last navigation
+	title: str | None = None
+	target_id: str | None = None
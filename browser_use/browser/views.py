@@ -3,6 +3,7 @@ from typing import Any
 
 from pydantic import BaseModel
 
+from browser_use.browser.request_policy.views import BlockedRequestStats
 from browser_use.dom.history_tree_processor.service import DOMHistoryElement
 from browser_use.dom.views import DOMState
 
@@ -17,6 +18,10 @@ class TabInfo(BaseModel):
 	parent_page_id: int | None = None  # parent page that contains this popup or cross-origin iframe
 
 
+# the base64 encoded magic bytes the image formats of screenshots start with
+SCREENSHOT_MIME_TYPES = {'/9j/': 'image/jpeg', 'UklGR': 'image/webp', 'iVBOR': 'image/png'}
+
+
 @dataclass
 class BrowserState(DOMState):
 	url: str
@@ -26,6 +31,19 @@ class BrowserState(DOMState):
 	pixels_above: int = 0
 	pixels_below: int = 0
 	browser_errors: list[str] = field(default_factory=list)
+	# seconds spent in each phase of the state capture: 'dom', 'screenshot_and_tabs' and 'total'
+	timings: dict[str, float] = field(default_factory=dict)
+	# requests blocked by the request policy since the previous state, None without a request policy
+	blocked_requests: BlockedRequestStats | None = None
+
+	@property
+	def screenshot_mime_type(self) -> str:
+		"""The image format of the screenshot (see BrowserContextConfig.screenshot_format), PNG when unknown"""
+		if self.screenshot:
+			for prefix, mime_type in SCREENSHOT_MIME_TYPES.items():
+				if self.screenshot.startswith(prefix):
+					return mime_type
+		return 'image/png'
 
 
 @dataclass
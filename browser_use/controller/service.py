@@ -123,7 +123,7 @@ class Controller(Generic[Context]):
 				raise Exception(f'Element with index {params.index} does not exist - retry or use alternative actions')
 
 			element_node = await browser.get_dom_element_by_index(params.index)
-			initial_pages = len(session.context.pages)
+			initial_pages = len(session.tabs)
 
 			# if element has file uploader then dont click
 			if await browser.is_file_uploader(element_node):
@@ -136,13 +136,13 @@ class Controller(Generic[Context]):
 			try:
 				download_path = await browser._click_element_node(element_node)
 				if download_path:
-					msg = f'💾  Downloaded file to {download_path}'
+					msg = f'💾  Downloading file to {download_path}'
 				else:
 					msg = f'🖱️  Clicked button with index {params.index}: {element_node.get_all_text_till_next_clickable_element(max_depth=2)}'
 
 				logger.info(msg)
 				logger.debug(f'Element xpath: {element_node.xpath}')
-				if len(session.context.pages) > initial_pages:
+				if len(session.tabs) > initial_pages:
 					new_tab_msg = 'New tab opened - switching to it'
 					msg += f' - {new_tab_msg}'
 					logger.info(new_tab_msg)
@@ -332,8 +332,9 @@ class Controller(Generic[Context]):
 					try:
 						# First check if element exists and is visible
 						if await locator.count() > 0 and await locator.first.is_visible():
-							await locator.first.scroll_into_view_if_needed()
-							await asyncio.sleep(0.5)  # Wait for scroll to complete
+							# Wait for scroll to complete
+							async with browser.settle_after(timeout=0.5):
+								await locator.first.scroll_into_view_if_needed()
 							msg = f'🔍  Scrolled to text: {text}'
 							logger.info(msg)
 							return ActionResult(extracted_content=msg, include_in_memory=True)
@@ -747,18 +748,18 @@ class Controller(Generic[Context]):
 		async def select_cell_or_range(browser: BrowserContext, cell_or_range: str):
 			page = await browser.get_current_page()
 
-			await page.keyboard.press('Enter')  # make sure we dont delete current cell contents if we were last editing
-			await page.keyboard.press('Escape')  # to clear current focus (otherwise select range popup is additive)
-			await asyncio.sleep(0.1)
-			await page.keyboard.press('Home')  # move cursor to the top left of the sheet first
-			await page.keyboard.press('ArrowUp')
-			await asyncio.sleep(0.1)
-			await page.keyboard.press('Control+G')  # open the goto range popup
-			await asyncio.sleep(0.2)
-			await page.keyboard.type(cell_or_range, delay=0.05)
-			await asyncio.sleep(0.2)
-			await page.keyboard.press('Enter')
-			await asyncio.sleep(0.2)
+			async with browser.settle_after(timeout=0.1):
+				await page.keyboard.press('Enter')  # make sure we dont delete current cell contents if we were last editing
+				await page.keyboard.press('Escape')  # to clear current focus (otherwise select range popup is additive)
+			async with browser.settle_after(timeout=0.1):
+				await page.keyboard.press('Home')  # move cursor to the top left of the sheet first
+				await page.keyboard.press('ArrowUp')
+			async with browser.settle_after(timeout=0.2):
+				await page.keyboard.press('Control+G')  # open the goto range popup
+			async with browser.settle_after(timeout=0.2):
+				await page.keyboard.type(cell_or_range, delay=0.05)
+			async with browser.settle_after(timeout=0.2):
+				await page.keyboard.press('Enter')
 			await page.keyboard.press('Escape')  # to make sure the popup still closes in the case where the jump failed
 			return ActionResult(extracted_content=f'Selected cell {cell_or_range}', include_in_memory=False)
 
@@ -770,8 +771,8 @@ class Controller(Generic[Context]):
 
 			await select_cell_or_range(browser, cell_or_range)
 
-			await page.keyboard.press('ControlOrMeta+C')
-			await asyncio.sleep(0.1)
+			async with browser.settle_after(timeout=0.1):
+				await page.keyboard.press('ControlOrMeta+C')
 			extracted_tsv = await page.evaluate('() => navigator.clipboard.readText()')
 			return ActionResult(extracted_content=extracted_tsv, include_in_memory=True)
 
@@ -4,9 +4,33 @@
     focusHighlightIndex: -1,
     viewportExpansion: 0,
     debugMode: false,
+    incremental: false,
+    baseSnapshotId: null,
+    columnar: false,
+    textMode: 'full',
+    maxTextLength: 2000,
+    xpathMode: 'all',
+    maxNodes: 0,
+    timeBudgetMs: 0,
+    resume: false,
+    trackChanges: false,
   }
 ) => {
-  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode } = args;
+  const {
+    doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode,
+    incremental = false, baseSnapshotId = null, columnar = false,
+    textMode = 'full', maxTextLength = 2000, xpathMode = 'all',
+    maxNodes = 0, timeBudgetMs = 0, resume = false, trackChanges = false,
+  } = args;
+
+  // In 'leaf' text mode only text nodes carry text, elements only get a (capped) textContent when highlighted.
+  // This avoids copying the text of every subtree at every ancestor.
+  const leafTextMode = textMode === 'leaf';
+
+  function getElementText(element) {
+    const text = element.textContent.trim();
+    return maxTextLength > 0 && text.length > maxTextLength ? text.slice(0, maxTextLength) : text;
+  }
   let highlightIndex = 0; // Reset highlight index
 
   // Add timing stack to handle recursion
@@ -33,7 +57,6 @@
     buildDomTreeCalls: 0,
     timings: {
       buildDomTree: 0,
-      highlightElement: 0,
       isInteractiveElement: 0,
       isElementVisible: 0,
       isTopElement: 0,
@@ -41,6 +64,12 @@
       isTextNodeVisible: 0,
       getEffectiveScroll: 0,
     },
+    // read: traversal and highlight geometry, write: highlight rendering
+    phases: {
+      read: 0,
+      write: 0,
+      highlights: 0,
+    },
     cacheMetrics: {
       boundingRectCacheHits: 0,
       boundingRectCacheMisses: 0,
@@ -53,6 +82,7 @@
       overallHitRate: 0,
       clientRectsCacheHits: 0,
       clientRectsCacheMisses: 0,
+      hitTestCacheHits: 0,
     },
     nodeMetrics: {
       totalNodes: 0,
@@ -66,10 +96,12 @@
       domOperations: {
         getBoundingClientRect: 0,
         getComputedStyle: 0,
+        elementFromPoint: 0,
       },
       domOperationCounts: {
         getBoundingClientRect: 0,
         getComputedStyle: 0,
+        elementFromPoint: 0,
       }
     }
   } : null;
@@ -101,8 +133,184 @@
     return result;
   }
 
+  const SNAPSHOT_STATE_VERSION = 2;
+
+  /**
+   * Returns whether a mutation record only comes from drawing or removing the highlight overlay.
+   */
+  function isHighlightMutation(record) {
+    if (record.type === 'attributes' && record.attributeName === 'browser-user-highlight-id') return true;
+    const target = record.target;
+    if (target.id === HIGHLIGHT_CONTAINER_ID) return true;
+    if (target.nodeType === Node.ELEMENT_NODE && target.closest && target.closest(`#${HIGHLIGHT_CONTAINER_ID}`)) return true;
+    if (record.type === 'childList') {
+      const nodes = [...record.addedNodes, ...record.removedNodes];
+      return nodes.length > 0 && nodes.every(node => node.id === HIGHLIGHT_CONTAINER_ID);
+    }
+    return false;
+  }
+
+  /**
+   * Returns the persistent snapshot state of this document, creating it on first use.
+   *
+   * The state survives between evaluations (it lives on `window` until the next navigation) and holds:
+   * - stable node ids, so the same DOM node is reported under the same id in every snapshot
+   * - every node object sent in the previous snapshot, to compute deltas
+   * - the bounding-rect / client-rect / computed-style caches, which are only dropped when
+   *   a mutation, resize, scroll, load or finished animation invalidates them
+   */
+  function getSnapshotState() {
+    const existing = window.__browserUseDomSnapshot;
+    if (existing && existing.version === SNAPSHOT_STATE_VERSION) return existing;
+    if (existing && existing.disconnect) existing.disconnect();
+
+    const state = {
+      version: SNAPSHOT_STATE_VERSION,
+      token: Math.random().toString(36).slice(2, 10),
+      counter: 0,
+      snapshotId: null,
+      rootId: null,
+      argsKey: null,
+      pageSignature: null,
+      dirty: true,
+      nextNodeId: 0,
+      nodeIds: new WeakMap(),
+      emitted: new Map(),
+      highlights: [],
+      observedRoots: new WeakSet(),
+      observedSizes: new WeakSet(),
+      cache: {
+        boundingRects: new WeakMap(),
+        clientRects: new WeakMap(),
+        // getComputedStyle() returns a live object, so it never has to be invalidated
+        computedStyles: new WeakMap(),
+        clearCache: () => {
+          state.cache.boundingRects = new WeakMap();
+          state.cache.clientRects = new WeakMap();
+        },
+      },
+    };
+
+    const invalidate = () => {
+      state.dirty = true;
+      state.cache.clearCache();
+    };
+
+    const mutationObserver = new MutationObserver((records) => {
+      if (records.some(record => !isHighlightMutation(record))) invalidate();
+    });
+    const resizeObserver = typeof ResizeObserver === 'function' ? new ResizeObserver((entries) => {
+      // the first notification for a newly observed element only reports its initial size
+      let changed = false;
+      for (const entry of entries) {
+        if (state.observedSizes.has(entry.target)) changed = true;
+        else state.observedSizes.add(entry.target);
+      }
+      if (changed) invalidate();
+    }) : null;
+    const observingSize = new WeakSet();
+
+    const MUTATION_OPTIONS = { subtree: true, childList: true, attributes: true, characterData: true };
+    state.observeRoot = (root) => {
+      if (!root || state.observedRoots.has(root)) return;
+      state.observedRoots.add(root);
+      try {
+        mutationObserver.observe(root, MUTATION_OPTIONS);
+      } catch (e) {
+        // detached or cross-origin roots cannot be observed
+      }
+    };
+    state.observeSize = (element) => {
+      if (!resizeObserver || observingSize.has(element)) return;
+      observingSize.add(element);
+      resizeObserver.observe(element);
+    };
+    state.flush = () => {
+      const records = mutationObserver.takeRecords();
+      if (records.some(record => !isHighlightMutation(record))) invalidate();
+    };
+
+    const EVENTS = [['scroll', true], ['resize', false], ['load', true], ['transitionend', true], ['animationend', true]];
+    for (const [type, capture] of EVENTS) window.addEventListener(type, invalidate, { capture, passive: true });
+    state.disconnect = () => {
+      mutationObserver.disconnect();
+      if (resizeObserver) resizeObserver.disconnect();
+      for (const [type, capture] of EVENTS) window.removeEventListener(type, invalidate, { capture });
+    };
+
+    state.observeRoot(document);
+    if (document.documentElement) state.observeSize(document.documentElement);
+
+    window.__browserUseDomSnapshot = state;
+    return state;
+  }
+
+  /**
+   * Budgeted extraction: the traversal stops once `maxNodes` nodes were visited or `timeBudgetMs` elapsed.
+   *
+   * Subtrees entirely outside the viewport are not visited on the way down, they become pending
+   * traversals that are visited afterwards, nearest to the viewport first, while budget remains.
+   * A pending traversal stands in for its node in the children list of the parent until it is visited.
+   * What is still pending at the end is kept on `window` so that a `resume` call can continue it.
+   */
+  const BUDGET = maxNodes > 0 || timeBudgetMs > 0 ? {
+    start: performance.now(),
+    visitedNodes: 0,
+    reason: null,
+    draining: false,
+    pending: [],
+    highlights: [],
+  } : null;
+
+  // A truncated tree is no base for deltas, budgeted extractions always send full snapshots
+  const SNAPSHOT = incremental && !BUDGET ? getSnapshotState() : null;
+
+  const CHANGE_TRACKER_VERSION = 2;
+
+  /**
+   * Returns the change tracker of this document, creating it on first use.
+   *
+   * It records the time (seconds since the epoch) of the last DOM mutation, scroll or resize, so the caller can
+   * tell whether a screencast frame was painted after the page last changed. Drawing the highlight overlay is
+   * recorded separately as the last overlay change, so the extraction itself does not make every frame stale.
+   * Mutations inside shadow roots are not observed.
+   */
+  function getChangeTracker() {
+    const existing = window.__browserUseChangeTracker;
+    if (existing && existing.version === CHANGE_TRACKER_VERSION) return existing;
+    if (existing && existing.disconnect) existing.disconnect();
+
+    const tracker = { version: CHANGE_TRACKER_VERSION, lastChange: Date.now() / 1000, lastOverlayChange: null };
+    const touch = () => {
+      tracker.lastChange = Date.now() / 1000;
+    };
+    const record = (records) => {
+      if (records.some(record => !isHighlightMutation(record))) touch();
+      if (records.some(isHighlightMutation)) tracker.lastOverlayChange = Date.now() / 1000;
+    };
+
+    const observer = new MutationObserver(record);
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    const EVENTS = [['scroll', true], ['resize', false]];
+    for (const [type, capture] of EVENTS) window.addEventListener(type, touch, { capture, passive: true });
+
+    // the observer callback runs after the current script, mutations made by the script are only seen here
+    tracker.flush = () => {
+      record(observer.takeRecords());
+    };
+    tracker.disconnect = () => {
+      observer.disconnect();
+      for (const [type, capture] of EVENTS) window.removeEventListener(type, touch, { capture });
+    };
+
+    window.__browserUseChangeTracker = tracker;
+    return tracker;
+  }
+
+  const CHANGE_TRACKER = trackChanges ? getChangeTracker() : null;
+
   // Add caching mechanisms at the top level
-  const DOM_CACHE = {
+  const DOM_CACHE = SNAPSHOT ? SNAPSHOT.cache : {
     boundingRects: new WeakMap(),
     clientRects: new WeakMap(),
     computedStyles: new WeakMap(),
@@ -212,11 +420,31 @@
 
   const ID = { current: 0 };
 
+  /**
+   * Returns the id a node is reported under. Ids are stable across snapshots in incremental mode.
+   */
+  function getNodeId(node) {
+    if (!SNAPSHOT) return `${ID.current++}`;
+    let id = SNAPSHOT.nodeIds.get(node);
+    if (id === undefined) {
+      id = `${SNAPSHOT.nextNodeId++}`;
+      SNAPSHOT.nodeIds.set(node, id);
+    }
+    return id;
+  }
+
   const HIGHLIGHT_CONTAINER_ID = "playwright-highlight-container";
 
   // Add a WeakMap cache for XPath strings
   const xpathCache = new WeakMap();
 
+  // Per parent element: the XPath segment ("div", "li[3]") of each of its element children
+  const xpathSegmentCache = new WeakMap();
+
+  // In 'highlighted' XPath mode only highlighted elements, iframes and shadow hosts get their full XPath,
+  // every other element only gets its own segment and the full XPath is resolved on demand in Python.
+  const highlightedXPathMode = xpathMode === 'highlighted';
+
   // Initialize once and reuse
   const viewportObserver = new IntersectionObserver(
     (entries) => {
@@ -227,294 +455,357 @@
     { rootMargin: `${viewportExpansion}px` }
   );
 
+  // Highlights are queued during the traversal and rendered in one batch afterwards (see flushHighlights),
+  // so inserting overlays never invalidates the layout while the traversal still reads geometry.
+  const pendingHighlights = [];
+
+  const HIGHLIGHT_COLORS = [
+    "#FF0000",
+    "#00FF00",
+    "#0000FF",
+    "#FFA500",
+    "#800080",
+    "#008080",
+    "#FF69B4",
+    "#4B0082",
+    "#FF4500",
+    "#2E8B57",
+    "#DC143C",
+    "#4682B4",
+  ];
+
   /**
-   * Highlights an element in the DOM and returns the index of the next element.
+   * Returns the position of the label of a highlight, relative to the first client rect of the element.
    */
-  function highlightElement(element, index, parentIframe = null) {
-    pushTiming('highlighting');
-    
-    if (!element) return index;
+  function getLabelPosition(firstRect, iframeOffset, labelWidth, labelHeight) {
+    const firstRectTop = firstRect.top + iframeOffset.y;
+    const firstRectLeft = firstRect.left + iframeOffset.x;
+
+    let labelTop = firstRectTop + 2;
+    let labelLeft = firstRectLeft + firstRect.width - labelWidth - 2;
+
+    // Adjust label position if first rect is too small
+    if (firstRect.width < labelWidth + 4 || firstRect.height < labelHeight + 4) {
+      labelTop = firstRectTop - labelHeight - 2;
+      labelLeft = firstRectLeft + firstRect.width - labelWidth; // Align with right edge
+      if (labelLeft < iframeOffset.x) labelLeft = firstRectLeft; // Prevent going off-left
+    }
 
-    // Store overlays and the single label for updating
-    const overlays = [];
-    let label = null;
-    let labelWidth = 20;
-    let labelHeight = 16;
-    let cleanupFn = null;
+    // Ensure label stays within viewport bounds slightly better
+    labelTop = Math.max(0, Math.min(labelTop, window.innerHeight - labelHeight));
+    labelLeft = Math.max(0, Math.min(labelLeft, window.innerWidth - labelWidth));
 
-    try {
-      // Create or get highlight container
-      let container = document.getElementById(HIGHLIGHT_CONTAINER_ID);
+    return { top: labelTop, left: labelLeft };
+  }
+
+  const OVERLAY_MANAGER_VERSION = 1;
+
+  /**
+   * Returns the overlay manager of this document, creating it on first use.
+   *
+   * All highlights of the page share a single scroll/resize listener, which repositions every
+   * overlay and label once per animation frame. `teardown()` removes the listeners, the entries
+   * and the highlight container; `listenerCount` is the number of listeners currently attached.
+   */
+  function getOverlayManager() {
+    const existing = window.__browserUseOverlays;
+    if (existing && existing.version === OVERLAY_MANAGER_VERSION) return existing;
+    if (existing && existing.teardown) existing.teardown();
+
+    const manager = {
+      version: OVERLAY_MANAGER_VERSION,
+      // { element, parentIframe, overlays, label, labelWidth, labelHeight }
+      entries: [],
+      listenerCount: 0,
+      frame: null,
+    };
+
+    const updatePositions = () => {
+      manager.frame = null;
+      const container = document.getElementById(HIGHLIGHT_CONTAINER_ID);
       if (!container) {
-        container = document.createElement("div");
-        container.id = HIGHLIGHT_CONTAINER_ID;
-        container.style.position = "fixed";
-        container.style.pointerEvents = "none";
-        container.style.top = "0";
-        container.style.left = "0";
-        container.style.width = "100%";
-        container.style.height = "100%";
-        container.style.zIndex = "2147483640";
-        container.style.backgroundColor = 'transparent';
-        document.body.appendChild(container);
+        // the highlights were removed without the manager, nothing is left to update
+        manager.teardown();
+        return;
       }
 
-      // Get element client rects
-      const rects = element.getClientRects(); // Use getClientRects()
-
-      if (!rects || rects.length === 0) return index; // Exit if no rects
-
-      // Generate a color based on the index
-      const colors = [
-        "#FF0000",
-        "#00FF00",
-        "#0000FF",
-        "#FFA500",
-        "#800080",
-        "#008080",
-        "#FF69B4",
-        "#4B0082",
-        "#FF4500",
-        "#2E8B57",
-        "#DC143C",
-        "#4682B4",
-      ];
-      const colorIndex = index % colors.length;
-      const baseColor = colors[colorIndex];
-      const backgroundColor = baseColor + "1A"; // 10% opacity version of the color
-
-      // Get iframe offset if necessary
-      let iframeOffset = { x: 0, y: 0 };
-      if (parentIframe) {
-        const iframeRect = parentIframe.getBoundingClientRect(); // Keep getBoundingClientRect for iframe offset
-        iframeOffset.x = iframeRect.left;
-        iframeOffset.y = iframeRect.top;
-      }
+      // Read all geometry first, so the style writes below never interleave with layout reads
+      const positions = manager.entries.map(({ element, parentIframe }) => {
+        const rects = element.getClientRects(); // Get fresh rects
+        let iframeOffset = { x: 0, y: 0 };
+        if (parentIframe) {
+          const iframeRect = parentIframe.getBoundingClientRect(); // Keep getBoundingClientRect for iframe
+          iframeOffset.x = iframeRect.left;
+          iframeOffset.y = iframeRect.top;
+        }
+        return { rects, iframeOffset };
+      });
 
-      // Create fragment to hold overlay elements
-      const fragment = document.createDocumentFragment();
+      manager.entries.forEach(({ overlays, label, labelWidth, labelHeight }, entryIndex) => {
+        const { rects, iframeOffset } = positions[entryIndex];
+
+        // Update each overlay, hiding the ones without a matching rect
+        overlays.forEach((overlay, i) => {
+          if (i < rects.length) {
+            const rect = rects[i];
+            overlay.style.top = `${rect.top + iframeOffset.y}px`;
+            overlay.style.left = `${rect.left + iframeOffset.x}px`;
+            overlay.style.width = `${rect.width}px`;
+            overlay.style.height = `${rect.height}px`;
+            overlay.style.display = (rect.width === 0 || rect.height === 0) ? 'none' : 'block';
+          } else {
+            overlay.style.display = 'none';
+          }
+        });
 
-      // Create highlight overlays for each client rect
-      for (const rect of rects) {
-        if (rect.width === 0 || rect.height === 0) continue; // Skip empty rects
+        // Update label position based on the first rect, hide it if the element has no rects anymore
+        if (rects.length > 0) {
+          const position = getLabelPosition(rects[0], iframeOffset, labelWidth, labelHeight);
+          label.style.top = `${position.top}px`;
+          label.style.left = `${position.left}px`;
+          label.style.display = 'block';
+        } else {
+          label.style.display = 'none';
+        }
+      });
+    };
 
-        const overlay = document.createElement("div");
-        overlay.style.position = "fixed";
-        overlay.style.border = `2px solid ${baseColor}`;
-        overlay.style.backgroundColor = backgroundColor;
-        overlay.style.pointerEvents = "none";
-        overlay.style.boxSizing = "border-box";
+    const scheduleUpdate = () => {
+      if (manager.frame === null) manager.frame = window.requestAnimationFrame(updatePositions);
+    };
 
-        const top = rect.top + iframeOffset.y;
-        const left = rect.left + iframeOffset.x;
+    const LISTENERS = [['scroll', true], ['resize', false]];
+    manager.add = (entry) => {
+      manager.entries.push(entry);
+      if (manager.listenerCount > 0) return;
+      for (const [type, capture] of LISTENERS) {
+        window.addEventListener(type, scheduleUpdate, { capture, passive: true });
+        manager.listenerCount++;
+      }
+    };
+    manager.teardown = () => {
+      for (const [type, capture] of LISTENERS) {
+        if (manager.listenerCount === 0) break;
+        window.removeEventListener(type, scheduleUpdate, { capture });
+        manager.listenerCount--;
+      }
+      if (manager.frame !== null) window.cancelAnimationFrame(manager.frame);
+      manager.frame = null;
+      manager.entries = [];
 
-        overlay.style.top = `${top}px`;
-        overlay.style.left = `${left}px`;
-        overlay.style.width = `${rect.width}px`;
-        overlay.style.height = `${rect.height}px`;
+      const container = document.getElementById(HIGHLIGHT_CONTAINER_ID);
+      if (container) container.remove();
+    };
 
-        fragment.appendChild(overlay);
-        overlays.push({ element: overlay, initialRect: rect }); // Store overlay and its rect
-      }
+    window.__browserUseOverlays = manager;
+    return manager;
+  }
 
-      // Create and position a single label relative to the first rect
-      const firstRect = rects[0];
-      label = document.createElement("div");
-      label.className = "playwright-highlight-label";
-      label.style.position = "fixed";
-      label.style.background = baseColor;
-      label.style.color = "white";
-      label.style.padding = "1px 4px";
-      label.style.borderRadius = "4px";
-      label.style.fontSize = `${Math.min(12, Math.max(8, firstRect.height / 2))}px`;
-      label.textContent = index;
-
-      labelWidth = label.offsetWidth > 0 ? label.offsetWidth : labelWidth; // Update actual width if possible
-      labelHeight = label.offsetHeight > 0 ? label.offsetHeight : labelHeight; // Update actual height if possible
-
-      const firstRectTop = firstRect.top + iframeOffset.y;
-      const firstRectLeft = firstRect.left + iframeOffset.x;
-
-      let labelTop = firstRectTop + 2;
-      let labelLeft = firstRectLeft + firstRect.width - labelWidth - 2;
-
-      // Adjust label position if first rect is too small
-      if (firstRect.width < labelWidth + 4 || firstRect.height < labelHeight + 4) {
-        labelTop = firstRectTop - labelHeight - 2;
-        labelLeft = firstRectLeft + firstRect.width - labelWidth; // Align with right edge
-        if (labelLeft < iframeOffset.x) labelLeft = firstRectLeft; // Prevent going off-left
-      }
+  /**
+   * Read phase of a highlight: collects the geometry needed to render it, without touching the DOM.
+   */
+  function measureHighlight(element, index, parentIframe = null) {
+    if (!element) return null;
 
-      // Ensure label stays within viewport bounds slightly better
-      labelTop = Math.max(0, Math.min(labelTop, window.innerHeight - labelHeight));
-      labelLeft = Math.max(0, Math.min(labelLeft, window.innerWidth - labelWidth));
+    // Get element client rects
+    const rects = element.getClientRects(); // Use getClientRects()
+    if (!rects || rects.length === 0) return null; // Exit if no rects
 
+    // Get iframe offset if necessary
+    let iframeOffset = { x: 0, y: 0 };
+    if (parentIframe) {
+      const iframeRect = parentIframe.getBoundingClientRect(); // Keep getBoundingClientRect for iframe offset
+      iframeOffset.x = iframeRect.left;
+      iframeOffset.y = iframeRect.top;
+    }
 
-      label.style.top = `${labelTop}px`;
-      label.style.left = `${labelLeft}px`;
+    return { element, index, parentIframe, rects, iframeOffset };
+  }
 
-      fragment.appendChild(label);
+  /**
+   * Write phase of a highlight: creates the overlays and the label of a measured element into `fragment`.
+   */
+  function renderHighlight(measurement, fragment) {
+    const { element, index, parentIframe, rects, iframeOffset } = measurement;
 
-      // Update positions on scroll/resize
-      const updatePositions = () => {
-        const newRects = element.getClientRects(); // Get fresh rects
-        let newIframeOffset = { x: 0, y: 0 };
+    const overlays = [];
+    let labelWidth = 20;
+    let labelHeight = 16;
 
-        if (parentIframe) {
-          const iframeRect = parentIframe.getBoundingClientRect(); // Keep getBoundingClientRect for iframe
-          newIframeOffset.x = iframeRect.left;
-          newIframeOffset.y = iframeRect.top;
-        }
+    // Generate a color based on the index
+    const colorIndex = index % HIGHLIGHT_COLORS.length;
+    const baseColor = HIGHLIGHT_COLORS[colorIndex];
+    const backgroundColor = baseColor + "1A"; // 10% opacity version of the color
 
-        // Update each overlay
-        overlays.forEach((overlayData, i) => {
-          if (i < newRects.length) { // Check if rect still exists
-            const newRect = newRects[i];
-            const newTop = newRect.top + newIframeOffset.y;
-            const newLeft = newRect.left + newIframeOffset.x;
-
-            overlayData.element.style.top = `${newTop}px`;
-            overlayData.element.style.left = `${newLeft}px`;
-            overlayData.element.style.width = `${newRect.width}px`;
-            overlayData.element.style.height = `${newRect.height}px`;
-            overlayData.element.style.display = (newRect.width === 0 || newRect.height === 0) ? 'none' : 'block';
-          } else {
-            // If fewer rects now, hide extra overlays
-            overlayData.element.style.display = 'none';
-          }
-        });
+    // Create highlight overlays for each client rect
+    for (const rect of rects) {
+      if (rect.width === 0 || rect.height === 0) continue; // Skip empty rects
 
-        // If there are fewer new rects than overlays, hide the extras
-        if (newRects.length < overlays.length) {
-          for (let i = newRects.length; i < overlays.length; i++) {
-            overlays[i].element.style.display = 'none';
-          }
-        }
+      const overlay = document.createElement("div");
+      overlay.style.position = "fixed";
+      overlay.style.border = `2px solid ${baseColor}`;
+      overlay.style.backgroundColor = backgroundColor;
+      overlay.style.pointerEvents = "none";
+      overlay.style.boxSizing = "border-box";
 
-        // Update label position based on the first new rect
-        if (label && newRects.length > 0) {
-          const firstNewRect = newRects[0];
-          const firstNewRectTop = firstNewRect.top + newIframeOffset.y;
-          const firstNewRectLeft = firstNewRect.left + newIframeOffset.x;
+      const top = rect.top + iframeOffset.y;
+      const left = rect.left + iframeOffset.x;
 
-          let newLabelTop = firstNewRectTop + 2;
-          let newLabelLeft = firstNewRectLeft + firstNewRect.width - labelWidth - 2;
+      overlay.style.top = `${top}px`;
+      overlay.style.left = `${left}px`;
+      overlay.style.width = `${rect.width}px`;
+      overlay.style.height = `${rect.height}px`;
 
-          if (firstNewRect.width < labelWidth + 4 || firstNewRect.height < labelHeight + 4) {
-            newLabelTop = firstNewRectTop - labelHeight - 2;
-            newLabelLeft = firstNewRectLeft + firstNewRect.width - labelWidth;
-            if (newLabelLeft < newIframeOffset.x) newLabelLeft = firstNewRectLeft;
-          }
+      fragment.appendChild(overlay);
+      overlays.push(overlay);
+    }
 
-          // Ensure label stays within viewport bounds
-          newLabelTop = Math.max(0, Math.min(newLabelTop, window.innerHeight - labelHeight));
-          newLabelLeft = Math.max(0, Math.min(newLabelLeft, window.innerWidth - labelWidth));
+    // Create and position a single label relative to the first rect
+    const firstRect = rects[0];
+    const label = document.createElement("div");
+    label.className = "playwright-highlight-label";
+    label.style.position = "fixed";
+    label.style.background = baseColor;
+    label.style.color = "white";
+    label.style.padding = "1px 4px";
+    label.style.borderRadius = "4px";
+    label.style.fontSize = `${Math.min(12, Math.max(8, firstRect.height / 2))}px`;
+    label.textContent = index;
+
+    labelWidth = label.offsetWidth > 0 ? label.offsetWidth : labelWidth; // Update actual width if possible
+    labelHeight = label.offsetHeight > 0 ? label.offsetHeight : labelHeight; // Update actual height if possible
+
+    const labelPosition = getLabelPosition(firstRect, iframeOffset, labelWidth, labelHeight);
+    label.style.top = `${labelPosition.top}px`;
+    label.style.left = `${labelPosition.left}px`;
+
+    fragment.appendChild(label);
+
+    // Positions are kept up to date on scroll/resize by the shared overlay manager
+    getOverlayManager().add({ element, parentIframe, overlays, label, labelWidth, labelHeight });
+  }
 
-          label.style.top = `${newLabelTop}px`;
-          label.style.left = `${newLabelLeft}px`;
-          label.style.display = 'block';
-        } else if (label) {
-          // Hide label if element has no rects anymore
-          label.style.display = 'none';
-        }
-      };
+  /**
+   * Returns the highlight container, creating it (detached) if the page has none yet.
+   */
+  function getHighlightContainer() {
+    let container = document.getElementById(HIGHLIGHT_CONTAINER_ID);
+    if (!container) {
+      container = document.createElement("div");
+      container.id = HIGHLIGHT_CONTAINER_ID;
+      container.style.position = "fixed";
+      container.style.pointerEvents = "none";
+      container.style.top = "0";
+      container.style.left = "0";
+      container.style.width = "100%";
+      container.style.height = "100%";
+      container.style.zIndex = "2147483640";
+      container.style.backgroundColor = 'transparent';
+    }
+    return container;
+  }
 
-      const throttleFunction = (func, delay) => {
-        let lastCall = 0;
-        return (...args) => {
-          const now = performance.now();
-          if (now - lastCall < delay) return;
-          lastCall = now;
-          return func(...args);
-        };
-      };
+  /**
+   * Renders the given highlights: all geometry is read first, then every overlay is
+   * built in one fragment and inserted with a single DOM write.
+   */
+  function renderHighlights(highlights) {
+    if (highlights.length === 0) return;
+
+    const readStart = performance.now();
+    const measurements = [];
+    for (const { element, index, parentIframe } of highlights) {
+      const measurement = measureHighlight(element, index, parentIframe);
+      if (measurement) measurements.push(measurement);
+    }
 
-      const throttledUpdatePositions = throttleFunction(updatePositions, 16); // ~60fps
-      window.addEventListener('scroll', throttledUpdatePositions, true);
-      window.addEventListener('resize', throttledUpdatePositions);
-      
-      // Add cleanup function
-      cleanupFn = () => {
-        window.removeEventListener('scroll', throttledUpdatePositions, true);
-        window.removeEventListener('resize', throttledUpdatePositions);
-        // Remove overlay elements if needed
-        overlays.forEach(overlay => overlay.element.remove());
-        if (label) label.remove();
-      };
-      
-      // Then add fragment to container in one operation
-      container.appendChild(fragment);
-      
-      return index + 1;
-    } finally {
-      popTiming('highlighting');
-      // Store cleanup function for later use
-      if (cleanupFn) {
-        // Keep a reference to cleanup functions in a global array
-        (window._highlightCleanupFunctions = window._highlightCleanupFunctions || []).push(cleanupFn);
+    const writeStart = performance.now();
+    if (measurements.length > 0) {
+      const container = getHighlightContainer();
+      const fragment = document.createDocumentFragment();
+      for (const measurement of measurements) {
+        renderHighlight(measurement, fragment);
       }
+      container.appendChild(fragment);
+      if (!container.isConnected) document.body.appendChild(container);
     }
+
+    if (PERF_METRICS) {
+      PERF_METRICS.phases.read += writeStart - readStart;
+      PERF_METRICS.phases.write += performance.now() - writeStart;
+      PERF_METRICS.phases.highlights += measurements.length;
+    }
+  }
+
+  /**
+   * Renders all highlights queued during the traversal.
+   */
+  function flushHighlights() {
+    renderHighlights(pendingHighlights.splice(0));
   }
 
   // Add this function to perform cleanup when needed
   function cleanupHighlights() {
-    if (window._highlightCleanupFunctions && window._highlightCleanupFunctions.length) {
-      window._highlightCleanupFunctions.forEach(fn => fn());
-      window._highlightCleanupFunctions = [];
+    // Removes the shared scroll/resize listeners and the container
+    getOverlayManager().teardown();
+  }
+
+  /**
+   * Returns the XPath segment of an element: its tag name, with a 1-based position
+   * among the siblings with the same tag name if there are several.
+   * The segments of all children of a parent are computed in one pass over the parent's children.
+   */
+  function getXPathSegment(element) {
+    const tagName = element.nodeName.toLowerCase();
+    const parent = element.parentElement;
+    if (!parent) {
+      return tagName; // No parent means no siblings
     }
-    
-    // Also remove the container
-    const container = document.getElementById(HIGHLIGHT_CONTAINER_ID);
-    if (container) container.remove();
+
+    let segments = xpathSegmentCache.get(parent);
+    if (!segments) {
+      segments = new Map();
+      const counts = new Map();
+      for (const sibling of parent.children) {
+        const siblingTagName = sibling.nodeName.toLowerCase();
+        counts.set(siblingTagName, (counts.get(siblingTagName) || 0) + 1);
+      }
+      const positions = new Map();
+      for (const sibling of parent.children) {
+        const siblingTagName = sibling.nodeName.toLowerCase();
+        const position = (positions.get(siblingTagName) || 0) + 1;
+        positions.set(siblingTagName, position);
+        segments.set(sibling, counts.get(siblingTagName) > 1 ? `${siblingTagName}[${position}]` : siblingTagName);
+      }
+      xpathSegmentCache.set(parent, segments);
+    }
+    return segments.get(element) ?? tagName;
   }
 
-  function getElementPosition(currentElement) {
-    if (!currentElement.parentElement) {
-      return 0; // No parent means no siblings
-    }
-  
-    const tagName = currentElement.nodeName.toLowerCase();
-  
-    const siblings = Array.from(currentElement.parentElement.children)
-      .filter((sib) => sib.nodeName.toLowerCase() === tagName);
-  
-    if (siblings.length === 1) {
-      return 0; // Only element of its type
-    }
-  
-    const index = siblings.indexOf(currentElement) + 1; // 1-based index
-    return index;
+  /**
+   * Whether the XPath of an element starts after it (its parent is a shadow root or an iframe).
+   */
+  function isXPathBoundary(element) {
+    return element.parentNode instanceof ShadowRoot || element.parentNode instanceof HTMLIFrameElement;
   }
 
   /**
    * Returns an XPath tree string for an element.
+   * The XPath of the parent is reused, so computing the XPaths of a whole tree is linear.
    */
   function getXPathTree(element, stopAtBoundary = true) {
-    if (xpathCache.has(element)) return xpathCache.get(element);
-    
-    const segments = [];
-    let currentElement = element;
-
-    while (currentElement && currentElement.nodeType === Node.ELEMENT_NODE) {
-      // Stop if we hit a shadow root or iframe
-      if (
-        stopAtBoundary &&
-        (currentElement.parentNode instanceof ShadowRoot ||
-          currentElement.parentNode instanceof HTMLIFrameElement)
-      ) {
-        break;
-      }
+    if (stopAtBoundary && xpathCache.has(element)) return xpathCache.get(element);
 
-      const position = getElementPosition(currentElement);
-      const tagName = currentElement.nodeName.toLowerCase();
-      const xpathIndex = position > 0 ? `[${position}]` : "";
-      segments.unshift(`${tagName}${xpathIndex}`);
-
-      currentElement = currentElement.parentNode;
+    if (stopAtBoundary && isXPathBoundary(element)) {
+      xpathCache.set(element, "");
+      return "";
     }
 
-    const result = segments.join("/");
-    xpathCache.set(element, result);
+    const segment = getXPathSegment(element);
+    const parent = element.parentNode;
+    const parentXPath = parent && parent.nodeType === Node.ELEMENT_NODE ? getXPathTree(parent, stopAtBoundary) : "";
+    const result = parentXPath ? `${parentXPath}/${segment}` : segment;
+    if (stopAtBoundary) xpathCache.set(element, result);
     return result;
   }
 
@@ -851,9 +1142,10 @@
 
 
   /**
-   * Checks if an element is the topmost element at its position.
+   * Checks if an element is the topmost element at its position, as far as this is known without a hit test.
+   * Returns a boolean, or the root and point to hit-test with elementFromPoint.
    */
-  function isTopElement(element) {
+  function getTopElementProbe(element) {
     // Special case: when viewportExpansion is -1, consider all elements as "top" elements
     if (viewportExpansion === -1) {
       return true;
@@ -894,44 +1186,71 @@
 
     // For shadow DOM, we need to check within its own root context
     const shadowRoot = element.getRootNode();
-    if (shadowRoot instanceof ShadowRoot) {
-      const centerX = rects[Math.floor(rects.length / 2)].left + rects[Math.floor(rects.length / 2)].width / 2;
-      const centerY = rects[Math.floor(rects.length / 2)].top + rects[Math.floor(rects.length / 2)].height / 2;
+    const root = shadowRoot instanceof ShadowRoot ? shadowRoot : document;
+
+    // For elements in viewport, check if they're topmost at the center of their middle rect
+    const middleRect = rects[Math.floor(rects.length / 2)];
+    return {
+      root,
+      x: middleRect.left + middleRect.width / 2,
+      y: middleRect.top + middleRect.height / 2,
+    };
+  }
 
-      try {
-        const topEl = measureDomOperation(
-          () => shadowRoot.elementFromPoint(centerX, centerY),
-          'elementFromPoint'
-        );
-        if (!topEl) return false;
-
-        let current = topEl;
-        while (current && current !== shadowRoot) {
-          if (current === element) return true;
-          current = current.parentElement;
-        }
-        return false;
-      } catch (e) {
-        return true;
-      }
+  /**
+   * Whether `element` is `topEl` or one of its ancestors within `root`.
+   */
+  function ownsHitTarget(element, root, topEl) {
+    if (!topEl) return false;
+
+    const boundary = root === document ? document.documentElement : root;
+    let current = topEl;
+    while (current && current !== boundary) {
+      if (current === element) return true;
+      current = current.parentElement;
     }
+    return false;
+  }
 
-    // For elements in viewport, check if they're topmost
-    const centerX = rects[Math.floor(rects.length / 2)].left + rects[Math.floor(rects.length / 2)].width / 2;
-    const centerY = rects[Math.floor(rects.length / 2)].top + rects[Math.floor(rects.length / 2)].height / 2;
+  /**
+   * Resolves isTopElement for all elements collected by the traversal at once.
+   *
+   * The geometry of every element is read first, then each distinct (root, point) pair is hit-tested
+   * exactly once: nested wrappers and their content often share a center, so one elementFromPoint
+   * call answers for all of them.
+   */
+  function resolveTopElements(records) {
+    const hitTests = new Map(); // root -> Map(point -> top element, or undefined if the hit test threw)
+    for (const record of records) {
+      if (!record.nodeData.isVisible) continue;
+
+      const probe = getTopElementProbe(record.node);
+      if (typeof probe === 'boolean') {
+        record.isTopElement = probe;
+        continue;
+      }
 
-    try {
-      const topEl = document.elementFromPoint(centerX, centerY);
-      if (!topEl) return false;
+      let rootHitTests = hitTests.get(probe.root);
+      if (!rootHitTests) {
+        rootHitTests = new Map();
+        hitTests.set(probe.root, rootHitTests);
+      }
 
-      let current = topEl;
-      while (current && current !== document.documentElement) {
-        if (current === element) return true;
-        current = current.parentElement;
+      const point = `${probe.x},${probe.y}`;
+      if (rootHitTests.has(point)) {
+        if (debugMode) PERF_METRICS.cacheMetrics.hitTestCacheHits++;
+      } else {
+        let topEl;
+        try {
+          topEl = measureDomOperation(() => probe.root.elementFromPoint(probe.x, probe.y), 'elementFromPoint');
+        } catch (e) {
+          topEl = undefined;
+        }
+        rootHitTests.set(point, topEl);
       }
-      return false;
-    } catch (e) {
-      return true;
+
+      const topEl = rootHitTests.get(point);
+      record.isTopElement = topEl === undefined ? true : ownsHitTarget(record.node, probe.root, topEl);
     }
   }
 
@@ -1129,13 +1448,24 @@
       if (nodeData.isInViewport || viewportExpansion === -1) {
         nodeData.highlightIndex = highlightIndex++;
 
+        if (highlightedXPathMode && nodeData.xpath === null) {
+          nodeData.xpath = getXPathTree(node, true);
+          delete nodeData.xpathSegment;
+        }
+
+        if (SNAPSHOT) {
+          SNAPSHOT.highlights.push({ node, index: nodeData.highlightIndex, parentIframe });
+          SNAPSHOT.observeSize(node);
+        }
+        if (BUDGET) BUDGET.highlights.push({ node, index: nodeData.highlightIndex, parentIframe });
+
         if (doHighlightElements) {
           if (focusHighlightIndex >= 0) {
             if (focusHighlightIndex === nodeData.highlightIndex) {
-              highlightElement(node, nodeData.highlightIndex, parentIframe);
+              pendingHighlights.push({ element: node, index: nodeData.highlightIndex, parentIframe });
             }
           } else {
-            highlightElement(node, nodeData.highlightIndex, parentIframe);
+            pendingHighlights.push({ element: node, index: nodeData.highlightIndex, parentIframe });
           }
           return true; // Successfully highlighted
         }
@@ -1147,10 +1477,153 @@
     return false; // Did not highlight
   }
 
+  // Every element of the tree, in traversal order. The traversal only reads the DOM: whether an element is on top,
+  // interactive and highlighted is resolved afterwards for all of them at once (see resolveHighlights).
+  const elementRecords = [];
+  // Records created while visiting a pending traversal go into its own list, so they stay in document order
+  let currentRecords = elementRecords;
+
+  /**
+   * Flattens the records of the traversed elements into document order, skipping the ones already resolved
+   * by an earlier (resumed) extraction.
+   */
+  function collectUnresolvedRecords(records, collected = []) {
+    for (const record of records) {
+      if (record.pending) collectUnresolvedRecords(record.records, collected);
+      else if (!record.resolved) collected.push(record);
+    }
+    return collected;
+  }
+
+  /**
+   * Returns how far an element is outside the viewport, 0 when it is (partly) inside or has no position.
+   */
+  function getViewportDistance(node) {
+    if (node.nodeType !== Node.ELEMENT_NODE || node.ownerDocument !== document) return 0;
+
+    const rect = getCachedBoundingRect(node);
+    if (!rect || (rect.width === 0 && rect.height === 0)) return 0;
+
+    const dx = Math.max(0, rect.left - window.innerWidth, -rect.right);
+    const dy = Math.max(0, rect.top - window.innerHeight, -rect.bottom);
+    return dx + dy;
+  }
+
+  function isBudgetExhausted() {
+    if (BUDGET.reason) return true;
+    if (maxNodes > 0 && BUDGET.visitedNodes >= maxNodes) BUDGET.reason = 'nodes';
+    else if (timeBudgetMs > 0 && performance.now() - BUDGET.start >= timeBudgetMs) BUDGET.reason = 'time';
+    return BUDGET.reason !== null;
+  }
+
+  /**
+   * Returns a pending traversal for `node` if it has to wait (budget used up, or outside the viewport
+   * on the way down), otherwise counts the node as visited and returns null.
+   */
+  function deferTraversal(node, parentIframe, parentRecord, inheritsParentStatus) {
+    const distance = BUDGET.draining ? 0 : getViewportDistance(node);
+    if (!isBudgetExhausted() && distance === 0) {
+      BUDGET.visitedNodes++;
+      return null;
+    }
+
+    const pending = {
+      pending: true,
+      node,
+      parentIframe,
+      parentRecord,
+      inheritsParentStatus,
+      distance,
+      records: [],
+      done: false,
+      result: null,
+    };
+    currentRecords.push(pending);
+    BUDGET.pending.push(pending);
+    return pending;
+  }
+
+  /**
+   * Visits the pending traversals, nearest to the viewport first, until the budget is used up.
+   */
+  function drainPendingTraversals() {
+    BUDGET.draining = true;
+    const queue = BUDGET.pending.sort((a, b) => a.distance - b.distance);
+    BUDGET.pending = [];
+
+    for (const pending of queue) {
+      if (isBudgetExhausted()) {
+        BUDGET.pending.push(pending);
+        continue;
+      }
+
+      const previousRecords = currentRecords;
+      currentRecords = pending.records;
+      pending.result = buildDomTree(pending.node, pending.parentIframe, pending.parentRecord, pending.inheritsParentStatus);
+      currentRecords = previousRecords;
+      pending.done = true;
+    }
+  }
+
+  /**
+   * Replaces the visited pending traversals in the children lists by their result.
+   * Returns the ids of the nodes that still have pending children.
+   */
+  function settlePendingTraversals() {
+    const idsWithPendingChildren = [];
+    for (const [id, nodeData] of Object.entries(DOM_HASH_MAP)) {
+      if (!nodeData.children || !nodeData.children.some(child => typeof child === 'object')) continue;
+
+      const children = [];
+      for (let child of nodeData.children) {
+        while (child !== null && typeof child === 'object' && child.done) child = child.result;
+        if (child !== null) children.push(child);
+      }
+      nodeData.children = children;
+      if (children.some(child => typeof child === 'object')) idsWithPendingChildren.push(id);
+    }
+    return idsWithPendingChildren;
+  }
+
+  /**
+   * Resolves isTopElement, interactivity and highlighting of the traversed elements, in traversal order.
+   *
+   * An element counts as having a highlighted parent if its parent element was highlighted, or - for
+   * regular children - if the parent itself had a highlighted parent. Iframe documents start over.
+   */
+  function resolveHighlights() {
+    const records = collectUnresolvedRecords(elementRecords);
+    resolveTopElements(records);
+
+    for (const record of records) {
+      record.resolved = true;
+      const { node, nodeData, parentIframe, parentRecord } = record;
+      const isParentHighlighted = parentRecord !== null &&
+        (parentRecord.wasHighlighted || (record.inheritsParentStatus && parentRecord.isParentHighlighted));
+      record.isParentHighlighted = isParentHighlighted;
+
+      if (nodeData.isVisible) {
+        nodeData.isTopElement = record.isTopElement;
+        if (nodeData.isTopElement) {
+          nodeData.isInteractive = isInteractiveElement(node);
+          // Call the dedicated highlighting function
+          record.wasHighlighted = handleHighlighting(nodeData, node, parentIframe, isParentHighlighted);
+        }
+      }
+
+      if (leafTextMode && nodeData.highlightIndex !== undefined) {
+        nodeData.textContent = getElementText(node);
+      }
+    }
+  }
+
   /**
    * Creates a node data object for a given node and its descendants.
+   *
+   * `parentRecord` is the record of the parent element in the traversal (null for the children of the body and of
+   * iframes), `inheritsParentStatus` tells whether a highlighted grandparent also counts as a highlighted parent.
    */
-  function buildDomTree(node, parentIframe = null, isParentHighlighted = false) {
+  function buildDomTree(node, parentIframe = null, parentRecord = null, inheritsParentStatus = true) {
     // Fast rejection checks first
     if (!node || node.id === HIGHLIGHT_CONTAINER_ID || 
         (node.nodeType !== Node.ELEMENT_NODE && node.nodeType !== Node.TEXT_NODE)) {
@@ -1177,16 +1650,21 @@
 
       // Process children of body
       for (const child of node.childNodes) {
-        const domElement = buildDomTree(child, parentIframe, false); // Body's children have no highlighted parent initially
+        const domElement = buildDomTree(child, parentIframe, null); // Body's children have no highlighted parent initially
         if (domElement) nodeData.children.push(domElement);
       }
 
-      const id = `${ID.current++}`;
+      const id = getNodeId(node);
       DOM_HASH_MAP[id] = nodeData;
       if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
       return id;
     }
 
+    if (BUDGET) {
+      const pending = deferTraversal(node, parentIframe, parentRecord, inheritsParentStatus);
+      if (pending) return pending;
+    }
+
     // Early bailout for non-element nodes except text
     if (node.nodeType !== Node.ELEMENT_NODE && node.nodeType !== Node.TEXT_NODE) {
       if (debugMode) PERF_METRICS.nodeMetrics.skippedNodes++;
@@ -1208,7 +1686,7 @@
         return null;
       }
 
-      const id = `${ID.current++}`;
+      const id = getNodeId(node);
       DOM_HASH_MAP[id] = {
         type: "TEXT_NODE",
         text: textContent,
@@ -1252,12 +1730,20 @@
     // Process element node
     const nodeData = {
       tagName: node.tagName.toLowerCase(),
-      textContent: node.textContent.trim(),
+      textContent: leafTextMode ? null : node.textContent.trim(),
       attributes: {},
-      xpath: getXPathTree(node, true),
+      xpath: highlightedXPathMode ? null : getXPathTree(node, true),
       children: [],
     };
 
+    if (highlightedXPathMode) {
+      if (node.tagName.toLowerCase() === 'iframe' || node.shadowRoot || isXPathBoundary(node)) {
+        nodeData.xpath = getXPathTree(node, true);
+      } else {
+        nodeData.xpathSegment = getXPathSegment(node);
+      }
+    }
+
     // Get attributes for interactive elements or potential text containers
     if (isInteractiveCandidate(node) || node.tagName.toLowerCase() === 'iframe' || node.tagName.toLowerCase() === 'body') {
       const attributeNames = node.getAttributeNames?.() || [];
@@ -1266,19 +1752,19 @@
       }
     }
 
-    let nodeWasHighlighted = false;
-    // Perform visibility, interactivity, and highlighting checks
-    if (node.nodeType === Node.ELEMENT_NODE) {
-      nodeData.isVisible = isElementVisible(node); // isElementVisible uses offsetWidth/Height, which is fine
-      if (nodeData.isVisible) {
-        nodeData.isTopElement = isTopElement(node);
-        if (nodeData.isTopElement) {
-          nodeData.isInteractive = isInteractiveElement(node);
-          // Call the dedicated highlighting function
-          nodeWasHighlighted = handleHighlighting(nodeData, node, parentIframe, isParentHighlighted);
-        }
-      }
-    }
+    // Top element, interactivity and highlighting checks are deferred to resolveHighlights
+    nodeData.isVisible = isElementVisible(node); // isElementVisible uses offsetWidth/Height, which is fine
+    const record = {
+      node,
+      nodeData,
+      parentIframe,
+      parentRecord,
+      inheritsParentStatus,
+      isTopElement: false,
+      isParentHighlighted: false,
+      wasHighlighted: false,
+    };
+    currentRecords.push(record);
 
     // Process children, with special handling for iframes and rich text editors
     if (node.tagName) {
@@ -1289,8 +1775,9 @@
         try {
           const iframeDoc = node.contentDocument || node.contentWindow?.document;
           if (iframeDoc) {
+            if (SNAPSHOT) SNAPSHOT.observeRoot(iframeDoc);
             for (const child of iframeDoc.childNodes) {
-              const domElement = buildDomTree(child, node, false);
+              const domElement = buildDomTree(child, node, null);
               if (domElement) nodeData.children.push(domElement);
             }
           }
@@ -1308,7 +1795,7 @@
       ) {
         // Process all child nodes to capture formatted text
         for (const child of node.childNodes) {
-          const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted);
+          const domElement = buildDomTree(child, parentIframe, record, false);
           if (domElement) nodeData.children.push(domElement);
         }
       }
@@ -1316,16 +1803,16 @@
         // Handle shadow DOM
         if (node.shadowRoot) {
           nodeData.shadowRoot = true;
+          if (SNAPSHOT) SNAPSHOT.observeRoot(node.shadowRoot);
           for (const child of node.shadowRoot.childNodes) {
-            const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted);
+            const domElement = buildDomTree(child, parentIframe, record, false);
             if (domElement) nodeData.children.push(domElement);
           }
         }
         // Handle regular elements
         for (const child of node.childNodes) {
-          // Pass the highlighted status of the *current* node to its children
-          const passHighlightStatusToChild = nodeWasHighlighted || isParentHighlighted;
-          const domElement = buildDomTree(child, parentIframe, passHighlightStatusToChild);
+          // Children inherit the highlighted status of the *current* node and of its highlighted parent
+          const domElement = buildDomTree(child, parentIframe, record);
           if (domElement) nodeData.children.push(domElement);
         }
       }
@@ -1337,7 +1824,7 @@
       return null;
     }
 
-    const id = `${ID.current++}`;
+    const id = getNodeId(node);
     DOM_HASH_MAP[id] = nodeData;
     if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
     return id;
@@ -1345,18 +1832,304 @@
 
   // After all functions are defined, wrap them with performance measurement
   // Remove buildDomTree from here as we measure it separately
-  highlightElement = measureTime(highlightElement);
   isInteractiveElement = measureTime(isInteractiveElement);
   isElementVisible = measureTime(isElementVisible);
-  isTopElement = measureTime(isTopElement);
+  getTopElementProbe = measureTime(getTopElementProbe);
   isInExpandedViewport = measureTime(isInExpandedViewport);
   isTextNodeVisible = measureTime(isTextNodeVisible);
   getEffectiveScroll = measureTime(getEffectiveScroll);
 
-  const rootId = buildDomTree(document.body);
+  /**
+   * Cheap page-level signature that catches layout changes no observer reports
+   * (e.g. an image that finished loading before its load event was dispatched).
+   */
+  function getPageSignature() {
+    const root = document.documentElement;
+    return [
+      window.innerWidth, window.innerHeight, window.scrollX, window.scrollY,
+      root ? root.scrollWidth : 0, root ? root.scrollHeight : 0, document.readyState,
+    ].join(',');
+  }
+
+  /**
+   * Re-draws the highlights of the previous snapshot without traversing the DOM again.
+   */
+  function redrawSnapshotHighlights() {
+    if (!doHighlightElements) return;
+    for (const { node, index, parentIframe } of SNAPSHOT.highlights) {
+      if (focusHighlightIndex >= 0 && focusHighlightIndex !== index) continue;
+      pendingHighlights.push({ element: node, index, parentIframe });
+    }
+    flushHighlights();
+  }
+
+  /**
+   * Returns whether two values of a node's data are equal: primitives by identity, arrays
+   * (children) and plain objects (attributes) one level deep.
+   */
+  function sameNodeValue(a, b) {
+    if (a === b) return true;
+    if (!a || !b || typeof a !== 'object' || typeof b !== 'object') return false;
+    if (Array.isArray(a)) {
+      if (!Array.isArray(b) || a.length !== b.length) return false;
+      for (let i = 0; i < a.length; i++) {
+        if (a[i] !== b[i]) return false;
+      }
+      return true;
+    }
+    const keys = Object.keys(a);
+    if (keys.length !== Object.keys(b).length) return false;
+    for (const key of keys) {
+      if (a[key] !== b[key]) return false;
+    }
+    return true;
+  }
+
+  /**
+   * Returns a copy of a node's data that later traversals cannot mutate (resumed extractions
+   * append children to and re-resolve the flags of node objects that were already sent).
+   */
+  function copyNodeData(nodeData) {
+    const copy = {};
+    for (const [key, value] of Object.entries(nodeData)) {
+      if (Array.isArray(value)) copy[key] = value.slice();
+      else if (value && typeof value === 'object') copy[key] = { ...value };
+      else copy[key] = value;
+    }
+    return copy;
+  }
+
+  /**
+   * Returns whether a node's data is unchanged since it was last sent.
+   */
+  function sameNodeData(a, b) {
+    if (!a) return false;
+    const keys = Object.keys(b);
+    if (keys.length !== Object.keys(a).length) return false;
+    for (const key of keys) {
+      if (!sameNodeValue(a[key], b[key])) return false;
+    }
+    return true;
+  }
+
+  /**
+   * Compares the freshly built node map with what was sent in the previous snapshot and
+   * returns only the added/changed nodes and the ids of the removed ones.
+   *
+   * The traversal itself is still complete whenever the DOM is dirty, only what is
+   * transferred to (and parsed by) Python is incremental.
+   */
+  function diffSnapshot() {
+    const changed = {};
+    const seen = new Set();
+    for (const id of Object.keys(DOM_HASH_MAP)) {
+      seen.add(id);
+      const nodeData = DOM_HASH_MAP[id];
+      if (!sameNodeData(SNAPSHOT.emitted.get(id), nodeData)) {
+        changed[id] = nodeData;
+        SNAPSHOT.emitted.set(id, copyNodeData(nodeData));
+      }
+    }
+    const removed = [];
+    for (const id of SNAPSHOT.emitted.keys()) {
+      if (!seen.has(id)) removed.push(id);
+    }
+    for (const id of removed) SNAPSHOT.emitted.delete(id);
+    return { changed, removed };
+  }
+
+  // Bit flags of the columnar format, mirrored in browser_use/dom/service.py
+  const NODE_FLAGS = { isVisible: 1, isInteractive: 2, isTopElement: 4, isInViewport: 8, shadowRoot: 16 };
+
+  /**
+   * Encodes a node map as parallel integer columns plus an interned string table.
+   *
+   * Node i has id `ids[i]`, tag `strings[tags[i]]` (-1 for text nodes), text `strings[texts[i]]` (-1 for none),
+   * xpath `strings[xpaths[i]]` or its last step `strings[xpathSegments[i]]`, flags `flags[i]` and highlight index
+   * `highlightIndices[i]` (-1 for none).
+   * Its attributes are the key/value string indices `attributes[attributeOffsets[i]..attributeOffsets[i + 1]]`
+   * and its children the ids `children[childOffsets[i]..childOffsets[i + 1]]`.
+   */
+  function encodeColumns(nodeMap) {
+    const strings = [];
+    const stringIndices = new Map();
+    const intern = (value) => {
+      let index = stringIndices.get(value);
+      if (index === undefined) {
+        index = strings.length;
+        strings.push(value);
+        stringIndices.set(value, index);
+      }
+      return index;
+    };
+
+    const columns = {
+      strings, ids: [], tags: [], texts: [], xpaths: [], xpathSegments: [], flags: [], highlightIndices: [],
+      attributeOffsets: [0], attributes: [], childOffsets: [0], children: [],
+    };
+    for (const id of Object.keys(nodeMap)) {
+      const node = nodeMap[id];
+      let flags = 0;
+      for (const key in NODE_FLAGS) {
+        if (node[key]) flags |= NODE_FLAGS[key];
+      }
+      columns.ids.push(Number(id));
+      columns.flags.push(flags);
+      if (node.type === "TEXT_NODE") {
+        columns.tags.push(-1);
+        columns.texts.push(intern(node.text));
+        columns.xpaths.push(-1);
+        columns.xpathSegments.push(-1);
+        columns.highlightIndices.push(-1);
+      } else {
+        columns.tags.push(intern(node.tagName));
+        columns.texts.push(node.textContent === null ? -1 : intern(node.textContent));
+        columns.xpaths.push(node.xpath === null ? -1 : intern(node.xpath));
+        columns.xpathSegments.push(node.xpathSegment === undefined ? -1 : intern(node.xpathSegment));
+        columns.highlightIndices.push(node.highlightIndex ?? -1);
+        for (const [key, value] of Object.entries(node.attributes)) {
+          columns.attributes.push(intern(key), intern(value));
+        }
+        for (const childId of node.children) columns.children.push(Number(childId));
+      }
+      columns.attributeOffsets.push(columns.attributes.length);
+      columns.childOffsets.push(columns.children.length);
+    }
+    return columns;
+  }
+
+  /**
+   * Puts the node map (or delta) into the requested transfer format.
+   */
+  function encodeResult(result) {
+    if (!columnar) return result;
+    result.format = 'columnar';
+    result.rootId = Number(result.rootId);
+    if (result.map) result.map = encodeColumns(result.map);
+    if (result.delta) {
+      result.delta = { changed: encodeColumns(result.delta.changed), removed: result.delta.removed.map(Number) };
+    }
+    return result;
+  }
+
+  /**
+   * Scroll position and title of the page, sent with every result so the caller needs no further round trips.
+   */
+  function getPageInfo() {
+    const root = document.documentElement;
+    if (CHANGE_TRACKER) CHANGE_TRACKER.flush();
+    return {
+      scrollX: window.scrollX,
+      scrollY: window.scrollY,
+      viewportWidth: window.innerWidth,
+      viewportHeight: window.innerHeight,
+      scrollHeight: root ? root.scrollHeight : 0,
+      devicePixelRatio: window.devicePixelRatio,
+      title: document.title,
+      lastChange: CHANGE_TRACKER ? CHANGE_TRACKER.lastChange : null,
+      lastOverlayChange: CHANGE_TRACKER ? CHANGE_TRACKER.lastOverlayChange : null,
+    };
+  }
+
+  // The highlights of the previous extraction are replaced by the ones of this one
+  cleanupHighlights();
+
+  let snapshotDelta = null;
+  if (SNAPSHOT) {
+    SNAPSHOT.flush();
+    const argsKey = `${viewportExpansion}|${doHighlightElements}`;
+    const pageSignature = getPageSignature();
+    const canDiff = baseSnapshotId !== null && baseSnapshotId === SNAPSHOT.snapshotId && argsKey === SNAPSHOT.argsKey;
+
+    if (canDiff && !SNAPSHOT.dirty && pageSignature === SNAPSHOT.pageSignature) {
+      // Nothing changed since the snapshot the caller already has
+      redrawSnapshotHighlights();
+      const unchanged = { rootId: SNAPSHOT.rootId, snapshotId: SNAPSHOT.snapshotId, delta: { changed: {}, removed: [] } };
+      if (debugMode) unchanged.perfMetrics = { snapshot: { mode: 'unchanged', changedNodes: 0, removedNodes: 0 } };
+      unchanged.pageInfo = getPageInfo();
+      return encodeResult(unchanged);
+    }
+
+    // a traversal that throws half-way must not leave a snapshot id behind that looks up to date
+    SNAPSHOT.snapshotId = null;
+    SNAPSHOT.dirty = false;
+    SNAPSHOT.argsKey = argsKey;
+    SNAPSHOT.pageSignature = pageSignature;
+    SNAPSHOT.highlights = [];
+    SNAPSHOT.canDiff = canDiff;
+  }
 
-  // Clear the cache before starting
-  DOM_CACHE.clearCache();
+  const traversalStart = performance.now();
+  const argsKey = `${viewportExpansion}|${doHighlightElements}|${textMode}|${xpathMode}`;
+  const resumed = BUDGET && resume ? window.__browserUseTraversal : null;
+  delete window.__browserUseTraversal;
+
+  let rootId;
+  if (resumed && resumed.argsKey === argsKey) {
+    // Continue the truncated extraction: earlier nodes keep their ids and highlight indices
+    Object.assign(DOM_HASH_MAP, resumed.map);
+    ID.current = resumed.nextId;
+    highlightIndex = resumed.highlightIndex;
+    elementRecords.push(...resumed.records);
+    BUDGET.pending = resumed.pending;
+    BUDGET.highlights = resumed.highlights;
+    for (const { node, index, parentIframe } of resumed.highlights) {
+      if (focusHighlightIndex >= 0 && focusHighlightIndex !== index) continue;
+      if (doHighlightElements) pendingHighlights.push({ element: node, index, parentIframe });
+    }
+    rootId = resumed.rootId;
+  } else {
+    rootId = buildDomTree(document.body);
+  }
+
+  let truncation = null;
+  let idsWithPendingChildren = [];
+  if (BUDGET) {
+    drainPendingTraversals();
+    idsWithPendingChildren = settlePendingTraversals();
+    if (BUDGET.pending.length > 0) {
+      const next = BUDGET.pending.sort((a, b) => a.distance - b.distance)[0].node;
+      const nextElement = next.nodeType === Node.ELEMENT_NODE ? next : next.parentElement;
+      truncation = {
+        reason: BUDGET.reason,
+        visitedNodes: BUDGET.visitedNodes,
+        pendingSubtrees: BUDGET.pending.length,
+        stoppedAt: nextElement ? getXPathTree(nextElement, true) : null,
+      };
+    }
+  }
+
+  const topElementsStart = performance.now();
+  resolveHighlights();
+  if (PERF_METRICS) {
+    PERF_METRICS.phases.read += performance.now() - traversalStart;
+    PERF_METRICS.timings.isTopElement += performance.now() - topElementsStart;
+  }
+  flushHighlights();
+
+  if (truncation) {
+    window.__browserUseTraversal = {
+      argsKey,
+      rootId,
+      map: DOM_HASH_MAP,
+      nextId: ID.current,
+      highlightIndex,
+      records: elementRecords,
+      pending: BUDGET.pending,
+      highlights: BUDGET.highlights,
+    };
+  }
+
+  if (SNAPSHOT) {
+    SNAPSHOT.snapshotId = `${SNAPSHOT.token}-${++SNAPSHOT.counter}`;
+    SNAPSHOT.rootId = rootId;
+    if (!SNAPSHOT.canDiff) SNAPSHOT.emitted = new Map();
+    const delta = diffSnapshot();
+    if (SNAPSHOT.canDiff) snapshotDelta = delta;
+  } else {
+    // Clear the cache before starting
+    DOM_CACHE.clearCache();
+  }
 
   // Only process metrics in debug mode
   if (debugMode && PERF_METRICS) {
@@ -1365,6 +2138,9 @@
       PERF_METRICS.timings[key] = PERF_METRICS.timings[key] / 1000;
     });
 
+    PERF_METRICS.phases.read /= 1000;
+    PERF_METRICS.phases.write /= 1000;
+
     Object.keys(PERF_METRICS.buildDomTreeBreakdown).forEach(key => {
       if (typeof PERF_METRICS.buildDomTreeBreakdown[key] === 'number') {
         PERF_METRICS.buildDomTreeBreakdown[key] = PERF_METRICS.buildDomTreeBreakdown[key] / 1000;
@@ -1408,7 +2184,27 @@
     }
   }
 
-  return debugMode ?
-    { rootId, map: DOM_HASH_MAP, perfMetrics: PERF_METRICS } :
-    { rootId, map: DOM_HASH_MAP };
+  if (debugMode && SNAPSHOT) {
+    PERF_METRICS.snapshot = {
+      mode: snapshotDelta ? 'delta' : 'full',
+      changedNodes: Object.keys(snapshotDelta ? snapshotDelta.changed : DOM_HASH_MAP).length,
+      removedNodes: snapshotDelta ? snapshotDelta.removed.length : 0,
+    };
+  }
+
+  let map = DOM_HASH_MAP;
+  if (idsWithPendingChildren.length > 0) {
+    // pending traversals are not sent, the kept state still needs them to resume
+    map = Object.assign({}, DOM_HASH_MAP);
+    for (const id of idsWithPendingChildren) {
+      map[id] = Object.assign({}, map[id], { children: map[id].children.filter(child => typeof child === 'string') });
+    }
+  }
+
+  const result = snapshotDelta ? { rootId, delta: snapshotDelta } : { rootId, map };
+  if (SNAPSHOT) result.snapshotId = SNAPSHOT.snapshotId;
+  if (truncation) result.truncated = truncation;
+  if (debugMode) result.perfMetrics = PERF_METRICS;
+  result.pageInfo = getPageInfo();
+  return encodeResult(result);
 };
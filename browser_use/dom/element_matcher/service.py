@@ -0,0 +1,179 @@
+import re
+from collections.abc import Iterable
+
+from browser_use.dom.element_matcher.views import ElementMatch
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+from browser_use.dom.views import DOMElementNode
+
+# attributes that usually survive a re-render, the others (style, value, tabindex, ...) change with the page state
+STABLE_ATTRIBUTES = {
+	'id',
+	'name',
+	'type',
+	'role',
+	'href',
+	'title',
+	'alt',
+	'for',
+	'placeholder',
+	'aria-label',
+	'aria-labelledby',
+	'data-testid',
+}
+# suffixes of the branch path up to this length are features, so changes far up the tree weigh little
+BRANCH_PATH_SUFFIXES = 4
+MAX_TEXT_WORDS = 32
+
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def element_features(
+	branch_path: list[str],
+	attributes: dict[str, str],
+	text: str,
+) -> frozenset[str]:
+	"""
+	The feature set two versions of an element are compared by: tag path, stable attributes and text.
+	The XPath is left out, its indices change whenever a sibling is inserted, and so is the position, which the
+	extractor does not report.
+	"""
+	features = set()
+
+	for length in range(1, min(BRANCH_PATH_SUFFIXES, len(branch_path)) + 1):
+		features.add('path:' + '/'.join(branch_path[-length:]))
+
+	for key, value in attributes.items():
+		if key == 'class':
+			features.update(f'class:{token}' for token in value.split())
+		elif key in STABLE_ATTRIBUTES:
+			features.add(f'attr:{key}={value}')
+
+	for word in WORD_PATTERN.findall(text.lower())[:MAX_TEXT_WORDS]:
+		features.add(f'text:{word}')
+
+	return frozenset(features)
+
+
+def history_element_features(history_element: DOMHistoryElement) -> frozenset[str]:
+	return element_features(
+		history_element.entire_parent_branch_path,
+		history_element.attributes,
+		history_element.text_content or '',
+	)
+
+
+def dom_element_features(dom_element: DOMElementNode) -> frozenset[str]:
+	return element_features(
+		HistoryTreeProcessor._get_parent_branch_path(dom_element),
+		dom_element.attributes,
+		dom_element.get_text_content(),
+	)
+
+
+def jaccard(features1: frozenset[str], features2: frozenset[str]) -> float:
+	if not features1 and not features2:
+		return 1.0
+	return len(features1 & features2) / len(features1 | features2)
+
+
+class ElementMatcher:
+	"""
+	Finds the element of the current page that corresponds to an element recorded in the history,
+	when it changed too much for an exact hash lookup (a class was added, a sibling was inserted, ...).
+
+	Elements are indexed by MinHash signatures of their features, split into bands (LSH): only elements that share
+	a band with the recorded one are compared, so a lookup does not scan the page.
+	The signatures use one-permutation hashing (one hash per feature, binned), with empty bins filled from the next
+	non-empty bin so sparse feature sets still fill every band.
+	"""
+
+	def __init__(
+		self, elements: Iterable[DOMElementNode], num_bins: int = 32, rows_per_band: int = 4, ambiguity_margin: float = 0.25
+	):
+		if num_bins % rows_per_band:
+			raise ValueError('num_bins must be a multiple of rows_per_band')
+		self.num_bins = num_bins
+		self.rows_per_band = rows_per_band
+		self.ambiguity_margin = ambiguity_margin
+
+		self.elements: list[DOMElementNode] = []
+		self.features: list[frozenset[str]] = []
+		self.buckets: dict[tuple, list[int]] = {}
+
+		for element in elements:
+			features = dom_element_features(element)
+			position = len(self.elements)
+			self.elements.append(element)
+			self.features.append(features)
+			for key in self._band_keys(features):
+				self.buckets.setdefault(key, []).append(position)
+
+	def match(self, history_element: DOMHistoryElement) -> ElementMatch | None:
+		"""
+		The most similar element with the same tag, or None when no element shares a band with it.
+
+		The confidence is the similarity, minus how far the runner-up comes within `ambiguity_margin` of it:
+		of two identical buttons neither is a confident match.
+		"""
+		features = history_element_features(history_element)
+
+		candidates = set()
+		for key in self._band_keys(features):
+			candidates.update(self.buckets.get(key, ()))
+
+		scored = sorted(
+			(
+				(jaccard(features, self.features[position]), -position)
+				for position in candidates
+				if self.elements[position].tag_name == history_element.tag_name
+			),
+			reverse=True,
+		)
+		if not scored:
+			return None
+
+		similarity, position = scored[0]
+		runner_up = scored[1][0] if len(scored) > 1 else 0.0
+		confidence = similarity - max(0.0, runner_up - similarity + self.ambiguity_margin)
+		return ElementMatch(element=self.elements[-position], similarity=similarity, confidence=max(0.0, confidence))
+
+	@staticmethod
+	def similarity(history_element1: DOMHistoryElement, history_element2: DOMHistoryElement) -> float:
+		"""Similarity of two recorded elements, 0 when their tags differ"""
+		if history_element1.tag_name != history_element2.tag_name:
+			return 0.0
+		return jaccard(history_element_features(history_element1), history_element_features(history_element2))
+
+	def _signature(self, features: frozenset[str]) -> list[tuple[int, int]]:
+		bins: list[int | None] = [None] * self.num_bins
+		for feature in features:
+			value = hash(feature) & HASH_MASK
+			index = value % self.num_bins
+			value //= self.num_bins
+			current = bins[index]
+			if current is None or value < current:
+				bins[index] = value
+
+		# densification: an empty bin takes the value of the next non-empty one, tagged with the distance to it.
+		# Walking twice around the bins from the right, every empty bin has seen its next non-empty bin.
+		signature: list[tuple[int, int]] = [(0, 0)] * self.num_bins
+		next_value: int | None = None
+		distance = 0
+		for index in range(2 * self.num_bins - 1, -1, -1):
+			value = bins[index % self.num_bins]
+			if value is not None:
+				next_value, distance = value, 0
+			else:
+				distance += 1
+			if index < self.num_bins and next_value is not None:
+				signature[index] = (distance, next_value)
+		return signature
+
+	def _band_keys(self, features: frozenset[str]) -> list[tuple]:
+		signature = self._signature(features)
+		return [
+			(band, *signature[band * self.rows_per_band : (band + 1) * self.rows_per_band])
+			for band in range(self.num_bins // self.rows_per_band)
+		]
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+
+from browser_use.dom.views import DOMElementNode
+
+
+@dataclass
+class ElementMatch:
+	"""
+	The element of the current page most similar to a recorded one
+
+	similarity: Jaccard similarity of the features of both elements
+	confidence: the similarity, lowered when another element comes close to it (see ElementMatcher.match)
+	"""
+
+	element: DOMElementNode
+	similarity: float
+	confidence: float
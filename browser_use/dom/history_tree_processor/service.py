@@ -1,7 +1,96 @@
 import hashlib
+import os
+from typing import Any, Literal
 
 from browser_use.dom.history_tree_processor.view import DOMHistoryElement, HashedDomElement
-from browser_use.dom.views import DOMElementNode
+from browser_use.dom.views import DOMElementIndex, DOMElementNode, DOMState
+
+HashMode = Literal['fast', 'sha256']
+
+
+class ElementHasher:
+	"""
+	Hashes the identity of DOM elements (`HashedDomElement`).
+
+	The branch path hash of an element is derived from the one of its parent, so hashing a whole tree top-down
+	(`hash_tree`) costs one step per element instead of one walk to the root per element.
+
+	mode:
+		fast: Python's built-in hash, only stable within one process (see PYTHONHASHSEED)
+		sha256: the SHA-256 hex digests of earlier versions, use it when hashes are persisted or compared across processes
+	"""
+
+	def __init__(self, mode: HashMode = 'fast'):
+		if mode not in ('fast', 'sha256'):
+			raise ValueError(f'Unknown element hash mode: {mode}')
+		self.mode = mode
+
+	def hash_string(self, string: str) -> str:
+		if self.mode == 'sha256':
+			return hashlib.sha256(string.encode()).hexdigest()
+		return self._format(hash(string))
+
+	def extend_branch_path(self, state: Any, tag_name: str) -> Any:
+		"""The branch path state of a child with `tag_name`, `state` being the one of its parent (None for an empty path)"""
+		if self.mode == 'sha256':
+			# hash objects are copied, the digest stays the one of '/'.join(branch_path)
+			if state is None:
+				return hashlib.sha256(tag_name.encode())
+			state = state.copy()
+			state.update(f'/{tag_name}'.encode())
+			return state
+		return hash((state, tag_name))
+
+	def branch_path_hash(self, state: Any) -> str:
+		if self.mode == 'sha256':
+			return state.hexdigest() if state is not None else self.hash_string('')
+		return self._format(hash(state))
+
+	def attributes_hash(self, attributes: dict[str, str]) -> str:
+		if self.mode == 'sha256':
+			return self.hash_string(''.join(f'{key}={value}' for key, value in attributes.items()))
+		return self._format(hash(tuple(attributes.items())))
+
+	def hash_branch_path(self, branch_path: list[str]) -> str:
+		state = None
+		for tag_name in branch_path:
+			state = self.extend_branch_path(state, tag_name)
+		return self.branch_path_hash(state)
+
+	def hash_element(self, dom_element: DOMElementNode, branch_path_hash: str | None = None) -> HashedDomElement:
+		if branch_path_hash is None:
+			branch_path_hash = self.hash_branch_path(HistoryTreeProcessor._get_parent_branch_path(dom_element))
+		return HashedDomElement(
+			branch_path_hash,
+			self.attributes_hash(dom_element.attributes),
+			self.hash_string(dom_element.get_xpath()),
+		)
+
+	def hash_tree(self, root: DOMElementNode) -> None:
+		"""Hash all highlighted elements of a tree in one pass, `DOMElementNode.hash` returns the stored result"""
+		stack: list[tuple[DOMElementNode, Any]] = [(root, None)]
+		while stack:
+			node, state = stack.pop()
+			if node.highlight_index is not None:
+				node._hash = self.hash_element(node, self.branch_path_hash(state))
+			for child in node.children:
+				if isinstance(child, DOMElementNode):
+					stack.append((child, self.extend_branch_path(state, child.tag_name)))
+
+	def combine(self, hashed_element: HashedDomElement) -> str:
+		"""One string for the whole identity of an element"""
+		if self.mode == 'sha256':
+			return self.hash_string(
+				f'{hashed_element.branch_path_hash}-{hashed_element.attributes_hash}-{hashed_element.xpath_hash}'
+			)
+		return self._format(hash((hashed_element.branch_path_hash, hashed_element.attributes_hash, hashed_element.xpath_hash)))
+
+	@staticmethod
+	def _format(value: int) -> str:
+		return format(value & 0xFFFFFFFFFFFFFFFF, '016x')
+
+
+element_hasher = ElementHasher(os.getenv('BROWSER_USE_ELEMENT_HASH_MODE', 'fast'))  # type: ignore
 
 
 class HistoryTreeProcessor:
@@ -19,7 +108,7 @@ class HistoryTreeProcessor:
 		css_selector = BrowserContext._enhanced_css_selector_for_element(dom_element)
 		return DOMHistoryElement(
 			dom_element.tag_name,
-			dom_element.text_content,
+			dom_element.get_text_content(),
 			dom_element.xpath,
 			dom_element.highlight_index,
 			parent_branch_path,
@@ -34,25 +123,18 @@ class HistoryTreeProcessor:
 	@staticmethod
 	def find_history_element_in_tree(dom_history_element: DOMHistoryElement, tree: DOMElementNode) -> DOMElementNode | None:
 		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
+		return DOMElementIndex(tree).get(hashed_dom_history_element)
 
-		def process_node(node: DOMElementNode):
-			if node.highlight_index is not None:
-				hashed_node = HistoryTreeProcessor._hash_dom_element(node)
-				if hashed_node == hashed_dom_history_element:
-					return node
-			for child in node.children:
-				if isinstance(child, DOMElementNode):
-					result = process_node(child)
-					if result is not None:
-						return result
-			return None
-
-		return process_node(tree)
+	@staticmethod
+	def find_history_element_in_state(dom_history_element: DOMHistoryElement, state: DOMState) -> DOMElementNode | None:
+		"""Like find_history_element_in_tree, with the index the state keeps for all lookups on it"""
+		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
+		return state.element_index.get(hashed_dom_history_element)
 
 	@staticmethod
 	def compare_history_element_and_dom_element(dom_history_element: DOMHistoryElement, dom_element: DOMElementNode) -> bool:
 		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
-		hashed_dom_element = HistoryTreeProcessor._hash_dom_element(dom_element)
+		hashed_dom_element = dom_element.hash
 
 		return hashed_dom_history_element == hashed_dom_element
 
@@ -65,6 +147,7 @@ class HistoryTreeProcessor:
 			xpath_hash = HistoryTreeProcessor._xpath_hash(dom_history_element.text_content)
 
 			return HashedDomElement(branch_path_hash, attributes_hash, xpath_hash)
+
 		return my_hash_dom_history_element(e1) == my_hash_dom_history_element(e2)
 
 	@staticmethod
@@ -77,13 +160,8 @@ class HistoryTreeProcessor:
 
 	@staticmethod
 	def _hash_dom_element(dom_element: DOMElementNode) -> HashedDomElement:
-		parent_branch_path = HistoryTreeProcessor._get_parent_branch_path(dom_element)
-		branch_path_hash = HistoryTreeProcessor._parent_branch_path_hash(parent_branch_path)
-		attributes_hash = HistoryTreeProcessor._attributes_hash(dom_element.attributes)
-		xpath_hash = HistoryTreeProcessor._xpath_hash(dom_element.xpath)
 		# text_hash = DomTreeProcessor._text_hash(dom_element)
-
-		return HashedDomElement(branch_path_hash, attributes_hash, xpath_hash)
+		return element_hasher.hash_element(dom_element)
 
 	@staticmethod
 	def _get_parent_branch_path(dom_element: DOMElementNode) -> list[str]:
@@ -99,20 +177,18 @@ class HistoryTreeProcessor:
 
 	@staticmethod
 	def _parent_branch_path_hash(parent_branch_path: list[str]) -> str:
-		parent_branch_path_string = '/'.join(parent_branch_path)
-		return hashlib.sha256(parent_branch_path_string.encode()).hexdigest()
+		return element_hasher.hash_branch_path(parent_branch_path)
 
 	@staticmethod
 	def _attributes_hash(attributes: dict[str, str]) -> str:
-		attributes_string = ''.join(f'{key}={value}' for key, value in attributes.items())
-		return hashlib.sha256(attributes_string.encode()).hexdigest()
+		return element_hasher.attributes_hash(attributes)
 
 	@staticmethod
 	def _xpath_hash(xpath: str) -> str:
-		return hashlib.sha256(xpath.encode()).hexdigest()
+		return element_hasher.hash_string(xpath)
 
 	@staticmethod
 	def _text_hash(dom_element: DOMElementNode) -> str:
 		""" """
 		text_string = dom_element.get_all_text_till_next_clickable_element()
-		return hashlib.sha256(text_string.encode()).hexdigest()
+		return element_hasher.hash_string(text_string)
@@ -1,24 +1,57 @@
+import hashlib
 import json
 import logging
+import sys
+from collections.abc import Iterator
 from dataclasses import dataclass
 from importlib import resources
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 from urllib.parse import urlparse
 
 if TYPE_CHECKING:
 	from patchright.async_api import Page
 
+from browser_use.dom.history_tree_processor.service import element_hasher
+from browser_use.dom.snapshot_patcher.service import DomSnapshotPatcher, ParsedNode
 from browser_use.dom.views import (
 	DOMBaseNode,
 	DOMElementNode,
+	DOMPageInfo,
 	DOMState,
 	DOMTextNode,
+	DOMTruncation,
 	SelectorMap,
 )
 from browser_use.utils import time_execution_async
 
 logger = logging.getLogger(__name__)
 
+# Bit flags of the columnar transfer format, mirrored in buildDomTree.js
+NODE_FLAG_VISIBLE = 1
+NODE_FLAG_INTERACTIVE = 2
+NODE_FLAG_TOP_ELEMENT = 4
+NODE_FLAG_IN_VIEWPORT = 8
+NODE_FLAG_SHADOW_ROOT = 16
+
+BUILD_DOM_TREE_JS = resources.files('browser_use.dom').joinpath('buildDomTree.js').read_text()
+EXTRACTOR_VERSION = hashlib.sha256(BUILD_DOM_TREE_JS.encode()).hexdigest()[:16]
+
+# Installs buildDomTree.js once per document as window.__browserUseExtractor, it is gone after a navigation
+EXTRACTOR_INSTALL_JS = f"""() => {{
+	Object.defineProperty(window, '__browserUseExtractor', {{
+		value: {{ version: {json.dumps(EXTRACTOR_VERSION)}, build: {BUILD_DOM_TREE_JS.strip().rstrip(';')} }},
+		configurable: true,
+		writable: true,
+		enumerable: false,
+	}});
+}}"""
+
+# Runs the installed extractor, returns null when it is missing or from another version of buildDomTree.js
+EXTRACTOR_CALL_JS = """({ version, args }) => {
+	const extractor = window.__browserUseExtractor;
+	return extractor && extractor.version === version ? extractor.build(args) : null;
+}"""
+
 
 @dataclass
 class ViewportInfo:
@@ -27,11 +60,34 @@ class ViewportInfo:
 
 
 class DomService:
-	def __init__(self, page: 'Page'):
+	def __init__(
+		self,
+		page: 'Page',
+		snapshot_patcher: DomSnapshotPatcher | None = None,
+		columnar: bool = False,
+		text_mode: Literal['full', 'leaf'] = 'full',
+		xpath_mode: Literal['all', 'highlighted'] = 'all',
+		track_changes: bool = False,
+	):
+		"""
+		snapshot_patcher: keeps the tree of `page` between calls. When given, buildDomTree.js runs in incremental
+		mode and only sends the nodes that changed since the snapshot the patcher holds.
+		columnar: transfer the nodes as integer columns with a string table instead of one dict per node.
+		text_mode: 'full' sends the trimmed textContent of every element, 'leaf' only sends text nodes and a capped
+		textContent of highlighted elements (the text of other elements is derived with `get_text_content()`).
+		xpath_mode: 'all' sends the XPath of every element, 'highlighted' only of highlighted elements, iframes and
+		shadow hosts (the XPath of other elements is resolved with `get_xpath()`).
+		track_changes: keep track of the last change of the page in the page, reported as `DOMPageInfo.last_change`.
+		"""
 		self.page = page
 		self.xpath_cache = {}
+		self.snapshot_patcher = snapshot_patcher
+		self.columnar = columnar
+		self.text_mode = text_mode
+		self.xpath_mode = xpath_mode
+		self.track_changes = track_changes
 
-		self.js_code = resources.files('browser_use.dom').joinpath('buildDomTree.js').read_text()
+		self.js_code = BUILD_DOM_TREE_JS
 
 	# region - Clickable elements
 	@time_execution_async('--get_clickable_elements')
@@ -40,9 +96,21 @@ class DomService:
 		highlight_elements: bool = True,
 		focus_element: int = -1,
 		viewport_expansion: int = 0,
+		max_nodes: int | None = None,
+		time_budget_ms: int | None = None,
+		resume: bool = False,
 	) -> DOMState:
-		element_tree, selector_map = await self._build_dom_tree(highlight_elements, focus_element, viewport_expansion)
-		return DOMState(element_tree=element_tree, selector_map=selector_map)
+		"""
+		max_nodes / time_budget_ms: stop the extraction after visiting this many nodes / after this much time.
+		The viewport is extracted first, the rest of the page outwards from it; `DOMState.truncation` tells
+		whether (and where) the extraction stopped.
+		resume: continue the last truncated extraction of the page instead of starting over. Elements already
+		extracted keep their highlight index, the returned state holds everything extracted so far.
+		"""
+		element_tree, selector_map, truncation, page_info = await self._build_dom_tree(
+			highlight_elements, focus_element, viewport_expansion, max_nodes, time_budget_ms, resume
+		)
+		return DOMState(element_tree=element_tree, selector_map=selector_map, truncation=truncation, page_info=page_info)
 
 	@time_execution_async('--get_cross_origin_iframes')
 	async def get_cross_origin_iframes(self) -> list[str]:
@@ -68,12 +136,12 @@ class DomService:
 		highlight_elements: bool,
 		focus_element: int,
 		viewport_expansion: int,
-	) -> tuple[DOMElementNode, SelectorMap]:
-		if await self.page.evaluate('1+1') != 2:
-			raise ValueError('The page cannot evaluate javascript code properly')
-
+		max_nodes: int | None = None,
+		time_budget_ms: int | None = None,
+		resume: bool = False,
+	) -> tuple[DOMElementNode, SelectorMap, DOMTruncation | None, DOMPageInfo]:
 		if self.page.url == 'about:blank':
-			# short-circuit if the page is a new empty tab for speed, no need to inject buildDomTree.js
+			# short-circuit if the page is a new empty tab for speed, no need to run buildDomTree.js
 			return (
 				DOMElementNode(
 					tag_name='body',
@@ -85,6 +153,10 @@ class DomService:
 					parent=None,
 				),
 				{},
+				None,
+				DOMPageInfo(
+					scroll_x=0, scroll_y=0, viewport_width=0, viewport_height=0, scroll_height=0, device_pixel_ratio=1, title=''
+				),
 			)
 
 		# NOTE: We execute JS code in the browser to extract important DOM information.
@@ -96,10 +168,19 @@ class DomService:
 			'focusHighlightIndex': focus_element,
 			'viewportExpansion': viewport_expansion,
 			'debugMode': debug_mode,
+			'incremental': self.snapshot_patcher is not None,
+			'baseSnapshotId': self.snapshot_patcher.snapshot_id if self.snapshot_patcher else None,
+			'columnar': self.columnar,
+			'textMode': self.text_mode,
+			'xpathMode': self.xpath_mode,
+			'maxNodes': max_nodes or 0,
+			'timeBudgetMs': time_budget_ms or 0,
+			'resume': resume,
+			'trackChanges': self.track_changes,
 		}
 
 		try:
-			eval_page: dict = await self.page.evaluate(self.js_code, args)
+			eval_page = await self._evaluate_extractor(args)
 		except Exception as e:
 			logger.error('Error evaluating JavaScript: %s', e)
 			raise
@@ -112,56 +193,139 @@ class DomService:
 				json.dumps(eval_page['perfMetrics'], indent=2),
 			)
 
-		return await self._construct_dom_tree(eval_page)
+		truncation = None
+		if eval_page.get('truncated'):
+			truncated = eval_page['truncated']
+			truncation = DOMTruncation(
+				reason=truncated['reason'],
+				visited_nodes=truncated['visitedNodes'],
+				pending_subtrees=truncated['pendingSubtrees'],
+				stopped_at=truncated['stoppedAt'],
+			)
+			logger.debug(
+				'DOM extraction stopped (%s budget) after %d nodes, %d subtrees pending',
+				truncation.reason,
+				truncation.visited_nodes,
+				truncation.pending_subtrees,
+			)
+
+		js_page_info = eval_page['pageInfo']
+		page_info = DOMPageInfo(
+			scroll_x=int(js_page_info['scrollX']),
+			scroll_y=int(js_page_info['scrollY']),
+			viewport_width=int(js_page_info['viewportWidth']),
+			viewport_height=int(js_page_info['viewportHeight']),
+			scroll_height=int(js_page_info['scrollHeight']),
+			device_pixel_ratio=js_page_info['devicePixelRatio'],
+			title=js_page_info['title'],
+			last_change=js_page_info['lastChange'],
+			last_overlay_change=js_page_info.get('lastOverlayChange'),
+		)
+
+		element_tree, selector_map = await self._construct_dom_tree(eval_page)
+		return element_tree, selector_map, truncation, page_info
+
+	async def _evaluate_extractor(self, args: dict) -> dict:
+		"""Run buildDomTree.js through the copy installed in the page, (re-)installing it when needed"""
+		call_args = {'version': EXTRACTOR_VERSION, 'args': args}
+		eval_page = await self.page.evaluate(EXTRACTOR_CALL_JS, call_args)
+		if eval_page is None:
+			# first extraction on this document, or a stale copy of an older buildDomTree.js
+			await self.page.evaluate(EXTRACTOR_INSTALL_JS)
+			eval_page = await self.page.evaluate(EXTRACTOR_CALL_JS, call_args)
+
+		if eval_page is None:
+			raise ValueError('Failed to install the DOM extractor in the page')
+		return eval_page
 
 	@time_execution_async('--construct_dom_tree')
 	async def _construct_dom_tree(
 		self,
 		eval_page: dict,
 	) -> tuple[DOMElementNode, SelectorMap]:
-		js_node_map = eval_page['map']
-		js_root_id = eval_page['rootId']
+		snapshot_id = eval_page.get('snapshotId')
+		if eval_page.get('format') == 'columnar':
+			# columnar ids are integers
+			js_root_id = eval_page['rootId']
+			parse_nodes = self._parse_columns
+		else:
+			js_root_id = str(eval_page['rootId'])
+			parse_nodes = self._parse_nodes
+
+		# without a patcher every call builds a throwaway tree
+		patcher = self.snapshot_patcher or DomSnapshotPatcher()
+
+		if 'delta' in eval_page:
+			delta = eval_page['delta']
+			patcher.apply_delta(js_root_id, parse_nodes(delta['changed']), delta['removed'], snapshot_id)
+		else:
+			patcher.load(js_root_id, parse_nodes(eval_page['map']), snapshot_id)
 
-		selector_map = {}
-		node_map = {}
+		try:
+			element_tree = patcher.element_tree
+		except ValueError:
+			patcher.reset()
+			raise
+
+		element_hasher.hash_tree(element_tree)
+		return element_tree, patcher.selector_map
 
+	def _parse_nodes(self, js_node_map: dict) -> Iterator[ParsedNode]:
 		for id, node_data in js_node_map.items():
 			node, children_ids = self._parse_node(node_data)
-			if node is None:
+			yield id, node, children_ids
+
+	def _parse_columns(self, columns: dict) -> Iterator[ParsedNode]:
+		"""Decode the columnar format of buildDomTree.js (see `encodeColumns`) straight into nodes"""
+		strings: list[str] = columns['strings']
+		tags: list[int] = columns['tags']
+		texts: list[int] = columns['texts']
+		xpaths: list[int] = columns['xpaths']
+		xpath_segments: list[int] = columns['xpathSegments']
+		flags: list[int] = columns['flags']
+		highlight_indices: list[int] = columns['highlightIndices']
+		attribute_offsets: list[int] = columns['attributeOffsets']
+		attributes: list[int] = columns['attributes']
+		child_offsets: list[int] = columns['childOffsets']
+		children: list[int] = columns['children']
+
+		for i, id in enumerate(columns['ids']):
+			node_flags = flags[i]
+
+			if tags[i] < 0:
+				text_node = DOMTextNode(
+					text=strings[texts[i]],
+					is_visible=bool(node_flags & NODE_FLAG_VISIBLE),
+					parent=None,
+				)
+				yield id, text_node, []
 				continue
 
-			node_map[id] = node
-
-			if isinstance(node, DOMElementNode) and node.highlight_index is not None:
-				selector_map[node.highlight_index] = node
-
-			# NOTE: We know that we are building the tree bottom up
-			#       and all children are already processed.
-			if isinstance(node, DOMElementNode):
-				for child_id in children_ids:
-					if child_id not in node_map:
-						continue
-
-					child_node = node_map[child_id]
-
-					child_node.parent = node
-					node.children.append(child_node)
-
-		html_to_dict = node_map[str(js_root_id)]
-
-		del node_map
-		del js_node_map
-		del js_root_id
-
-		if html_to_dict is None or not isinstance(html_to_dict, DOMElementNode):
-			raise ValueError('Failed to parse HTML to dictionary')
-
-		return html_to_dict, selector_map
+			highlight_index = highlight_indices[i]
+			element_node = DOMElementNode(
+				tag_name=sys.intern(strings[tags[i]]),
+				text_content=strings[texts[i]] if texts[i] >= 0 else None,
+				xpath=strings[xpaths[i]] if xpaths[i] >= 0 else None,
+				attributes={
+					sys.intern(strings[attributes[j]]): strings[attributes[j + 1]]
+					for j in range(attribute_offsets[i], attribute_offsets[i + 1], 2)
+				},
+				children=[],
+				is_visible=bool(node_flags & NODE_FLAG_VISIBLE),
+				is_interactive=bool(node_flags & NODE_FLAG_INTERACTIVE),
+				is_top_element=bool(node_flags & NODE_FLAG_TOP_ELEMENT),
+				is_in_viewport=bool(node_flags & NODE_FLAG_IN_VIEWPORT),
+				highlight_index=highlight_index if highlight_index >= 0 else None,
+				shadow_root=bool(node_flags & NODE_FLAG_SHADOW_ROOT),
+				parent=None,
+				xpath_segment=strings[xpath_segments[i]] if xpath_segments[i] >= 0 else None,
+			)
+			yield id, element_node, children[child_offsets[i] : child_offsets[i + 1]]
 
 	def _parse_node(
 		self,
 		node_data: dict,
-	) -> tuple[DOMBaseNode | None, list[int]]:
+	) -> tuple[DOMBaseNode | None, list[str]]:
 		if not node_data:
 			return None, []
 
@@ -184,11 +348,16 @@ class DomService:
 				height=node_data['viewport']['height'],
 			)
 
+		# tag names and attribute keys repeat across nodes and across the trees kept by earlier states, share them
+		attributes = node_data.get('attributes')
+		if attributes:
+			attributes = {sys.intern(key): value for key, value in attributes.items()}
+
 		element_node = DOMElementNode(
-			tag_name=node_data['tagName'],
-			text_content=node_data['textContent'],
-			xpath=node_data['xpath'],
-			attributes=node_data.get('attributes', {}),
+			tag_name=sys.intern(node_data['tagName']),
+			text_content=node_data.get('textContent'),
+			xpath=node_data.get('xpath'),
+			attributes=attributes if attributes is not None else {},
 			children=[],
 			is_visible=node_data.get('isVisible', False),
 			is_interactive=node_data.get('isInteractive', False),
@@ -198,6 +367,7 @@ class DomService:
 			shadow_root=node_data.get('shadowRoot', False),
 			parent=None,
 			viewport_info=viewport_info,
+			xpath_segment=node_data.get('xpathSegment'),
 		)
 
 		children_ids = node_data.get('children', [])
@@ -0,0 +1,120 @@
+import copy
+import logging
+from collections.abc import Iterable
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, SelectorMap
+
+logger = logging.getLogger(__name__)
+
+# ids are strings in the default transfer format and integers in the columnar one
+NodeId = str | int
+ParsedNode = tuple[NodeId, DOMBaseNode | None, list[NodeId]]
+
+
+class DomSnapshotPatcher:
+	"""
+	Keeps the DOM tree of one page in sync with the snapshots produced by buildDomTree.js.
+
+	A full snapshot replaces the tree, a delta snapshot only re-creates the changed nodes and their ancestors
+	(copy-on-write): unchanged subtrees are shared with the trees returned for earlier snapshots, so those
+	trees stay valid when walked downwards, but `.parent` of a shared subtree points into the newest tree.
+	"""
+
+	def __init__(self):
+		self.snapshot_id: str | None = None
+		self.root_id: NodeId | None = None
+		self.nodes: dict[NodeId, DOMBaseNode] = {}
+		self.children_ids: dict[NodeId, list[NodeId]] = {}
+		self.parent_ids: dict[NodeId, NodeId] = {}
+
+	def reset(self) -> None:
+		"""Forget the current snapshot, the next extraction will send a full snapshot"""
+		self.snapshot_id = None
+		self.root_id = None
+		self.nodes = {}
+		self.children_ids = {}
+		self.parent_ids = {}
+
+	def load(self, root_id: NodeId, nodes: Iterable[ParsedNode], snapshot_id: str | None = None) -> None:
+		"""Replace the tree with a full snapshot"""
+		self.reset()
+		for id, node, children_ids in nodes:
+			if node is None:
+				continue
+			self.nodes[id] = node
+			self.children_ids[id] = children_ids
+
+		for id in self.children_ids:
+			self._link_children(id)
+
+		self.root_id = root_id
+		self.snapshot_id = snapshot_id
+
+	def apply_delta(
+		self, root_id: NodeId, changed: Iterable[ParsedNode], removed: Iterable[NodeId], snapshot_id: str | None = None
+	) -> None:
+		"""Apply the changed nodes and removed ids of a delta snapshot on top of the current tree"""
+		for id in removed:
+			self.nodes.pop(id, None)
+			self.children_ids.pop(id, None)
+			self.parent_ids.pop(id, None)
+
+		changed_ids = []
+		for id, node, children_ids in changed:
+			if node is None:
+				self.nodes.pop(id, None)
+				self.children_ids.pop(id, None)
+				continue
+			self.nodes[id] = node
+			self.children_ids[id] = children_ids
+			for child_id in children_ids:
+				self.parent_ids[child_id] = id
+			changed_ids.append(id)
+
+		# every ancestor of a changed node gets a fresh copy, so earlier trees keep their children lists
+		stale_ids = set(changed_ids)
+		for id in changed_ids:
+			parent_id = self.parent_ids.get(id)
+			while parent_id is not None and parent_id not in stale_ids and parent_id in self.nodes:
+				stale_ids.add(parent_id)
+				node = copy.copy(self.nodes[parent_id])
+				if isinstance(node, DOMElementNode):
+					node.children = []
+				self.nodes[parent_id] = node
+				parent_id = self.parent_ids.get(parent_id)
+
+		for id in stale_ids:
+			self._link_children(id)
+
+		self.root_id = root_id
+		self.snapshot_id = snapshot_id
+
+	@property
+	def element_tree(self) -> DOMElementNode:
+		root = self.nodes.get(self.root_id) if self.root_id is not None else None
+		if root is None or not isinstance(root, DOMElementNode):
+			raise ValueError('Failed to parse HTML to dictionary')
+		root.parent = None
+		return root
+
+	@property
+	def selector_map(self) -> SelectorMap:
+		highlighted = [
+			node for node in self.nodes.values() if isinstance(node, DOMElementNode) and node.highlight_index is not None
+		]
+		return {node.highlight_index: node for node in sorted(highlighted, key=lambda node: node.highlight_index)}  # type: ignore
+
+	def _link_children(self, id: NodeId) -> None:
+		node = self.nodes.get(id)
+		if not isinstance(node, DOMElementNode):
+			return
+
+		node.children = []
+		for child_id in self.children_ids.get(id, []):
+			child_node = self.nodes.get(child_id)
+			if child_node is None:
+				continue
+
+			self.parent_ids[child_id] = id
+			child_node.parent = node
+			node.children.append(child_node)
@@ -0,0 +1,100 @@
+import asyncio
+import gc
+import json
+import random
+import tracemalloc
+from unittest.mock import Mock
+
+from browser_use.dom.service import DomService
+
+NODES = 30_000
+TAGS = ['div', 'span', 'a', 'button', 'li', 'p', 'input', 'td']
+
+
+def build_eval_page(nodes: int = NODES, seed: int = 0) -> str:
+	"""A buildDomTree.js result shaped like a large page: sections of elements with text, some of them interactive"""
+	rng = random.Random(seed)
+	js_node_map = {}
+	next_id = 0
+
+	def add(node: dict) -> str:
+		nonlocal next_id
+		id = str(next_id)
+		next_id += 1
+		js_node_map[id] = node
+		return id
+
+	sections = []
+	for section in range((nodes - 1) // 7):
+		elements = []
+		for index in range(3):
+			tag = rng.choice(TAGS)
+			text_id = add(
+				{'type': 'TEXT_NODE', 'text': f'Item {section}.{index} {"lorem " * rng.randint(1, 8)}', 'isVisible': True}
+			)
+			node = {
+				'tagName': tag,
+				'textContent': f'Item {section}.{index}',
+				'xpath': f'html/body/div[{section + 1}]/{tag}[{index + 1}]',
+				'attributes': {},
+				'children': [text_id],
+				'isVisible': True,
+			}
+			if tag in ('a', 'button', 'input'):
+				node['attributes'] = {
+					'class': f'btn btn-{index}',
+					'href': f'/item/{section}/{index}',
+					'aria-label': f'Item {index}',
+				}
+				node['isInteractive'] = True
+				node['isTopElement'] = True
+				node['isInViewport'] = True
+				node['highlightIndex'] = len(js_node_map)
+			elements.append(add(node))
+		sections.append(
+			add(
+				{
+					'tagName': 'div',
+					'textContent': f'Section {section}',
+					'xpath': f'html/body/div[{section + 1}]',
+					'attributes': {},
+					'children': elements,
+					'isVisible': True,
+				}
+			)
+		)
+
+	root_id = add(
+		{'tagName': 'body', 'textContent': '', 'xpath': '/body', 'attributes': {}, 'children': sections, 'isVisible': True}
+	)
+	return json.dumps({'rootId': root_id, 'map': js_node_map})
+
+
+async def measure_tree_memory(payload: str) -> tuple[int, int]:
+	"""Memory retained by the parsed tree once the buildDomTree.js result itself is gone"""
+	gc.collect()
+	tracemalloc.start()
+	eval_page = json.loads(payload)
+	element_tree, selector_map = await DomService(Mock())._construct_dom_tree(eval_page)
+	del eval_page
+	gc.collect()
+	retained, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	node_count = 0
+	stack = [element_tree]
+	while stack:
+		node = stack.pop()
+		node_count += 1
+		stack.extend(getattr(node, 'children', []))
+	return retained, node_count
+
+
+async def test_memory_benchmark():
+	payload = build_eval_page()
+	retained, node_count = await measure_tree_memory(payload)
+	print(f'{node_count} nodes: {retained / 1024 / 1024:.1f} MB retained, {retained / node_count:.0f} bytes per node')
+
+
+if __name__ == '__main__':
+	asyncio.run(test_memory_benchmark())
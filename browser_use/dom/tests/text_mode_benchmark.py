@@ -0,0 +1,62 @@
+import asyncio
+import json
+import time
+
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.dom.service import DomService
+
+RUNS = 5
+
+
+def build_article_html(sections: int = 40, paragraphs: int = 50, depth: int = 8) -> str:
+	"""A long, deeply nested article: every ancestor's textContent contains the whole page text"""
+	paragraph = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 10
+	body = []
+	for section in range(sections):
+		body.append(f'<section><h2>Section {section}</h2>')
+		for index in range(paragraphs):
+			body.append(f'<p>{paragraph}<a href="#s{section}p{index}">link {section}.{index}</a></p>')
+		body.append('</section>')
+	return f'<html><body>{"<div>" * depth}<article>{"".join(body)}</article>{"</div>" * depth}</body></html>'
+
+
+async def benchmark_text_mode(page, text_mode: str) -> dict:
+	dom_service = DomService(page, text_mode=text_mode)  # type: ignore
+	args = {
+		'doHighlightElements': False,
+		'focusHighlightIndex': -1,
+		'viewportExpansion': -1,
+		'debugMode': False,
+		'textMode': text_mode,
+	}
+	payload_size = len(json.dumps(await dom_service._evaluate_extractor(args)))
+
+	durations = []
+	for _ in range(RUNS):
+		start = time.time()
+		await dom_service.get_clickable_elements(highlight_elements=False, viewport_expansion=-1)
+		durations.append(time.time() - start)
+
+	return {'payload_kb': payload_size // 1024, 'avg_s': sum(durations) / len(durations), 'min_s': min(durations)}
+
+
+async def test_text_mode_benchmark():
+	browser = Browser(config=BrowserConfig(headless=True))
+
+	async with await browser.new_context() as context:
+		page = await context.get_current_page()
+		await page.goto('data:text/html,')
+		await page.set_content(build_article_html())
+
+		for text_mode in ('full', 'leaf'):
+			result = await benchmark_text_mode(page, text_mode)
+			print(
+				f'{text_mode:>4}: payload {result["payload_kb"]} KB, '
+				f'get_clickable_elements avg {result["avg_s"]:.3f}s / min {result["min_s"]:.3f}s over {RUNS} runs'
+			)
+
+	await browser.close()
+
+
+if __name__ == '__main__':
+	asyncio.run(test_text_mode_benchmark())
@@ -1,16 +1,18 @@
-from dataclasses import dataclass
-from functools import cached_property
-from typing import TYPE_CHECKING, Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal, Optional
 
 from browser_use.dom.history_tree_processor.view import CoordinateSet, HashedDomElement, ViewportInfo
 from browser_use.utils import time_execution_sync
 
 # Avoid circular import issues
 if TYPE_CHECKING:
+	from browser_use.dom.element_matcher.service import ElementMatcher
+
 	from .views import DOMElementNode
 
 
-@dataclass(frozen=False)
+# Nodes are slotted: a large page has tens of thousands of them, and every BrowserState keeps a tree alive
+@dataclass(frozen=False, slots=True)
 class DOMBaseNode:
 	is_visible: bool
 	# Use None as default and set parent later to avoid circular reference issues
@@ -20,7 +22,7 @@ class DOMBaseNode:
 		raise NotImplementedError('DOMBaseNode is an abstract class')
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class DOMTextNode(DOMBaseNode):
 	text: str
 	type: str = 'TEXT_NODE'
@@ -52,7 +54,7 @@ class DOMTextNode(DOMBaseNode):
 		}
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class DOMElementNode(DOMBaseNode):
 	"""
 	xpath: the xpath of the element from the last root node (shadow root or iframe OR document if no shadow root or iframe).
@@ -60,8 +62,8 @@ class DOMElementNode(DOMBaseNode):
 	"""
 
 	tag_name: str
-	text_content: str
-	xpath: str
+	text_content: str | None  # None when buildDomTree.js ran in 'leaf' text mode, see get_text_content()
+	xpath: str | None  # None when buildDomTree.js ran in 'highlighted' XPath mode, see get_xpath()
 	attributes: dict[str, str]
 	children: list[DOMBaseNode]
 	is_interactive: bool = False
@@ -72,6 +74,7 @@ class DOMElementNode(DOMBaseNode):
 	viewport_coordinates: CoordinateSet | None = None
 	page_coordinates: CoordinateSet | None = None
 	viewport_info: ViewportInfo | None = None
+	xpath_segment: str | None = None  # own XPath step ("li[3]"), sent instead of the full XPath
 
 	"""
 	### State injected by the browser context.
@@ -80,6 +83,8 @@ class DOMElementNode(DOMBaseNode):
 	"""
 	is_new: bool | None = None
 
+	_hash: HashedDomElement | None = field(default=None, init=False, repr=False, compare=False)
+
 	def __json__(self) -> dict:
 		return {
 			'tag_name': self.tag_name,
@@ -123,32 +128,69 @@ class DOMElementNode(DOMBaseNode):
 
 		return tag_str
 
-	@cached_property
+	@property
 	def hash(self) -> HashedDomElement:
-		from browser_use.dom.history_tree_processor.service import (
-			HistoryTreeProcessor,
-		)
+		if self._hash is None:
+			from browser_use.dom.history_tree_processor.service import element_hasher
+
+			# trees built by DomService are hashed up front, this is the fallback for the others
+			self._hash = element_hasher.hash_element(self)
+		return self._hash
+
+	def get_xpath(self) -> str:
+		"""The XPath of the element, resolved from the XPath segments of its ancestors when it was not sent by buildDomTree.js"""
+		if self.xpath is not None:
+			return self.xpath
+
+		parent = self.parent
+		if parent is None:
+			prefix = ''
+		elif parent.parent is None:
+			# the root body node is sent as '/body', its children start at the document element
+			prefix = 'html/body'
+		elif parent.tag_name == 'iframe':
+			# the XPath of an iframe's content starts at its document
+			prefix = ''
+		else:
+			prefix = parent.get_xpath()
+
+		segment = self.xpath_segment or self.tag_name
+		self.xpath = f'{prefix}/{segment}' if prefix else segment
+		return self.xpath
+
+	def get_text_content(self) -> str:
+		"""The text of the element, derived from its text nodes when it was not sent by buildDomTree.js"""
+		if self.text_content is not None:
+			return self.text_content
 
-		return HistoryTreeProcessor._hash_dom_element(self)
+		text_parts = []
+		stack: list[DOMBaseNode] = [self]
+		while stack:
+			node = stack.pop()
+			if isinstance(node, DOMTextNode):
+				text_parts.append(node.text)
+			elif isinstance(node, DOMElementNode):
+				stack.extend(reversed(node.children))
+		return ' '.join(text_parts)
 
 	def get_all_text_till_next_clickable_element(self, max_depth: int = -1) -> str:
 		text_parts = []
 
-		def collect_text(node: DOMBaseNode, current_depth: int) -> None:
+		stack: list[tuple[DOMBaseNode, int]] = [(self, 0)]
+		while stack:
+			node, current_depth = stack.pop()
 			if max_depth != -1 and current_depth > max_depth:
-				return
+				continue
 
 			# Skip this branch if we hit a highlighted element (except for the current node)
-			if isinstance(node, DOMElementNode) and node != self and node.highlight_index is not None:
-				return
+			if isinstance(node, DOMElementNode) and node is not self and node.highlight_index is not None:
+				continue
 
 			if isinstance(node, DOMTextNode):
 				text_parts.append(node.text)
 			elif isinstance(node, DOMElementNode):
-				for child in node.children:
-					collect_text(child, current_depth + 1)
+				stack.extend((child, current_depth + 1) for child in reversed(node.children))
 
-		collect_text(self, 0)
 		return '\n'.join(text_parts).strip()
 
 	@time_execution_sync('--clickable_elements_to_string')
@@ -156,83 +198,93 @@ class DOMElementNode(DOMBaseNode):
 		"""Convert the processed DOM content to HTML."""
 		formatted_text = []
 
-		def process_node(node: DOMBaseNode, depth: int) -> None:
-			next_depth = int(depth)
+		def format_element(node: 'DOMElementNode', depth_str: str, text: str) -> str:
+			attributes_html_str = ''
+			if include_attributes:
+				attributes_to_include = {key: str(value) for key, value in node.attributes.items() if key in include_attributes}
+
+				# Easy LLM optimizations
+				# if tag == role attribute, don't include it
+				if node.tag_name == attributes_to_include.get('role'):
+					del attributes_to_include['role']
+
+				# if aria-label == text of the node, don't include it
+				if (
+					attributes_to_include.get('aria-label')
+					and attributes_to_include.get('aria-label', '').strip() == text.strip()
+				):
+					del attributes_to_include['aria-label']
+
+				# if placeholder == text of the node, don't include it
+				if (
+					attributes_to_include.get('placeholder')
+					and attributes_to_include.get('placeholder', '').strip() == text.strip()
+				):
+					del attributes_to_include['placeholder']
+
+				if attributes_to_include:
+					# Format as key1='value1' key2='value2'
+					attributes_html_str = ' '.join(f"{key}='{value}'" for key, value in attributes_to_include.items())
+
+			# Build the line
+			if node.is_new:
+				highlight_indicator = f'*[{node.highlight_index}]*'
+			else:
+				highlight_indicator = f'[{node.highlight_index}]'
+
+			line = f'{depth_str}{highlight_indicator}<{node.tag_name}'
+
+			if attributes_html_str:
+				line += f' {attributes_html_str}'
+
+			if text:
+				# Add space before >text only if there were NO attributes added before
+				if not attributes_html_str:
+					line += ' '
+				line += f'>{text}'
+			# Add space before /> only if neither attributes NOR text were added
+			elif not attributes_html_str:
+				line += ' '
+
+			line += ' />'  # 1 token
+			return line
+
+		# Text below a highlighted element belongs to that element's line, not to the listing
+		has_highlighted_ancestor = False
+		ancestor = self.parent
+		while ancestor is not None and not has_highlighted_ancestor:
+			has_highlighted_ancestor = ancestor.highlight_index is not None
+			ancestor = ancestor.parent
+
+		# Single pass: every node carries the text parts of its nearest highlighted ancestor (None if there is none).
+		# A highlighted element's line needs all the text below it, so its slot is reserved and filled at the end.
+		highlighted_lines: list[tuple[int, DOMElementNode, str, list[str]]] = []
+		stack: list[tuple[DOMBaseNode, int, list[str] | None]] = [(self, 0, None)]
+		while stack:
+			node, depth, text_parts = stack.pop()
 			depth_str = depth * '\t'
 
 			if isinstance(node, DOMElementNode):
 				# Add element with highlight_index
 				if node.highlight_index is not None:
-					next_depth += 1
-
-					text = node.get_all_text_till_next_clickable_element()
-					attributes_html_str = ''
-					if include_attributes:
-						attributes_to_include = {
-							key: str(value) for key, value in node.attributes.items() if key in include_attributes
-						}
-
-						# Easy LLM optimizations
-						# if tag == role attribute, don't include it
-						if node.tag_name == attributes_to_include.get('role'):
-							del attributes_to_include['role']
-
-						# if aria-label == text of the node, don't include it
-						if (
-							attributes_to_include.get('aria-label')
-							and attributes_to_include.get('aria-label', '').strip() == text.strip()
-						):
-							del attributes_to_include['aria-label']
-
-						# if placeholder == text of the node, don't include it
-						if (
-							attributes_to_include.get('placeholder')
-							and attributes_to_include.get('placeholder', '').strip() == text.strip()
-						):
-							del attributes_to_include['placeholder']
-
-						if attributes_to_include:
-							# Format as key1='value1' key2='value2'
-							attributes_html_str = ' '.join(f"{key}='{value}'" for key, value in attributes_to_include.items())
-
-					# Build the line
-					if node.is_new:
-						highlight_indicator = f'*[{node.highlight_index}]*'
-					else:
-						highlight_indicator = f'[{node.highlight_index}]'
-
-					line = f'{depth_str}{highlight_indicator}<{node.tag_name}'
-
-					if attributes_html_str:
-						line += f' {attributes_html_str}'
-
-					if text:
-						# Add space before >text only if there were NO attributes added before
-						if not attributes_html_str:
-							line += ' '
-						line += f'>{text}'
-					# Add space before /> only if neither attributes NOR text were added
-					elif not attributes_html_str:
-						line += ' '
-
-					line += ' />'  # 1 token
-					formatted_text.append(line)
+					text_parts = []
+					highlighted_lines.append((len(formatted_text), node, depth_str, text_parts))
+					formatted_text.append('')
+					depth += 1
 
 				# Process children regardless
-				for child in node.children:
-					process_node(child, next_depth)
+				stack.extend((child, depth, text_parts) for child in reversed(node.children))
 
 			elif isinstance(node, DOMTextNode):
+				if text_parts is not None:
+					text_parts.append(node.text)
 				# Add text only if it doesn't have a highlighted parent
-				if (
-					not node.has_parent_with_highlight_index()
-					and node.parent
-					and node.parent.is_visible
-					and node.parent.is_top_element
-				):  # and node.is_parent_top_element()
+				elif not has_highlighted_ancestor and node.parent and node.parent.is_visible and node.parent.is_top_element:
 					formatted_text.append(f'{depth_str}{node.text}')
 
-		process_node(self, 0)
+		for slot, node, depth_str, text_parts in highlighted_lines:
+			formatted_text[slot] = format_element(node, depth_str, '\n'.join(text_parts).strip())
+
 		return '\n'.join(formatted_text)
 
 	def get_file_upload_element(self, check_siblings: bool = True) -> Optional['DOMElementNode']:
@@ -261,7 +313,90 @@ class DOMElementNode(DOMBaseNode):
 SelectorMap = dict[int, DOMElementNode]
 
 
+@dataclass
+class DOMTruncation:
+	"""Where a budgeted extraction stopped, the remaining subtrees can be extracted with `resume=True`"""
+
+	reason: Literal['nodes', 'time']
+	visited_nodes: int
+	pending_subtrees: int
+	# XPath of the pending subtree closest to the viewport, the first one a resumed extraction visits
+	stopped_at: str | None
+
+
+@dataclass
+class DOMPageInfo:
+	"""Scroll position, viewport and title of the page, read by the extractor in the same call as the tree"""
+
+	scroll_x: int
+	scroll_y: int
+	viewport_width: int
+	viewport_height: int
+	scroll_height: int
+	device_pixel_ratio: float
+	title: str
+	# seconds since the epoch of the last DOM mutation, scroll or resize, when the extractor tracks changes
+	last_change: float | None = None
+	# seconds since the epoch the highlight overlay was last drawn or removed, when the extractor tracks changes
+	last_overlay_change: float | None = None
+
+	@property
+	def pixels_above(self) -> int:
+		return self.scroll_y
+
+	@property
+	def pixels_below(self) -> int:
+		return self.scroll_height - (self.scroll_y + self.viewport_height)
+
+
+class DOMElementIndex:
+	"""
+	The highlighted elements of a tree by their `HashedDomElement`, so elements recorded in the history are found
+	without walking the tree. The first element in document order wins when several share a hash.
+	"""
+
+	def __init__(self, element_tree: DOMElementNode):
+		self.by_hash: dict[HashedDomElement, DOMElementNode] = {}
+		# partial key: the elements that only differ by XPath
+		self.by_branch_path_and_attributes: dict[tuple[str, str], list[DOMElementNode]] = {}
+
+		stack: list[DOMElementNode] = [element_tree]
+		while stack:
+			node = stack.pop()
+			if node.highlight_index is not None:
+				hashed = node.hash
+				self.by_hash.setdefault(hashed, node)
+				self.by_branch_path_and_attributes.setdefault((hashed.branch_path_hash, hashed.attributes_hash), []).append(node)
+			stack.extend(child for child in reversed(node.children) if isinstance(child, DOMElementNode))
+
+	def get(self, hashed: HashedDomElement) -> DOMElementNode | None:
+		return self.by_hash.get(hashed)
+
+	def get_candidates(self, branch_path_hash: str, attributes_hash: str) -> list[DOMElementNode]:
+		return self.by_branch_path_and_attributes.get((branch_path_hash, attributes_hash), [])
+
+
 @dataclass
 class DOMState:
 	element_tree: DOMElementNode
 	selector_map: SelectorMap
+	truncation: DOMTruncation | None = field(default=None, kw_only=True)
+	page_info: DOMPageInfo | None = field(default=None, kw_only=True)
+	_element_index: DOMElementIndex | None = field(default=None, init=False, repr=False, compare=False)
+	_element_matcher: Optional['ElementMatcher'] = field(default=None, init=False, repr=False, compare=False)
+
+	@property
+	def element_index(self) -> DOMElementIndex:
+		"""Built on first use, a state's tree does not change afterwards"""
+		if self._element_index is None:
+			self._element_index = DOMElementIndex(self.element_tree)
+		return self._element_index
+
+	@property
+	def element_matcher(self) -> 'ElementMatcher':
+		"""Similarity index of the highlighted elements, for recorded elements the exact index does not find"""
+		if self._element_matcher is None:
+			from browser_use.dom.element_matcher.service import ElementMatcher
+
+			self._element_matcher = ElementMatcher(self.selector_map.values())
+		return self._element_matcher
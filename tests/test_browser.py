@@ -494,10 +494,14 @@ async def test_browser_window_size(monkeypatch):
 		def is_closed(self):
 			return False
 
+		def on(self, event, handler):
+			pass
+
 	class DummyContext:
 		def __init__(self):
 			self.pages = [DummyPage()]
 			self.tracing = self
+			self.browser = None
 
 		async def new_page(self):
 			return DummyPage()
@@ -514,6 +518,9 @@ async def test_browser_window_size(monkeypatch):
 		def on(self, event, handler):
 			pass
 
+		def remove_listener(self, event, handler):
+			pass
+
 		async def close(self):
 			pass
 
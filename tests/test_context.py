@@ -1,11 +1,14 @@
+import asyncio
 import base64
+import logging
 from unittest.mock import Mock
 
 import pytest
 
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
-from browser_use.browser.views import BrowserState
-from browser_use.dom.views import DOMElementNode
+from browser_use.browser.tab_registry.service import TabRegistry
+from browser_use.browser.views import BrowserError, BrowserState
+from browser_use.dom.views import DOMElementNode, DOMPageInfo
 
 
 def test_is_url_allowed():
@@ -360,3 +363,457 @@ async def test_remove_highlights_failure():
 		await context.remove_highlights()
 	except Exception as e:
 		pytest.fail(f'remove_highlights raised an exception: {e}')
+
+
+async def state_capture_context(page) -> BrowserContext:
+	"""A BrowserContext whose session holds `page` as its only tab"""
+	dummy_session = type('DummySession', (), {})()
+	dummy_session.context = type('DummyContext', (), {'pages': [page], 'browser': None, 'on': Mock()})()
+	dummy_session.dom_snapshot_patchers = {}
+	dummy_session.request_blocker = None
+	dummy_session.request_watchers = {}
+	dummy_session.tabs = TabRegistry(dummy_session.context)
+	await dummy_session.tabs.start()
+	dummy_browser = Mock()
+	dummy_browser.config = Mock()
+	context = BrowserContext(browser=dummy_browser, config=BrowserContextConfig())
+	context.session = dummy_session
+
+	async def get_agent_current_page():
+		return page
+
+	context.get_agent_current_page = get_agent_current_page
+	return context
+
+
+@pytest.mark.asyncio
+async def test_state_is_captured_in_one_evaluate_call():
+	"""
+	Test that the scroll position and title of the state come with the extractor result,
+	so capturing a state evaluates JavaScript once when the extractor is installed.
+	"""
+
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		def __init__(self):
+			self.evaluated = []
+
+		async def evaluate(self, script, arg=None):
+			self.evaluated.append(script)
+			return {
+				'rootId': '0',
+				'map': {'0': {'tagName': 'body', 'xpath': '', 'children': []}},
+				'pageInfo': {
+					'scrollX': 0,
+					'scrollY': 100,
+					'viewportWidth': 800,
+					'viewportHeight': 500,
+					'scrollHeight': 1200,
+					'devicePixelRatio': 1,
+					'title': 'Example',
+					'lastChange': None,
+				},
+			}
+
+		async def title(self):
+			return 'Example'
+
+		async def wait_for_load_state(self):
+			pass
+
+		async def screenshot(self, full_page, animations):
+			return b'test'
+
+	page = DummyPage()
+	context = await state_capture_context(page)
+	state = await context._get_updated_state()
+
+	assert len(page.evaluated) == 1
+	assert (state.title, state.pixels_above, state.pixels_below) == ('Example', 100, 600)
+	assert state.screenshot == base64.b64encode(b'test').decode('utf-8')
+	assert [tab.title for tab in state.tabs] == ['Example']
+	assert set(state.timings) == {'dom', 'screenshot_and_tabs', 'total'}
+
+	page.screenshot = Mock(side_effect=AssertionError('no screenshot was requested'))
+	state = await context._get_updated_state(include_screenshot=False)
+	assert state.screenshot is None and state.title == 'Example'
+
+
+@pytest.mark.asyncio
+async def test_state_capture_of_closed_page_raises_browser_error():
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		async def evaluate(self, script, arg=None):
+			raise Exception('Target page, context or browser has been closed')
+
+	with pytest.raises(BrowserError, match='Browser closed'):
+		await (await state_capture_context(DummyPage()))._get_updated_state()
+
+
+@pytest.mark.asyncio
+async def test_screenshot_is_captured_with_cdp_in_the_configured_format():
+	"""
+	Test that the viewport is captured with CDP Page.captureScreenshot, clipped to the viewport and scaled down
+	to screenshot_max_dimension, without waiting for the page load again when the page info is given, and that
+	the prompt uses the mime type of the image.
+	"""
+	jpeg_b64 = base64.b64encode(b'\xff\xd8\xff\xe0jpeg').decode('utf-8')
+	captured = []
+
+	class DummyCDPSession:
+		async def send(self, method, params):
+			captured.append((method, params))
+			return {'data': jpeg_b64}
+
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		async def wait_for_load_state(self):
+			raise AssertionError('the state capture waited for the page load already')
+
+	page = DummyPage()
+	context = await state_capture_context(page)
+
+	async def new_cdp_session(cdp_page):
+		assert cdp_page is page
+		return DummyCDPSession()
+
+	context.session.context.new_cdp_session = new_cdp_session  # type: ignore
+	context.session.cdp_sessions = {}  # type: ignore
+	context.config = BrowserContextConfig(screenshot_format='jpeg', screenshot_quality=70, screenshot_max_dimension=1000)
+	page_info = DOMPageInfo(
+		scroll_x=0, scroll_y=300, viewport_width=1000, viewport_height=800, scroll_height=3000, device_pixel_ratio=2, title=''
+	)
+
+	assert await context.take_screenshot(page_info=page_info) == jpeg_b64
+	assert await context.take_screenshot(page_info=page_info) == jpeg_b64
+	method, params = captured[0]
+	assert method == 'Page.captureScreenshot'
+	assert (params['format'], params['quality'], params['optimizeForSpeed']) == ('jpeg', 70, True)
+	assert params['clip'] == {'x': 0, 'y': 300, 'width': 1000, 'height': 800, 'scale': 0.5}
+	assert len(captured) == 2 and len(context.session.cdp_sessions) == 1  # type: ignore
+
+	state = BrowserState(element_tree=Mock(), selector_map={}, url='', title='', tabs=[], screenshot=jpeg_b64)
+	assert state.screenshot_mime_type == 'image/jpeg'
+	assert BrowserState(element_tree=Mock(), selector_map={}, url='', title='', tabs=[]).screenshot_mime_type == 'image/png'
+
+
+@pytest.mark.asyncio
+async def test_playwright_screenshot_fallback_logs_the_format_and_renders_css_pixels(caplog):
+	"""
+	Test that without CDP the screenshot is taken with Playwright as JPEG when WebP was configured, with a warning,
+	and at one pixel per CSS pixel when screenshot_max_dimension is set.
+	"""
+	screenshots = []
+
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		async def wait_for_load_state(self):
+			pass
+
+		async def evaluate(self, script):
+			return [0, 0, 1280, 800, 2]
+
+		async def screenshot(self, **options):
+			screenshots.append(options)
+			return b'\xff\xd8\xff\xe0jpeg'
+
+	context = await state_capture_context(DummyPage())
+
+	async def new_cdp_session(cdp_page):
+		raise Exception('CDP sessions are only supported in Chromium')
+
+	context.session.context.new_cdp_session = new_cdp_session  # type: ignore
+	context.session.cdp_sessions = {}  # type: ignore
+	context.config = BrowserContextConfig(screenshot_format='webp', screenshot_quality=60, screenshot_max_dimension=1000)
+
+	with caplog.at_level(logging.WARNING, logger='browser_use.browser.context'):
+		screenshot = await context.take_screenshot()
+	assert screenshot == base64.b64encode(b'\xff\xd8\xff\xe0jpeg').decode('utf-8')
+	assert screenshots == [{'full_page': False, 'animations': 'disabled', 'type': 'jpeg', 'quality': 60, 'scale': 'css'}]
+	assert 'cannot encode WebP' in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_screenshot_is_taken_from_the_screencast_when_its_frame_is_fresh():
+	"""
+	Test that with screencast enabled the newest frame is used as screenshot when it was painted after the last
+	change of the page, and that a screenshot is captured when it is stale.
+	"""
+
+	class DummyCDPSession:
+		def __init__(self):
+			self.handlers = {}
+			self.captures = 0
+
+		def on(self, event, handler):
+			self.handlers[event] = handler
+
+		async def send(self, method, params=None):
+			if method == 'Page.captureScreenshot':
+				self.captures += 1
+				return {'data': 'captured'}
+			return {}
+
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		async def wait_for_load_state(self):
+			pass
+
+	page = DummyPage()
+	cdp_session = DummyCDPSession()
+	context = await state_capture_context(page)
+
+	async def new_cdp_session(cdp_page):
+		return cdp_session
+
+	context.session.context.new_cdp_session = new_cdp_session  # type: ignore
+	context.session.cdp_sessions = {}  # type: ignore
+	context.session.screencasts = {}  # type: ignore
+	context.config = BrowserContextConfig(screencast=True)
+
+	def page_info(last_change):
+		return DOMPageInfo(
+			scroll_x=0,
+			scroll_y=0,
+			viewport_width=800,
+			viewport_height=600,
+			scroll_height=600,
+			device_pixel_ratio=1,
+			title='',
+			last_change=last_change,
+		)
+
+	# the first screenshot starts the screencast, no frame was painted yet
+	assert await context.take_screenshot(page_info=page_info(100.0)) == 'captured'
+	cdp_session.handlers['Page.screencastFrame']({'data': 'frame', 'sessionId': 1, 'metadata': {'timestamp': 101.0}})
+
+	assert await context.take_screenshot(page_info=page_info(100.5)) == 'frame'
+	assert await context.take_screenshot(page_info=page_info(101.5)) == 'captured'
+	assert cdp_session.captures == 2
+	assert [frame.data for frame in await context.get_screencast_frames()] == ['frame']
+
+
+@pytest.mark.asyncio
+async def test_screenshot_waits_for_the_screencast_frame_with_the_highlight_overlay():
+	"""
+	Test that with highlights drawn by the extraction the screenshot waits briefly for the frame that shows them
+	instead of capturing one, and only captures when no such frame arrives.
+	"""
+
+	class DummyCDPSession:
+		def __init__(self):
+			self.handlers = {}
+			self.captures = 0
+
+		def on(self, event, handler):
+			self.handlers[event] = handler
+
+		async def send(self, method, params=None):
+			if method == 'Page.captureScreenshot':
+				self.captures += 1
+				return {'data': 'captured'}
+			return {}
+
+	class DummyPage:
+		url = 'https://example.com/'
+		on = Mock()
+
+		async def wait_for_load_state(self):
+			pass
+
+	page = DummyPage()
+	cdp_session = DummyCDPSession()
+	context = await state_capture_context(page)
+
+	async def new_cdp_session(cdp_page):
+		return cdp_session
+
+	context.session.context.new_cdp_session = new_cdp_session  # type: ignore
+	context.session.cdp_sessions = {}  # type: ignore
+	context.session.screencasts = {}  # type: ignore
+	context.config = BrowserContextConfig(screencast=True)
+	page_info = DOMPageInfo(
+		scroll_x=0,
+		scroll_y=0,
+		viewport_width=800,
+		viewport_height=600,
+		scroll_height=600,
+		device_pixel_ratio=1,
+		title='',
+		last_change=100.0,
+		last_overlay_change=102.0,
+	)
+
+	await context.take_screenshot(page_info=page_info)
+	on_frame = cdp_session.handlers['Page.screencastFrame']
+	on_frame({'data': 'before highlights', 'sessionId': 1, 'metadata': {'timestamp': 101.0}})
+	asyncio.get_running_loop().call_later(
+		0.01, on_frame, {'data': 'highlighted', 'sessionId': 2, 'metadata': {'timestamp': 102.1}}
+	)
+
+	assert await context.take_screenshot(page_info=page_info) == 'highlighted'
+	assert cdp_session.captures == 1
+
+	page_info.last_overlay_change = 103.0
+	assert await context.take_screenshot(page_info=page_info) == 'captured'
+	assert cdp_session.captures == 2
+
+
+@pytest.mark.asyncio
+async def test_adaptive_page_load_wait_learns_from_loads_with_requests_only():
+	"""
+	Test that waiting for a page that made no requests is not learned from, and that the learned pauses between
+	requests shorten the quiet window.
+	"""
+
+	class DummyPage:
+		url = 'https://example.com/'
+
+		def __init__(self):
+			self.handlers = {}
+
+		def on(self, event, handler):
+			self.handlers[event] = handler
+
+		def remove_listener(self, event, handler):
+			self.handlers.pop(event)
+
+	page = DummyPage()
+	context = await state_capture_context(page)
+	context.config = BrowserContextConfig(
+		adaptive_page_load_wait=True, minimum_wait_page_load_time=0, wait_for_network_idle_page_load_time=0.5
+	)
+	loop = asyncio.get_running_loop()
+
+	started = loop.time()
+	await context._wait_for_stable_network()
+	assert loop.time() - started >= 0.5
+	assert context.settle_profiles.minimum_wait(page.url) is None
+
+	for _ in range(3):
+		context.settle_profiles.record(page.url, 0.0, 0.0)
+	started = loop.time()
+	await context._wait_for_stable_network()
+	assert loop.time() - started < 0.3
+
+
+@pytest.mark.asyncio
+async def test_page_is_quiet_when_dom_and_network_were_quiet_at_the_same_time():
+	"""
+	Test that waiting for a quiet page repeats the DOM check when a request of the page finished meanwhile,
+	follows navigations, and gives up after the timeout while a request is pending.
+	"""
+
+	class DummyRequest:
+		url = 'https://example.com/api/items'
+		resource_type = 'fetch'
+		headers = {}
+
+	class DummyResponse:
+		request = DummyRequest()
+		headers = {'content-type': 'application/json'}
+
+	class DummyPage:
+		url = 'https://example.com/'
+
+		def __init__(self, evaluations):
+			self.handlers = {}
+			self.evaluations = evaluations
+			self.loads = 0
+
+		def on(self, event, handler):
+			self.handlers[event] = handler
+
+		def remove_listener(self, event, handler):
+			del self.handlers[event]
+
+		async def evaluate(self, script, args):
+			return await self.evaluations.pop(0)(self)
+
+		async def wait_for_load_state(self, state, timeout):
+			self.loads += 1
+
+	async def fetch_while_dom_is_quiet(page):
+		page.handlers['request'](DummyResponse.request)
+		page.handlers['response'](DummyResponse())
+		return True
+
+	async def quiet(page):
+		return True
+
+	async def navigate(page):
+		raise Exception('Execution context was destroyed, most likely because of a navigation')
+
+	page = DummyPage([fetch_while_dom_is_quiet, navigate, quiet])
+	context = await state_capture_context(page)
+	assert await context.wait_for_page_quiet(timeout=2, quiet_time=0.01)
+	assert not page.evaluations and page.loads == 1
+	# the requests of the page are followed from then on
+	assert context.session.request_watchers[page].page is page  # type: ignore
+
+	async def request_without_response(page):
+		page.handlers['request'](DummyResponse.request)
+		return True
+
+	page = DummyPage([request_without_response])
+	context = await state_capture_context(page)
+	assert not await context.wait_for_page_quiet(timeout=0.2, quiet_time=0.01)
+
+
+@pytest.mark.asyncio
+async def test_settling_waits_for_the_requests_the_action_started():
+	"""
+	Test that a fetch an action started before the wait began is waited for until its response,
+	and that a request pending since before the action (long polling) is not.
+	"""
+
+	class DummyRequest:
+		resource_type = 'fetch'
+		headers = {}
+
+		def __init__(self, url):
+			self.url = url
+
+	class DummyResponse:
+		headers = {'content-type': 'application/json'}
+
+		def __init__(self, request):
+			self.request = request
+
+	class DummyPage:
+		url = 'https://example.com/'
+
+		def __init__(self):
+			self.handlers = {}
+
+		def on(self, event, handler):
+			self.handlers[event] = handler
+
+		async def evaluate(self, script, args):
+			# the DOM is quiet all along
+			return True
+
+	page = DummyPage()
+	context = await state_capture_context(page)
+	# the session follows the requests of its pages from the start
+	context._watch_requests(page)  # type: ignore
+	page.handlers['request'](DummyRequest('https://example.com/api/updates?poll=1'))
+
+	loop = asyncio.get_running_loop()
+	fetch = DummyRequest('https://example.com/api/cart')
+	async with context.settle_after(timeout=2, quiet_time=0.01):
+		started = loop.time()
+		page.handlers['request'](fetch)
+		loop.call_later(0.15, page.handlers['response'], DummyResponse(fetch))
+	assert loop.time() - started >= 0.15
+	assert loop.time() - started < 1
@@ -0,0 +1,189 @@
+import random
+import sys
+
+import pytest
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, DOMTextNode
+
+INCLUDE_ATTRIBUTES = ['title', 'type', 'name', 'role', 'aria-label', 'placeholder', 'value']
+TAGS = ['div', 'span', 'a', 'button', 'input', 'li', 'label']
+
+
+def legacy_has_parent_with_highlight_index(node: DOMTextNode) -> bool:
+	current = node.parent
+	while current is not None:
+		if current.highlight_index is not None:
+			return True
+		current = current.parent
+	return False
+
+
+def legacy_get_all_text_till_next_clickable_element(element: DOMElementNode) -> str:
+	text_parts = []
+
+	def collect_text(node: DOMBaseNode) -> None:
+		if isinstance(node, DOMElementNode) and node is not element and node.highlight_index is not None:
+			return
+		if isinstance(node, DOMTextNode):
+			text_parts.append(node.text)
+		elif isinstance(node, DOMElementNode):
+			for child in node.children:
+				collect_text(child)
+
+	collect_text(element)
+	return '\n'.join(text_parts).strip()
+
+
+def legacy_clickable_elements_to_string(element: DOMElementNode, include_attributes: list[str] | None = None) -> str:
+	"""The recursive serializer that clickable_elements_to_string replaced, kept as the reference"""
+	formatted_text = []
+
+	def process_node(node: DOMBaseNode, depth: int) -> None:
+		next_depth = int(depth)
+		depth_str = depth * '\t'
+
+		if isinstance(node, DOMElementNode):
+			if node.highlight_index is not None:
+				next_depth += 1
+
+				text = legacy_get_all_text_till_next_clickable_element(node)
+				attributes_html_str = ''
+				if include_attributes:
+					attributes_to_include = {
+						key: str(value) for key, value in node.attributes.items() if key in include_attributes
+					}
+					if node.tag_name == attributes_to_include.get('role'):
+						del attributes_to_include['role']
+					if (
+						attributes_to_include.get('aria-label')
+						and attributes_to_include.get('aria-label', '').strip() == text.strip()
+					):
+						del attributes_to_include['aria-label']
+					if (
+						attributes_to_include.get('placeholder')
+						and attributes_to_include.get('placeholder', '').strip() == text.strip()
+					):
+						del attributes_to_include['placeholder']
+					if attributes_to_include:
+						attributes_html_str = ' '.join(f"{key}='{value}'" for key, value in attributes_to_include.items())
+
+				if node.is_new:
+					highlight_indicator = f'*[{node.highlight_index}]*'
+				else:
+					highlight_indicator = f'[{node.highlight_index}]'
+
+				line = f'{depth_str}{highlight_indicator}<{node.tag_name}'
+				if attributes_html_str:
+					line += f' {attributes_html_str}'
+				if text:
+					if not attributes_html_str:
+						line += ' '
+					line += f'>{text}'
+				elif not attributes_html_str:
+					line += ' '
+				line += ' />'
+				formatted_text.append(line)
+
+			for child in node.children:
+				process_node(child, next_depth)
+
+		elif isinstance(node, DOMTextNode):
+			if (
+				not legacy_has_parent_with_highlight_index(node)
+				and node.parent
+				and node.parent.is_visible
+				and node.parent.is_top_element
+			):
+				formatted_text.append(f'{depth_str}{node.text}')
+
+	process_node(element, 0)
+	return '\n'.join(formatted_text)
+
+
+def random_tree(seed: int, size: int = 400) -> DOMElementNode:
+	rng = random.Random(seed)
+	root = DOMElementNode(
+		tag_name='body', text_content='', xpath='', attributes={}, children=[], is_visible=True, parent=None, is_top_element=True
+	)
+	elements = [root]
+	highlight_index = 0
+	for _ in range(size):
+		parent = rng.choice(elements)
+		if rng.random() < 0.4:
+			text = rng.choice(['Submit', ' Search ', 'Next page', '  ', 'Price: 10$', 'Login'])
+			parent.children.append(DOMTextNode(text=text, is_visible=rng.random() < 0.9, parent=parent))
+			continue
+
+		tag = rng.choice(TAGS)
+		attributes = {}
+		for key in rng.sample(INCLUDE_ATTRIBUTES + ['class', 'href'], rng.randint(0, 4)):
+			attributes[key] = rng.choice([tag, 'Submit', 'Search', 'Next page', 'x'])
+		is_highlighted = rng.random() < 0.35
+		element = DOMElementNode(
+			tag_name=tag,
+			text_content=None,
+			xpath=None,
+			attributes=attributes,
+			children=[],
+			is_visible=rng.random() < 0.9,
+			is_top_element=rng.random() < 0.8,
+			highlight_index=highlight_index if is_highlighted else None,
+			is_new=rng.choice([None, True, False]) if is_highlighted else None,
+			parent=parent,
+		)
+		highlight_index += is_highlighted
+		parent.children.append(element)
+		elements.append(element)
+	return root
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_clickable_elements_to_string_matches_recursive_serializer(seed):
+	"""
+	Test that the single-pass serializer produces exactly the output of the recursive one.
+	"""
+	tree = random_tree(seed)
+
+	assert tree.clickable_elements_to_string() == legacy_clickable_elements_to_string(tree)
+	assert tree.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == legacy_clickable_elements_to_string(tree, INCLUDE_ATTRIBUTES)
+
+	# starting below the root, text under a highlighted ancestor of the start element stays unlisted
+	for element in tree.children:
+		if isinstance(element, DOMElementNode):
+			assert element.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == legacy_clickable_elements_to_string(
+				element, INCLUDE_ATTRIBUTES
+			)
+			for child in element.children:
+				if isinstance(child, DOMElementNode):
+					assert child.clickable_elements_to_string() == legacy_clickable_elements_to_string(child)
+					assert child.get_all_text_till_next_clickable_element() == legacy_get_all_text_till_next_clickable_element(
+						child
+					)
+
+
+def test_clickable_elements_to_string_handles_deep_trees():
+	"""
+	Test that trees deeper than the recursion limit can be serialized.
+	"""
+	root = DOMElementNode(
+		tag_name='body', text_content='', xpath='', attributes={}, children=[], is_visible=True, parent=None, is_top_element=True
+	)
+	element = root
+	for depth in range(sys.getrecursionlimit() + 100):
+		child = DOMElementNode(
+			tag_name='div',
+			text_content=None,
+			xpath=None,
+			attributes={},
+			children=[],
+			is_visible=True,
+			is_top_element=True,
+			highlight_index=0 if depth == 0 else None,
+			parent=element,
+		)
+		element.children.append(child)
+		element = child
+	element.children.append(DOMTextNode(text='deep', is_visible=True, parent=element))
+
+	assert root.clickable_elements_to_string() == '[0]<div >deep />'
+	assert root.children[0].get_all_text_till_next_clickable_element() == 'deep'  # type: ignore
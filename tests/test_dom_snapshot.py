@@ -0,0 +1,321 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from browser_use.dom.service import DomService
+from browser_use.dom.snapshot_patcher.service import DomSnapshotPatcher
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+def element(tag, xpath, children=(), highlight_index=None, **attributes):
+	node = {
+		'tagName': tag,
+		'textContent': '',
+		'xpath': xpath,
+		'attributes': attributes,
+		'isVisible': True,
+		'children': list(children),
+	}
+	if highlight_index is not None:
+		node['highlightIndex'] = highlight_index
+		node['isInteractive'] = True
+	return node
+
+
+def text(value):
+	return {'type': 'TEXT_NODE', 'text': value, 'isVisible': True}
+
+
+def full_snapshot():
+	return {
+		'rootId': '4',
+		'snapshotId': 'abc-1',
+		'map': {
+			'0': text('Hello'),
+			'1': element('button', 'html/body/div/button', ['0'], highlight_index=0),
+			'2': element('a', 'html/body/div/a', [], highlight_index=1, href='/next'),
+			'3': element('div', 'html/body/div', ['1', '2']),
+			'4': element('body', '/body', ['3']),
+		},
+		'pageInfo': {
+			'scrollX': 0,
+			'scrollY': 0,
+			'viewportWidth': 1280,
+			'viewportHeight': 720,
+			'scrollHeight': 720,
+			'devicePixelRatio': 1,
+			'title': 'Example',
+			'lastChange': None,
+		},
+	}
+
+
+async def test_construct_dom_tree_does_not_depend_on_node_order():
+	"""
+	Test that the tree is linked correctly even when parents are sent before their children.
+	"""
+	eval_page = full_snapshot()
+	eval_page['map'] = dict(reversed(list(eval_page['map'].items())))
+
+	tree, selector_map = await DomService(Mock())._construct_dom_tree(eval_page)
+
+	assert tree.tag_name == 'body'
+	div = tree.children[0]
+	assert isinstance(div, DOMElementNode) and div.parent is tree
+	assert [child.tag_name for child in div.children] == ['button', 'a']  # type: ignore
+	assert isinstance(div.children[0].children[0], DOMTextNode)  # type: ignore
+	assert list(selector_map) == [0, 1]
+	assert selector_map[1].attributes == {'href': '/next'}
+
+
+def columnar_snapshot():
+	strings = ['Hello', 'button', '', 'html/body/div/button', 'a', 'html/body/div/a', 'href', '/next', 'div', 'html/body/div']
+	strings += ['body', '/body']
+	return {
+		'format': 'columnar',
+		'rootId': 4,
+		'snapshotId': 'abc-1',
+		'map': {
+			'strings': strings,
+			'ids': [0, 1, 2, 3, 4],
+			'tags': [-1, 1, 4, 8, 10],
+			'texts': [0, 2, 2, 2, 2],
+			'xpaths': [-1, 3, 5, 9, 11],
+			'xpathSegments': [-1, -1, -1, -1, -1],
+			'flags': [1, 1 | 2, 1 | 2, 1, 1],
+			'highlightIndices': [-1, 0, 1, -1, -1],
+			'attributeOffsets': [0, 0, 0, 2, 2, 2],
+			'attributes': [6, 7],
+			'childOffsets': [0, 0, 1, 1, 3, 4],
+			'children': [0, 1, 2, 3],
+		},
+	}
+
+
+async def test_columnar_format_decodes_to_same_tree():
+	"""
+	Test that the columnar transfer format produces the same tree as the default one.
+	"""
+	service = DomService(Mock())
+	tree, selector_map = await service._construct_dom_tree(full_snapshot())
+	columnar_tree, columnar_selector_map = await service._construct_dom_tree(columnar_snapshot())
+
+	assert columnar_tree.__json__() == tree.__json__()
+	assert sorted(columnar_selector_map) == sorted(selector_map)
+	for index, node in selector_map.items():
+		other = columnar_selector_map[index]
+		assert (other.xpath, other.attributes, other.is_interactive) == (node.xpath, node.attributes, node.is_interactive)
+	assert isinstance(columnar_tree.children[0].children[0].children[0], DOMTextNode)  # type: ignore
+
+
+async def test_delta_snapshot_is_applied_copy_on_write():
+	"""
+	Test that a delta only replaces the changed nodes and their ancestors:
+	- the new tree reflects changed, added and removed nodes
+	- unchanged subtrees are shared with the previous tree
+	- the previous tree keeps its own children lists
+	"""
+	patcher = DomSnapshotPatcher()
+	service = DomService(Mock(), snapshot_patcher=patcher)
+	old_tree, old_selector_map = await service._construct_dom_tree(full_snapshot())
+	assert patcher.snapshot_id == 'abc-1'
+
+	delta = {
+		'rootId': '4',
+		'snapshotId': 'abc-2',
+		'delta': {
+			'changed': {
+				'2': element('a', 'html/body/div/a', [], highlight_index=1, href='/changed'),
+				'5': element('input', 'html/body/div/input', [], highlight_index=2),
+				'3': element('div', 'html/body/div', ['1', '2', '5']),
+			},
+			'removed': [],
+		},
+	}
+	new_tree, new_selector_map = await service._construct_dom_tree(delta)
+
+	assert patcher.snapshot_id == 'abc-2'
+	assert new_tree is not old_tree
+	assert [child.tag_name for child in new_tree.children[0].children] == ['button', 'a', 'input']  # type: ignore
+	assert new_selector_map[1].attributes == {'href': '/changed'}
+	assert new_selector_map[2].parent is new_tree.children[0]
+	# the unchanged button is shared, the old tree is untouched
+	assert new_selector_map[0] is old_selector_map[0]
+	assert [child.tag_name for child in old_tree.children[0].children] == ['button', 'a']  # type: ignore
+	assert old_selector_map[1].attributes == {'href': '/next'}
+
+	removal = {
+		'rootId': '4',
+		'snapshotId': 'abc-3',
+		'delta': {'changed': {'3': element('div', 'html/body/div', ['2', '5'])}, 'removed': ['1', '0']},
+	}
+	tree, selector_map = await service._construct_dom_tree(removal)
+	assert [child.tag_name for child in tree.children[0].children] == ['a', 'input']  # type: ignore
+	assert sorted(selector_map) == [1, 2]
+	assert '0' not in patcher.nodes and '1' not in patcher.nodes
+
+
+async def test_unchanged_snapshot_returns_same_tree():
+	"""
+	Test that an empty delta keeps the current tree.
+	"""
+	patcher = DomSnapshotPatcher()
+	service = DomService(Mock(), snapshot_patcher=patcher)
+	tree, _ = await service._construct_dom_tree(full_snapshot())
+
+	same_tree, selector_map = await service._construct_dom_tree(
+		{'rootId': '4', 'snapshotId': 'abc-1', 'delta': {'changed': {}, 'removed': []}}
+	)
+
+	assert same_tree is tree
+	assert sorted(selector_map) == [0, 1]
+
+
+async def test_missing_root_resets_patcher():
+	"""
+	Test that a snapshot without a usable root raises and forces a full snapshot next time.
+	"""
+	patcher = DomSnapshotPatcher()
+	service = DomService(Mock(), snapshot_patcher=patcher)
+	await service._construct_dom_tree(full_snapshot())
+
+	with pytest.raises(ValueError):
+		await service._construct_dom_tree({'rootId': '99', 'snapshotId': 'abc-2', 'delta': {'changed': {}, 'removed': ['4']}})
+
+	assert patcher.snapshot_id is None
+
+
+async def test_extractor_is_installed_once_per_document():
+	"""
+	Test that buildDomTree.js is only sent to the page when the installed copy is missing or outdated,
+	every other extraction is a small call into window.__browserUseExtractor.
+	"""
+	from browser_use.dom.service import EXTRACTOR_CALL_JS, EXTRACTOR_INSTALL_JS, EXTRACTOR_VERSION
+
+	installed_version = None
+	calls = []
+
+	async def evaluate(script, arg=None):
+		nonlocal installed_version
+		calls.append(script)
+		if script == EXTRACTOR_INSTALL_JS:
+			installed_version = EXTRACTOR_VERSION
+			return None
+		assert script == EXTRACTOR_CALL_JS
+		return full_snapshot() if installed_version == arg['version'] else None
+
+	page = Mock()
+	page.evaluate = evaluate
+	service = DomService(page)
+
+	await service._evaluate_extractor({})
+	await service._evaluate_extractor({})
+	assert calls == [EXTRACTOR_CALL_JS, EXTRACTOR_INSTALL_JS, EXTRACTOR_CALL_JS, EXTRACTOR_CALL_JS]
+
+	# a navigation drops the installed copy
+	installed_version = None
+	calls.clear()
+	await service._evaluate_extractor({})
+	assert calls == [EXTRACTOR_CALL_JS, EXTRACTOR_INSTALL_JS, EXTRACTOR_CALL_JS]
+
+
+async def test_leaf_text_mode_derives_element_text():
+	"""
+	Test that elements without a transferred textContent ('leaf' text mode) derive their text from text nodes.
+	"""
+	eval_page = full_snapshot()
+	for node_data in eval_page['map'].values():
+		if 'tagName' in node_data and 'highlightIndex' not in node_data:
+			node_data['textContent'] = None
+	eval_page['map']['1']['textContent'] = 'Hello'
+	eval_page['map']['2']['textContent'] = 'Next'
+
+	tree, selector_map = await DomService(Mock())._construct_dom_tree(eval_page)
+
+	assert tree.text_content is None
+	assert tree.get_text_content() == 'Hello'
+	assert selector_map[0].get_text_content() == 'Hello'
+	assert selector_map[1].get_text_content() == 'Next'
+
+
+async def test_highlighted_xpath_mode_resolves_xpaths_from_segments():
+	"""
+	Test that elements sent with only their XPath segment ('highlighted' XPath mode) resolve their full XPath
+	from their ancestors, including the root body and iframe boundaries.
+	"""
+	eval_page = {
+		'rootId': '6',
+		'map': {
+			'0': element('a', 'html/body/iframe/a', [], highlight_index=1),
+			'1': element('html', None, ['0']),
+			'2': element('iframe', 'html/body/div/iframe', ['1']),
+			'3': element('button', 'html/body/ul/li[2]/button', [], highlight_index=0),
+			'4': element('li', None, ['3']),
+			'5': element('ul', None, ['4']),
+			'6': element('body', '/body', ['5', '2']),
+		},
+	}
+	eval_page['map']['0']['xpath'] = 'html/a'
+	eval_page['map']['1']['xpathSegment'] = 'html'
+	eval_page['map']['4']['xpathSegment'] = 'li[2]'
+	eval_page['map']['5']['xpathSegment'] = 'ul'
+
+	tree, selector_map = await DomService(Mock())._construct_dom_tree(eval_page)
+
+	ul = tree.children[0]
+	assert isinstance(ul, DOMElementNode) and ul.xpath is None
+	assert ul.children[0].get_xpath() == 'html/body/ul/li[2]'  # type: ignore
+	assert ul.get_xpath() == 'html/body/ul'
+	assert selector_map[0].get_xpath() == 'html/body/ul/li[2]/button'
+	assert selector_map[1].parent.get_xpath() == 'html'  # type: ignore
+
+
+async def test_budgeted_extraction_reports_truncation():
+	"""
+	Test that the node/time budget is passed to buildDomTree.js and that a truncated result is reported
+	in DOMState.truncation, while a complete one is not.
+	"""
+	from browser_use.dom.service import EXTRACTOR_CALL_JS
+
+	calls = []
+	truncated = {'reason': 'nodes', 'visitedNodes': 100, 'pendingSubtrees': 3, 'stoppedAt': 'html/body/div[4]'}
+
+	async def evaluate(script, arg=None):
+		assert script == EXTRACTOR_CALL_JS
+		calls.append(arg['args'])
+		eval_page = full_snapshot()
+		if not arg['args']['resume']:
+			eval_page['truncated'] = truncated
+		return eval_page
+
+	page = Mock()
+	page.url = 'https://example.com'
+	page.evaluate = evaluate
+	service = DomService(page)
+
+	state = await service.get_clickable_elements(max_nodes=100)
+	assert (calls[0]['maxNodes'], calls[0]['timeBudgetMs'], calls[0]['resume']) == (100, 0, False)
+	assert state.truncation is not None
+	assert (state.truncation.reason, state.truncation.visited_nodes) == ('nodes', 100)
+	assert (state.truncation.pending_subtrees, state.truncation.stopped_at) == (3, 'html/body/div[4]')
+	assert sorted(state.selector_map) == [0, 1]
+
+	state = await service.get_clickable_elements(max_nodes=100, resume=True)
+	assert calls[1]['resume'] is True
+	assert state.truncation is None
+
+
+async def test_parsed_nodes_are_compact():
+	"""
+	Test that nodes are slotted and that tag names and attribute keys are shared between trees.
+	"""
+	service = DomService(Mock())
+	# strings decoded from the page are fresh objects, unlike the literals of full_snapshot()
+	tree, selector_map = await service._construct_dom_tree(json.loads(json.dumps(full_snapshot())))
+	other_tree, other_selector_map = await service._construct_dom_tree(json.loads(json.dumps(full_snapshot())))
+
+	assert not hasattr(tree, '__dict__') and not hasattr(tree.children[0].children[0].children[0], '__dict__')  # type: ignore
+	assert selector_map[1].tag_name is other_selector_map[1].tag_name
+	assert next(iter(selector_map[1].attributes)) is next(iter(other_selector_map[1].attributes))
+	assert selector_map[0].hash is selector_map[0].hash
@@ -0,0 +1,159 @@
+import asyncio
+
+import anyio
+
+from browser_use.browser.downloads.service import DownloadManager
+
+
+class Emitter:
+	def __init__(self):
+		self.handlers: dict[str, list] = {}
+
+	def on(self, event, handler):
+		self.handlers.setdefault(event, []).append(handler)
+
+	def remove_listener(self, event, handler):
+		self.handlers[event].remove(handler)
+
+	def emit(self, event, *args):
+		for handler in list(self.handlers.get(event, [])):
+			handler(*args)
+
+
+class FakeDownload:
+	def __init__(self, url, suggested_filename, content=b'data'):
+		self.url = url
+		self.suggested_filename = suggested_filename
+		self.content = content
+		self.finished = asyncio.Event()
+
+	async def save_as(self, path):
+		await self.finished.wait()
+		await anyio.Path(path).write_bytes(self.content)
+
+
+class FakeRequest:
+	resource_type = 'document'
+
+	def __init__(self, url):
+		self.url = url
+
+	def is_navigation_request(self):
+		return True
+
+
+class FakeResponse:
+	def __init__(self, request, headers):
+		self.request = request
+		self.headers = headers
+
+
+class FakeContext(Emitter):
+	def __init__(self):
+		super().__init__()
+		self.pages = [Emitter()]
+
+	def open(self):
+		page = Emitter()
+		self.pages.append(page)
+		self.emit('page', page)
+		return page
+
+
+async def test_downloads_of_all_tabs_are_saved_in_the_background(tmp_path):
+	"""
+	Test that downloads are saved as they happen in any tab, under unique names also while the download with the same
+	name is still being saved, and that closing waits for the downloads being saved.
+	"""
+	(tmp_path / 'report.pdf').write_bytes(b'old')
+	context = FakeContext()
+	manager = DownloadManager(context, str(tmp_path))  # type: ignore
+	manager.start()
+
+	first, second = FakeDownload('https://example.com/a', 'report.pdf'), FakeDownload('https://example.com/b', 'report.pdf')
+	context.pages[0].emit('download', first)
+	context.open().emit('download', second)
+	assert [record.path for record in manager.downloads] == [
+		str(tmp_path / 'report (1).pdf'),
+		str(tmp_path / 'report (2).pdf'),
+	]
+	assert not any(record.finished for record in manager.downloads)
+
+	first.finished.set()
+	second.finished.set()
+	await manager.close()
+	assert all(record.finished for record in manager.downloads)
+	assert (tmp_path / 'report (2).pdf').read_bytes() == b'data'
+	assert (tmp_path / 'report.pdf').read_bytes() == b'old'
+
+
+async def test_clicks_only_wait_for_downloads_their_navigation_announces(tmp_path):
+	"""
+	Test that a click without a navigation in flight does not wait at all, that a navigation answered with a page ends
+	the wait, and that a navigation answered with an attachment is waited for until its download starts.
+	"""
+	context = FakeContext()
+	page = context.pages[0]
+	manager = DownloadManager(context, str(tmp_path))  # type: ignore
+	manager.start()
+	loop = asyncio.get_running_loop()
+
+	started = loop.time()
+	assert await manager.wait_for_download(since=started, timeout=5) is None
+	assert loop.time() - started < 0.05
+
+	started = loop.time()
+	navigation = FakeRequest('https://example.com/next')
+	page.emit('request', navigation)
+	loop.call_later(0.05, page.emit, 'response', FakeResponse(navigation, {'content-type': 'text/html'}))
+	assert await manager.wait_for_download(since=started, timeout=5) is None
+	assert 0.05 <= loop.time() - started < 1
+
+	started = loop.time()
+	export = FakeRequest('https://example.com/export')
+	page.emit('request', export)
+	download = FakeDownload('https://example.com/export', 'export.csv')
+	loop.call_later(0.02, page.emit, 'response', FakeResponse(export, {'content-disposition': 'attachment; filename=export.csv'}))
+	loop.call_later(0.05, page.emit, 'download', download)
+	record = await manager.wait_for_download(since=started, timeout=5)
+	assert record is not None and record.path == str(tmp_path / 'export.csv')
+	assert loop.time() - started < 1
+
+	# downloads started before the click are not reported for it
+	assert await manager.wait_for_download(since=loop.time(), timeout=5) is None
+
+	download.finished.set()
+	await manager.close()
+
+
+async def test_downloads_without_a_navigation_are_reported(tmp_path):
+	"""
+	Test that a download the click expects (e.g. of an <a download> link) is waited for without any navigation, up to
+	the timeout, and that one whose event is dispatched right after the click is reported without expecting it.
+	"""
+	context = FakeContext()
+	page = context.pages[0]
+	manager = DownloadManager(context, str(tmp_path))  # type: ignore
+	manager.start()
+	loop = asyncio.get_running_loop()
+
+	started = loop.time()
+	download = FakeDownload('blob:https://example.com/1234', 'invoice.pdf')
+	loop.call_later(0.05, page.emit, 'download', download)
+	record = await manager.wait_for_download(since=started, timeout=5, expected=True)
+	assert record is not None and record.path == str(tmp_path / 'invoice.pdf')
+	assert 0.05 <= loop.time() - started < 1
+
+	started = loop.time()
+	assert await manager.wait_for_download(since=started, timeout=0.1, expected=True) is None
+	assert loop.time() - started >= 0.1
+
+	started = loop.time()
+	late = FakeDownload('blob:https://example.com/5678', 'receipt.pdf')
+	loop.call_soon(page.emit, 'download', late)
+	record = await manager.wait_for_download(since=started, timeout=5)
+	assert record is not None and record.suggested_filename == 'receipt.pdf'
+
+	download.finished.set()
+	late.finished.set()
+	await manager.close()
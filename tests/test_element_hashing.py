@@ -0,0 +1,191 @@
+import hashlib
+import random
+from unittest.mock import Mock
+
+import pytest
+
+from browser_use.dom.clickable_element_processor.service import ClickableElementProcessor
+from browser_use.dom.history_tree_processor.service import ElementHasher, HistoryTreeProcessor, element_hasher
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement, HashedDomElement
+from browser_use.dom.service import DomService
+from browser_use.dom.views import DOMElementNode, DOMState
+
+TAGS = ['div', 'span', 'a', 'button', 'li', 'ul', 'section']
+
+
+def sha256(string: str) -> str:
+	return hashlib.sha256(string.encode()).hexdigest()
+
+
+def legacy_hash(dom_element: DOMElementNode) -> HashedDomElement:
+	"""The SHA-256 hashes of earlier versions, computed by walking to the root"""
+	branch_path = []
+	current = dom_element
+	while current.parent is not None:
+		branch_path.append(current.tag_name)
+		current = current.parent
+	branch_path.reverse()
+	attributes = ''.join(f'{key}={value}' for key, value in dom_element.attributes.items())
+	return HashedDomElement(sha256('/'.join(branch_path)), sha256(attributes), sha256(dom_element.xpath))  # type: ignore
+
+
+def random_tree(seed: int, size: int = 300) -> tuple[DOMElementNode, list[DOMElementNode]]:
+	rng = random.Random(seed)
+	root = DOMElementNode(
+		tag_name='body', text_content='', xpath='/body', attributes={}, children=[], is_visible=True, parent=None
+	)
+	elements = [root]
+	for index in range(size):
+		parent = rng.choice(elements)
+		tag = rng.choice(TAGS)
+		element = DOMElementNode(
+			tag_name=tag,
+			text_content='',
+			xpath=f'{parent.xpath}/{tag}[{index}]',
+			attributes={'class': rng.choice(['btn', 'link', 'item'])} if rng.random() < 0.5 else {},
+			children=[],
+			is_visible=True,
+			highlight_index=index if rng.random() < 0.3 else None,
+			parent=parent,
+		)
+		parent.children.append(element)
+		elements.append(element)
+	return root, elements
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sha256_mode_matches_previous_hashes(seed):
+	"""
+	Test that the SHA-256 mode reproduces the hashes of earlier versions, for the tree pass and for single elements.
+	"""
+	hasher = ElementHasher('sha256')
+	root, elements = random_tree(seed)
+	hasher.hash_tree(root)
+
+	for element in elements:
+		if element.highlight_index is not None:
+			assert element._hash == legacy_hash(element)
+		assert hasher.hash_element(element) == legacy_hash(element)
+
+
+@pytest.mark.parametrize('mode', ['fast', 'sha256'])
+def test_tree_pass_matches_single_element_hashes(mode):
+	"""
+	Test that branch path hashes derived from the parent equal the ones of the full branch path.
+	"""
+	hasher = ElementHasher(mode)  # type: ignore
+	root, elements = random_tree(0)
+	hasher.hash_tree(root)
+
+	highlighted = [element for element in elements if element.highlight_index is not None]
+	assert highlighted
+	for element in highlighted:
+		assert element._hash == hasher.hash_element(element)
+		assert element._hash.branch_path_hash == hasher.hash_branch_path(HistoryTreeProcessor._get_parent_branch_path(element))  # type: ignore
+	assert len({element._hash.branch_path_hash for element in highlighted}) > 1  # type: ignore
+
+
+async def test_constructed_trees_are_hashed_once_for_both_processors():
+	"""
+	Test that DomService hashes the highlighted elements while building the tree,
+	and that the history and the clickable element processors use those hashes.
+	"""
+	button = {'tagName': 'button', 'xpath': 'html/body/div/button', 'attributes': {'type': 'submit'}, 'children': []}
+	eval_page = {
+		'rootId': '2',
+		'map': {
+			'0': {**button, 'highlightIndex': 1, 'isInteractive': True},
+			'1': {'tagName': 'div', 'xpath': 'html/body/div', 'attributes': {}, 'children': ['0']},
+			'2': {'tagName': 'body', 'xpath': '/body', 'attributes': {}, 'children': ['1']},
+		},
+	}
+	tree, selector_map = await DomService(Mock())._construct_dom_tree(eval_page)
+
+	element = selector_map[1]
+	assert element._hash is not None
+	assert element.hash is element._hash
+	assert element.hash == element_hasher.hash_element(element)
+	assert ClickableElementProcessor.get_clickable_elements_hashes(tree) == {element_hasher.combine(element.hash)}
+
+	history_element = DOMHistoryElement('button', '', element.xpath, 1, ['div', 'button'], {'type': 'submit'})  # type: ignore
+	assert HistoryTreeProcessor.find_history_element_in_tree(history_element, tree) is element
+	assert HistoryTreeProcessor.compare_history_element_and_dom_element(history_element, element)
+
+
+def legacy_find_history_element_in_tree(history_element: DOMHistoryElement, tree: DOMElementNode) -> DOMElementNode | None:
+	hashed_history_element = HistoryTreeProcessor._hash_dom_history_element(history_element)
+
+	def process_node(node: DOMElementNode):
+		if node.highlight_index is not None and element_hasher.hash_element(node) == hashed_history_element:
+			return node
+		for child in node.children:
+			if isinstance(child, DOMElementNode):
+				result = process_node(child)
+				if result is not None:
+					return result
+		return None
+
+	return process_node(tree)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_state_index_finds_history_elements_like_a_tree_scan(seed):
+	"""
+	Test that lookups through the index of a state return the element a full tree scan finds,
+	and that the index is built once per state.
+	"""
+	root, elements = random_tree(seed)
+	state = DOMState(element_tree=root, selector_map={})
+	history_elements = [
+		DOMHistoryElement(
+			element.tag_name,
+			'',
+			element.xpath,
+			element.highlight_index,
+			HistoryTreeProcessor._get_parent_branch_path(element),
+			element.attributes,
+		)  # type: ignore
+		for element in elements
+	]
+	# an element that is not on the page
+	history_elements.append(DOMHistoryElement('button', '', 'html/body/nav/button', 0, ['nav', 'button'], {}))
+
+	for history_element in history_elements:
+		found = HistoryTreeProcessor.find_history_element_in_state(history_element, state)
+		assert found is legacy_find_history_element_in_tree(history_element, root)
+		assert found is HistoryTreeProcessor.find_history_element_in_tree(history_element, root)
+	assert state.element_index is state.element_index
+
+
+def test_index_returns_the_first_element_in_document_order():
+	"""
+	Test that duplicated elements resolve to the first one in document order, and that the partial key
+	of branch path and attributes lists the elements whose XPath differs.
+	"""
+	root = DOMElementNode(
+		tag_name='body', text_content='', xpath='/body', attributes={}, children=[], is_visible=True, parent=None
+	)
+	for index, xpath in enumerate(['html/body/a', 'html/body/a', 'html/body/a[2]']):
+		root.children.append(
+			DOMElementNode(
+				tag_name='a',
+				text_content='',
+				xpath=xpath,
+				attributes={},
+				children=[],
+				is_visible=True,
+				highlight_index=index,
+				parent=root,
+			)
+		)
+	state = DOMState(element_tree=root, selector_map={})
+
+	first, _, last = root.children
+	assert state.element_index.get(first.hash) is first  # type: ignore
+	assert state.element_index.get_candidates(first.hash.branch_path_hash, first.hash.attributes_hash) == root.children  # type: ignore
+	assert state.element_index.get(last.hash) is last  # type: ignore
+
+
+def test_unknown_hash_mode_is_rejected():
+	with pytest.raises(ValueError):
+		ElementHasher('md5')  # type: ignore
@@ -0,0 +1,144 @@
+from browser_use.agent.views import ActionResult, AgentBrain, AgentHistory, AgentHistoryList, AgentOutput
+from browser_use.browser.views import BrowserStateHistory
+from browser_use.dom.element_matcher.service import ElementMatcher
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+from browser_use.dom.views import DOMElementNode, DOMState, DOMTextNode
+
+PRODUCTS = ['Blue running shoes', 'Red rain jacket', 'Green wool hat', 'Black leather belt', 'White cotton shirt']
+
+
+def element(tag, xpath, parent, attributes=None, text=None, highlight_index=None):
+	node = DOMElementNode(
+		tag_name=tag,
+		text_content=None,
+		xpath=xpath,
+		attributes=attributes or {},
+		children=[],
+		is_visible=True,
+		highlight_index=highlight_index,
+		parent=parent,
+	)
+	if text is not None:
+		node.children.append(DOMTextNode(text=text, is_visible=True, parent=node))
+	if parent is not None:
+		parent.children.append(node)
+	return node
+
+
+def product_page(products: list[str], link_class: str = 'product-link') -> DOMState:
+	"""A list of product links, each with an add-to-cart button"""
+	body = element('body', '/body', None)
+	ul = element('ul', 'html/body/ul', body, {'class': 'products'})
+	selector_map = {}
+	for position, name in enumerate(products, start=1):
+		li = element('li', f'html/body/ul/li[{position}]', ul)
+		link = element(
+			'a',
+			f'html/body/ul/li[{position}]/a',
+			li,
+			{'class': link_class, 'href': f'/p/{name.split()[1]}'},
+			name,
+			len(selector_map),
+		)
+		selector_map[link.highlight_index] = link
+		button = element(
+			'button', f'html/body/ul/li[{position}]/button', li, {'type': 'button'}, 'Add to cart', len(selector_map)
+		)
+		selector_map[button.highlight_index] = button
+	return DOMState(element_tree=body, selector_map=selector_map)
+
+
+def recorded(node: DOMElementNode) -> DOMHistoryElement:
+	return DOMHistoryElement(
+		node.tag_name,
+		node.get_text_content(),
+		node.xpath,  # type: ignore
+		node.highlight_index,
+		HistoryTreeProcessor._get_parent_branch_path(node),
+		node.attributes,
+	)
+
+
+def find_link(state: DOMState, name: str) -> DOMElementNode:
+	return next(node for node in state.selector_map.values() if node.tag_name == 'a' and node.get_text_content() == name)
+
+
+def test_changed_element_is_re_identified():
+	"""
+	Test that an element is found again after its class changed and a sibling was inserted before it,
+	which makes the exact hash lookup fail.
+	"""
+	recorded_link = recorded(find_link(product_page(PRODUCTS), 'Green wool hat'))
+
+	changed_page = product_page(['Yellow beach towel'] + PRODUCTS, link_class='product-link is-featured')
+	assert HistoryTreeProcessor.find_history_element_in_state(recorded_link, changed_page) is None
+
+	match = changed_page.element_matcher.match(recorded_link)
+	assert match is not None
+	assert match.element is find_link(changed_page, 'Green wool hat')
+	assert match.confidence >= 0.8
+
+
+def test_missing_element_is_not_a_confident_match():
+	"""
+	Test that an element that is gone from the page does not match another one confidently.
+	"""
+	recorded_link = recorded(find_link(product_page(PRODUCTS), 'Green wool hat'))
+	changed_page = product_page([name for name in PRODUCTS if name != 'Green wool hat'])
+
+	match = changed_page.element_matcher.match(recorded_link)
+	assert match is None or match.confidence < 0.8
+
+
+def test_ambiguous_elements_lower_the_confidence():
+	"""
+	Test that a recorded element equally similar to two elements is no confident match,
+	even though its similarity is high.
+	"""
+	page = product_page(PRODUCTS)
+	# the add-to-cart buttons only differ by the position of their list item, which is no feature
+	recorded_button = recorded(page.selector_map[5])
+
+	match = page.element_matcher.match(recorded_button)
+	assert match is not None
+	assert match.similarity == 1.0
+	assert match.confidence < 0.8
+
+
+def test_unindexed_tags_do_not_match():
+	page = product_page(PRODUCTS)
+	recorded_input = DOMHistoryElement('input', 'Green wool hat', 'html/body/input', 0, ['input'], {})
+
+	assert page.element_matcher.match(recorded_input) is None
+	assert ElementMatcher.similarity(recorded_input, recorded(page.selector_map[4])) == 0.0
+
+
+def history_item(elements: list[DOMHistoryElement | None], goal: str) -> AgentHistory:
+	return AgentHistory(
+		model_output=AgentOutput(current_state=AgentBrain(evaluation_previous_goal='', memory='', next_goal=goal), action=[]),
+		result=[ActionResult()],
+		state=BrowserStateHistory(url='', title='', tabs=[], interacted_element=elements),
+	)
+
+
+def test_next_action_is_found_for_re_identified_elements():
+	"""
+	Test that the recorded step is found for an executed step whose element was re-identified,
+	only when a match threshold is given.
+	"""
+	recorded_page = product_page(PRODUCTS)
+	history = AgentHistoryList(
+		history=[
+			history_item([recorded(find_link(recorded_page, 'Red rain jacket'))], 'open jacket'),
+			history_item([recorded(find_link(recorded_page, 'Green wool hat'))], 'open hat'),
+			history_item([None], 'done'),
+		]
+	)
+
+	changed_page = product_page(['Yellow beach towel'] + PRODUCTS, link_class='product-link is-featured')
+	executed = history_item([recorded(find_link(changed_page, 'Green wool hat'))], 'open hat')
+
+	assert history.get_next_action(executed) is None
+	next_step = history.get_next_action(executed, match_threshold=0.8)
+	assert next_step is not None and next_step.model_output.current_state.next_goal == 'done'  # type: ignore
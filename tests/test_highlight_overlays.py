@@ -0,0 +1,33 @@
+import pytest
+
+from browser_use.browser.browser import Browser, BrowserConfig
+
+PAGE_HTML = ''.join(f'<button style="display:block;margin:20px">Button {index}</button>' for index in range(10))
+
+LISTENER_COUNT_JS = '() => window.__browserUseOverlays ? window.__browserUseOverlays.listenerCount : 0'
+
+
+@pytest.fixture
+async def context():
+	browser = Browser(config=BrowserConfig(headless=True))
+	async with await browser.new_context() as context:
+		yield context
+	await browser.close()
+
+
+async def test_highlight_listeners_do_not_leak_across_steps(context):
+	"""
+	Test that all highlights of a page share one scroll/resize listener pair,
+	and that remove_highlights detaches it again, however many steps are taken.
+	"""
+	page = await context.get_current_page()
+	await page.set_content(f'<html><body>{PAGE_HTML}</body></html>')
+
+	for _ in range(5):
+		state = await context.get_state(cache_clickable_elements_hashes=False)
+		assert len(state.selector_map) == 10
+		assert await page.evaluate(LISTENER_COUNT_JS) == 2
+
+		await context.remove_highlights()
+		assert await page.evaluate(LISTENER_COUNT_JS) == 0
+		assert await page.evaluate("() => document.getElementById('playwright-highlight-container')") is None
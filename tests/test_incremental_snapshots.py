@@ -0,0 +1,38 @@
+import pytest
+
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContextConfig
+
+PAGE_HTML = ''.join(f'<button style="display:block;margin:20px">Button {index}</button>' for index in range(3))
+
+
+@pytest.fixture
+async def context():
+	browser = Browser(config=BrowserConfig(headless=True))
+	async with await browser.new_context(
+		config=BrowserContextConfig(incremental_dom_snapshots=True, highlight_elements=True, screencast=True)
+	) as context:
+		yield context
+	await browser.close()
+
+
+async def test_incremental_snapshots_follow_the_page_across_highlighted_steps(context):
+	"""
+	Test that the snapshot state flushes the removal of the previous highlights without failing, so every step
+	after the first is extracted incrementally and still sees the changes of the page.
+	"""
+	page = await context.get_current_page()
+	await page.set_content(f'<html><body>{PAGE_HTML}</body></html>')
+
+	state = await context.get_state(cache_clickable_elements_hashes=False)
+	assert len(state.selector_map) == 3
+
+	for count in range(4, 7):
+		await page.evaluate("(count) => document.body.insertAdjacentHTML('beforeend', `<button>Button ${count}</button>`)", count)
+		state = await context.get_state(cache_clickable_elements_hashes=False)
+		assert len(state.selector_map) == count + 1
+		assert await page.evaluate('() => window.__browserUseDomSnapshot.snapshotId') is not None
+
+	# nothing changed but the highlights, which are redrawn
+	state = await context.get_state(cache_clickable_elements_hashes=False)
+	assert len(state.selector_map) == 7
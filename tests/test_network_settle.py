@@ -0,0 +1,133 @@
+import asyncio
+
+from browser_use.browser.network_settle.service import NetworkIdleWatcher, SettleProfiles, is_relevant_request
+
+
+class FakePage:
+	def __init__(self):
+		self.handlers = {}
+
+	def on(self, event, handler):
+		self.handlers[event] = handler
+
+	def remove_listener(self, event, handler):
+		assert self.handlers.pop(event) == handler
+
+	def emit(self, event, arg):
+		self.handlers[event](arg)
+
+
+class FakeRequest:
+	def __init__(self, url, resource_type='script', headers=None):
+		self.url = url
+		self.resource_type = resource_type
+		self.headers = headers or {}
+
+
+class FakeResponse:
+	def __init__(self, request, content_type='application/javascript'):
+		self.request = request
+		self.headers = {'content-type': content_type}
+
+
+def test_requests_the_page_does_not_need_are_ignored():
+	assert is_relevant_request(FakeRequest('https://example.com/app.js'))
+	assert not is_relevant_request(FakeRequest('https://www.google-analytics.com/collect'))
+	assert not is_relevant_request(FakeRequest('https://example.com/api/HEARTBEAT'))
+	assert not is_relevant_request(FakeRequest('https://example.com/live', resource_type='websocket'))
+	assert not is_relevant_request(FakeRequest('https://example.com/next', headers={'purpose': 'prefetch'}))
+
+
+async def test_waiter_wakes_when_the_last_request_finished_and_the_network_was_quiet():
+	"""
+	Test that the wait ends one quiet window after the last relevant request finished, and that ignored requests
+	and failed requests do not keep the page busy.
+	"""
+	page = FakePage()
+	watcher = NetworkIdleWatcher(page)  # type: ignore
+	watcher.start()
+	loop = asyncio.get_running_loop()
+
+	script, image = FakeRequest('https://example.com/app.js'), FakeRequest('https://example.com/a.png', 'image')
+	page.emit('request', script)
+	page.emit('request', image)
+	page.emit('request', FakeRequest('https://example.com/track/beacon'))
+	assert watcher.pending == {script, image}
+
+	async def load():
+		await asyncio.sleep(0.1)
+		page.emit('response', FakeResponse(script))
+		await asyncio.sleep(0.1)
+		page.emit('requestfailed', image)
+
+	loader = asyncio.create_task(load())
+	assert await watcher.wait(idle_time=0.1, timeout=2)
+	await loader
+	watcher.stop()
+
+	assert not page.handlers
+	assert 0.2 <= watcher.settle_time < 0.3
+	assert 0.3 <= loop.time() - watcher.started < 0.5
+	assert watcher.request_count == 2 and watcher.longest_gap < 0.05
+
+
+async def test_wait_lasts_the_minimum_wait_and_times_out_on_pending_requests():
+	page = FakePage()
+	watcher = NetworkIdleWatcher(page)  # type: ignore
+	watcher.start()
+	loop = asyncio.get_running_loop()
+
+	assert await watcher.wait(idle_time=0, timeout=2, minimum_wait=lambda: 0.2)
+	assert loop.time() - watcher.started >= 0.2
+	assert watcher.settle_time == 0 and watcher.request_count == 0
+
+	page.emit('request', FakeRequest('https://example.com/never-answered.js'))
+	assert not await watcher.wait(idle_time=0, timeout=0.3)
+
+
+def test_minimum_wait_is_learned_per_domain():
+	profiles = SettleProfiles(max_samples=10, quantile=0.9)
+	assert profiles.minimum_wait('https://slow.example.com/') is None
+
+	for settle_time in [0.5, 1.5, 1.0, 2.0, 1.2]:
+		profiles.record(f'https://slow.example.com/page/{settle_time}', settle_time)
+	profiles.record('https://fast.example.com/', 0.0)
+	profiles.record('about:blank', 3.0)
+
+	assert profiles.minimum_wait('https://slow.example.com/other') == 2.0
+	assert profiles.minimum_wait('https://fast.example.com/search?q=x') == 0.0
+	assert profiles.minimum_wait('about:blank') is None
+
+	# only the recent page loads count
+	for _ in range(10):
+		profiles.record('https://slow.example.com/', 0.8)
+	assert profiles.minimum_wait('https://slow.example.com/') == 0.8
+
+
+async def test_watcher_measures_the_pauses_between_requests():
+	page = FakePage()
+	watcher = NetworkIdleWatcher(page)  # type: ignore
+	watcher.start()
+
+	first, second = FakeRequest('https://example.com/app.js'), FakeRequest('https://example.com/data.js')
+	page.emit('request', first)
+	page.emit('response', FakeResponse(first))
+	await asyncio.sleep(0.15)
+	# a request that starts while another one is pending is no pause
+	page.emit('request', second)
+	page.emit('request', FakeRequest('https://example.com/more.js'))
+	watcher.stop()
+
+	assert watcher.request_count == 3
+	assert 0.15 <= watcher.longest_gap < 0.25
+
+
+def test_quiet_window_is_learned_once_a_few_loads_were_recorded():
+	profiles = SettleProfiles(max_samples=10, quantile=0.9, min_idle_samples=3, idle_margin=0.1)
+	profiles.record('https://example.com/a', 1.0, 0.05)
+	profiles.record('https://example.com/b', 1.2, 0.2)
+	assert profiles.idle_time('https://example.com/') is None
+
+	profiles.record('https://example.com/c', 0.8, 0.1)
+	assert profiles.idle_time('https://example.com/') == 0.2 + 0.1
+	assert profiles.idle_time('https://other.example.com/') is None
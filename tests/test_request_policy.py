@@ -0,0 +1,80 @@
+from browser_use.browser.context import BrowserContextConfig
+from browser_use.browser.request_policy.service import RequestBlocker
+from browser_use.browser.request_policy.views import RequestPolicy
+
+
+class FakeFrame:
+	def __init__(self, url):
+		self.url = url
+
+
+class FakeRequest:
+	def __init__(self, url, resource_type='script', frame_url='https://shop.example.com/cart'):
+		self.url = url
+		self.resource_type = resource_type
+		self.frame = FakeFrame(frame_url)
+
+
+class FakeRoute:
+	def __init__(self, request):
+		self.request = request
+		self.outcome = None
+
+	async def fallback(self):
+		self.outcome = 'fallback'
+
+	async def abort(self, error_code):
+		self.outcome = error_code
+
+
+def test_text_only_preset_blocks_what_a_text_agent_does_not_need():
+	blocker = RequestBlocker(RequestPolicy.text_only())
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/logo.png', 'image')) == 'resource type image'
+	assert blocker.block_reason(FakeRequest('https://fonts.gstatic.com/s/roboto.woff2', 'font')) == 'resource type font'
+	assert blocker.block_reason(FakeRequest('https://www.google-analytics.com/g/collect', 'fetch')) == 'blocked domain'
+	assert blocker.block_reason(FakeRequest('https://cdn.thirdparty.net/widget.js')) == 'third-party script'
+
+	assert blocker.block_reason(FakeRequest('https://static.example.com/app.js')) is None
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/api/cart', 'fetch')) is None
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/styles.css', 'stylesheet')) is None
+	# the domain has to match whole labels
+	assert blocker.block_reason(FakeRequest('https://notdoubleclick.net/x', 'fetch')) is None
+
+
+def test_vision_preset_keeps_what_screenshots_show():
+	blocker = RequestBlocker(RequestPolicy.vision())
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/logo.png', 'image')) is None
+	assert blocker.block_reason(FakeRequest('https://cdn.thirdparty.net/widget.js')) is None
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/intro.mp4', 'media')) == 'resource type media'
+	assert blocker.block_reason(FakeRequest('https://stats.g.doubleclick.net/j/collect', 'image')) == 'blocked domain'
+
+
+def test_policy_is_part_of_the_context_config():
+	config = BrowserContextConfig(
+		request_policy={'block_url_patterns': ['/Ads/'], 'block_domains': ['tracker.example.org']}  # type: ignore
+	)
+	assert config.request_policy is not None
+	blocker = RequestBlocker(config.request_policy)
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/ads/banner.js')) == 'URL pattern'
+	assert blocker.block_reason(FakeRequest('https://cdn.tracker.example.org/t.js')) == 'blocked domain'
+	assert blocker.block_reason(FakeRequest('https://shop.example.com/app.js')) is None
+
+
+async def test_blocked_requests_are_counted_per_step():
+	blocker = RequestBlocker(RequestPolicy(block_resource_types={'image', 'font'}))
+	routes = [
+		FakeRoute(FakeRequest('https://shop.example.com/a.png', 'image')),
+		FakeRoute(FakeRequest('https://shop.example.com/b.png', 'image')),
+		FakeRoute(FakeRequest('https://shop.example.com/app.js')),
+	]
+	for route in routes:
+		await blocker._handle(route)  # type: ignore
+	assert [route.outcome for route in routes] == ['blockedbyclient', 'blockedbyclient', 'fallback']
+
+	stats = blocker.take_step_stats()
+	assert (stats.count, stats.by_resource_type) == (2, {'image': 2})
+	assert stats.estimated_bytes > 0
+
+	await blocker._handle(FakeRoute(FakeRequest('https://shop.example.com/font.woff2', 'font')))  # type: ignore
+	assert blocker.take_step_stats().by_resource_type == {'font': 1}
+	assert blocker.total.count == 3
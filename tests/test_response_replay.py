@@ -0,0 +1,186 @@
+import base64
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from browser_use.browser.context import BrowserContextConfig
+from browser_use.browser.response_replay.service import ResponseReplayer, ResponseStore, normalize_request_url
+from browser_use.browser.response_replay.views import ResponseReplayConfig
+
+
+class FakeRequest:
+	def __init__(self, url, method='GET', post_data_buffer=None):
+		self.url = url
+		self.method = method
+		self.post_data_buffer = post_data_buffer
+
+
+class FakeAPIResponse:
+	status = 200
+	headers = {'content-type': 'text/html', 'content-encoding': 'gzip'}
+
+	async def body(self):
+		return b'<html>live</html>'
+
+
+class FakeRoute:
+	def __init__(self, request, fetch_error=None):
+		self.request = request
+		self.outcome = None
+		self.fetch_error = fetch_error
+
+	async def fulfill(self, status, headers, body):
+		self.outcome = (status, headers, body)
+
+	async def abort(self, error_code):
+		self.outcome = error_code
+
+	async def fallback(self):
+		self.outcome = 'fallback'
+
+	async def fetch(self, max_redirects):
+		if self.fetch_error:
+			raise self.fetch_error
+		return FakeAPIResponse()
+
+
+class FakeContext:
+	async def route(self, url, handler):
+		self.handler = handler
+
+
+def write_har(path, entries):
+	har_entries = []
+	for method, url, status, text, encoding in entries:
+		content = {'text': text} if encoding is None else {'text': text, 'encoding': encoding}
+		har_entries.append(
+			{
+				'request': {'method': method, 'url': url},
+				'response': {
+					'status': status,
+					'headers': [{'name': 'Content-Type', 'value': 'text/plain'}, {'name': 'Content-Length', 'value': '3'}],
+					'content': content,
+				},
+			}
+		)
+	path.write_text(json.dumps({'log': {'entries': har_entries}}))
+
+
+def test_urls_are_matched_without_ignored_query_params_and_timestamps():
+	config = ResponseReplayConfig(store_dir='unused', ignore_query_params=['session'])
+	assert normalize_request_url('https://Example.com/api/items?session=ab12&b=2&a=1&_=1712345678901#top', config) == (
+		'https://example.com/api/items?_=%3Ats&a=1&b=2'
+	)
+	# ids are not timestamps: numbers in the path, and query values outside of the plausible range
+	assert normalize_request_url('https://example.com/orders/1712345678', config) == 'https://example.com/orders/1712345678'
+	assert normalize_request_url('https://example.com/orders?id=1000000001&ref=9876543210', config) == (
+		'https://example.com/orders?id=1000000001&ref=9876543210'
+	)
+	assert normalize_request_url('https://example.com/feed?t=1712345678.25', config) == 'https://example.com/feed?t=%3Ats'
+
+	ignore_all = ResponseReplayConfig(store_dir='unused', ignore_query_params=['*'], normalize_timestamps=False)
+	assert normalize_request_url('https://example.com/search?q=hats', ignore_all) == 'https://example.com/search'
+
+
+def test_config_needs_something_to_replay_from():
+	with pytest.raises(ValidationError):
+		ResponseReplayConfig()
+	with pytest.raises(ValidationError):
+		ResponseReplayConfig(har_path='run.har', record=True)
+	config = BrowserContextConfig(response_replay={'har_path': 'run.har'})  # type: ignore
+	assert config.response_replay is not None and not config.response_replay.fallback_to_network
+
+
+def test_store_keeps_each_body_once(tmp_path):
+	store = ResponseStore(tmp_path)
+	store.put('GET https://example.com/a', 'https://example.com/a', 200, {'content-length': '3'}, b'lib')
+	store.put('GET https://example.com/b', 'https://example.com/b', 200, {}, b'lib')
+
+	assert store.get('GET https://example.com/a') == (200, {}, b'lib')
+	assert store.get('GET https://example.com/c') is None
+	assert len(list((tmp_path / 'bodies').iterdir())) == 1
+	assert not list(tmp_path.rglob('*.tmp'))
+
+
+async def test_har_responses_are_replayed_in_order_and_misses_fail_offline(tmp_path):
+	"""
+	Test that the responses of a HAR are served for requests that match them, repeated requests in recorded order,
+	and that requests without a recorded response fail without going to the network.
+	"""
+	har_path = tmp_path / 'run.har'
+	write_har(
+		har_path,
+		[
+			('GET', 'https://example.com/poll?t=1712345678', 200, 'one', None),
+			('GET', 'https://example.com/poll?t=1712349999', 200, 'two', None),
+			('GET', 'https://example.com/logo.png', 200, base64.b64encode(b'\x89PNG').decode(), 'base64'),
+			('GET', 'https://example.com/aborted', 0, '', None),
+		],
+	)
+	replayer = ResponseReplayer(ResponseReplayConfig(har_path=str(har_path)))
+	context = FakeContext()
+	await replayer.start(context)  # type: ignore
+
+	bodies = []
+	for _ in range(3):
+		route = FakeRoute(FakeRequest('https://example.com/poll?t=1712350000'))
+		await context.handler(route)
+		bodies.append(route.outcome[2])  # type: ignore
+	assert bodies == [b'one', b'two', b'two']
+
+	route = FakeRoute(FakeRequest('https://example.com/logo.png'))
+	await context.handler(route)
+	assert route.outcome == (200, {'content-type': 'text/plain'}, b'\x89PNG')
+
+	for url in ['https://example.com/aborted', 'https://example.com/new']:
+		route = FakeRoute(FakeRequest(url))
+		await context.handler(route)
+		assert route.outcome == 'internetdisconnected'
+	assert (replayer.stats.hits, replayer.stats.misses) == (4, 2)
+
+
+async def test_network_responses_are_recorded_for_the_next_run(tmp_path):
+	config = ResponseReplayConfig(store_dir=str(tmp_path), fallback_to_network=True, record=True)
+	recording = ResponseReplayer(config)
+	route = FakeRoute(FakeRequest('https://example.com/form', 'POST', b'name=hat'))
+	await recording._handle(route)  # type: ignore
+	assert route.outcome == (200, {'content-type': 'text/html'}, b'<html>live</html>')
+	assert recording.stats.stores == 1
+
+	replaying = ResponseReplayer(ResponseReplayConfig(store_dir=str(tmp_path)))
+	route = FakeRoute(FakeRequest('https://example.com/form', 'POST', b'name=hat'))
+	await replaying._handle(route)  # type: ignore
+	assert route.outcome == (200, {'content-type': 'text/html'}, b'<html>live</html>')
+
+	# another body is another request
+	route = FakeRoute(FakeRequest('https://example.com/form', 'POST', b'name=scarf'))
+	await replaying._handle(route)  # type: ignore
+	assert route.outcome == 'internetdisconnected'
+
+	passthrough = ResponseReplayer(ResponseReplayConfig(store_dir=str(tmp_path), fallback_to_network=True))
+	route = FakeRoute(FakeRequest('https://example.com/other'))
+	await passthrough._handle(route)  # type: ignore
+	assert route.outcome == 'fallback'
+
+
+async def test_failed_recordings_do_not_leave_the_request_hanging(tmp_path):
+	"""
+	Test that a request whose network fetch fails while recording is aborted, and that a response that cannot be
+	stored is still served.
+	"""
+	config = ResponseReplayConfig(store_dir=str(tmp_path), fallback_to_network=True, record=True)
+	replayer = ResponseReplayer(config)
+	route = FakeRoute(FakeRequest('https://example.com/down'), fetch_error=Exception('net::ERR_CONNECTION_REFUSED'))
+	await replayer._handle(route)  # type: ignore
+	assert route.outcome == 'failed'
+	assert replayer.stats.stores == 0
+
+	def fail_to_store(*args):
+		raise OSError('No space left on device')
+
+	replayer.store.put = fail_to_store  # type: ignore
+	route = FakeRoute(FakeRequest('https://example.com/page'))
+	await replayer._handle(route)  # type: ignore
+	assert route.outcome == (200, {'content-type': 'text/html'}, b'<html>live</html>')
+	assert replayer.stats.stores == 0
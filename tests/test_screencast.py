@@ -0,0 +1,62 @@
+import asyncio
+
+from browser_use.browser.screencast.service import PageScreencast
+
+
+class FakeCDPSession:
+	def __init__(self):
+		self.handlers = {}
+		self.sent = []
+
+	def on(self, event, handler):
+		self.handlers[event] = handler
+
+	def remove_listener(self, event, handler):
+		assert self.handlers.pop(event) == handler
+
+	async def send(self, method, params=None):
+		self.sent.append((method, params))
+		return {}
+
+	def paint(self, data, timestamp, session_id):
+		self.handlers['Page.screencastFrame']({'data': data, 'sessionId': session_id, 'metadata': {'timestamp': timestamp}})
+
+
+async def test_latest_frames_are_kept_and_acknowledged():
+	cdp_session = FakeCDPSession()
+	screencast = PageScreencast(cdp_session, max_frames=2, format='jpeg', quality=60, max_dimension=800)  # type: ignore
+	await screencast.start()
+	assert cdp_session.sent == [
+		('Page.startScreencast', {'format': 'jpeg', 'everyNthFrame': 1, 'quality': 60, 'maxWidth': 800, 'maxHeight': 800})
+	]
+
+	for session_id, timestamp in enumerate([100.0, 101.0, 102.0]):
+		cdp_session.paint(f'frame-{session_id}', timestamp, session_id)
+	await asyncio.sleep(0)
+
+	assert [frame.data for frame in screencast.frames] == ['frame-1', 'frame-2']
+	assert [params for method, params in cdp_session.sent if method == 'Page.screencastFrameAck'] == [
+		{'sessionId': 0},
+		{'sessionId': 1},
+		{'sessionId': 2},
+	]
+
+	await screencast.stop()
+	assert cdp_session.sent[-1] == ('Page.stopScreencast', None)
+	assert not cdp_session.handlers
+
+
+async def test_frames_older_than_the_last_change_are_stale():
+	cdp_session = FakeCDPSession()
+	screencast = PageScreencast(cdp_session)  # type: ignore
+	await screencast.start()
+	assert screencast.frame_since(100.0) is None
+
+	cdp_session.paint('frame', 101.5, 1)
+	frame = screencast.frame_since(101.0)
+	assert frame is not None and frame.data == 'frame'
+	assert screencast.frame_since(102.0) is None
+
+	cdp_session.handlers['Page.screencastFrame']({'data': 'untimed', 'sessionId': 2, 'metadata': {}})
+	assert screencast.frame_since(0) is None
+	await asyncio.sleep(0)
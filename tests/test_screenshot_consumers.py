@@ -0,0 +1,24 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from browser_use.agent.service import Agent
+
+
+def make_agent(**kwargs) -> Agent:
+	return Agent(task='Find the opening hours', llm=FakeListChatModel(responses=['{}']), enable_memory=False, **kwargs)
+
+
+@pytest.mark.parametrize(
+	'kwargs, needs_screenshots',
+	[
+		({}, True),
+		({'use_vision': False}, False),
+		({'use_vision': False, 'generate_gif': True}, True),
+		({'use_vision': False, 'planner_llm': FakeListChatModel(responses=['{}']), 'use_vision_for_planner': True}, True),
+		({'use_vision': False, 'register_new_step_callback': lambda state, model_output, step: None}, True),
+		({'use_vision': False, 'capture_screenshots': True}, True),
+		({'use_vision': True, 'capture_screenshots': False}, False),
+	],
+)
+def test_screenshots_are_only_captured_for_a_consumer(kwargs, needs_screenshots):
+	assert make_agent(**kwargs)._needs_screenshots() is needs_screenshots
@@ -0,0 +1,162 @@
+import asyncio
+
+from browser_use.browser.tab_registry.service import TabRegistry, target_title
+
+
+class Emitter:
+	def __init__(self):
+		self.handlers: dict[str, list] = {}
+
+	def on(self, event, handler):
+		self.handlers.setdefault(event, []).append(handler)
+
+	def remove_listener(self, event, handler):
+		self.handlers[event].remove(handler)
+
+	def emit(self, event, *args):
+		for handler in list(self.handlers.get(event, [])):
+			handler(*args)
+
+
+class FakeFrame:
+	def __init__(self, url, parent_frame=None):
+		self.url = url
+		self.parent_frame = parent_frame
+
+
+class FakePage(Emitter):
+	def __init__(self, context, target_id, url, title=''):
+		super().__init__()
+		self.context = context
+		self.target_id = target_id
+		self.url = url
+		self.document_title = title
+		self.title_calls = 0
+
+	async def title(self):
+		self.title_calls += 1
+		return self.document_title
+
+	def navigate(self, url, title):
+		self.url, self.document_title = url, title
+		self.emit('framenavigated', FakeFrame(url))
+		self.emit('domcontentloaded', self)
+		self.context.target_info_changed(self)
+
+	def close(self):
+		self.context.pages.remove(self)
+		self.emit('close', self)
+
+
+class FakeCDPSession(Emitter):
+	def __init__(self, page=None):
+		super().__init__()
+		self.page = page
+
+	async def send(self, method, params=None):
+		if method == 'Target.getTargetInfo':
+			return {'targetInfo': target_info(self.page)}
+		return {}
+
+	async def detach(self):
+		pass
+
+
+class FakeBrowser:
+	def __init__(self, cdp_available):
+		self.cdp_available = cdp_available
+		self.session = FakeCDPSession()
+
+	async def new_browser_cdp_session(self):
+		if not self.cdp_available:
+			raise Exception('CDP sessions are only supported on Chromium')
+		return self.session
+
+
+class FakeContext(Emitter):
+	def __init__(self, cdp_available=True):
+		super().__init__()
+		self.browser = FakeBrowser(cdp_available)
+		self.pages = []
+
+	async def new_cdp_session(self, page):
+		return FakeCDPSession(page)
+
+	def open(self, url, title='', target_id=None):
+		page = FakePage(self, target_id or f'target-{len(self.pages)}', url, title)
+		self.pages.append(page)
+		self.emit('page', page)
+		return page
+
+	def target_info_changed(self, page):
+		self.browser.session.emit('Target.targetInfoChanged', {'targetInfo': target_info(page)})
+
+
+def target_info(page):
+	# Chrome reports the URL as title of pages without one
+	return {'targetId': page.target_id, 'type': 'page', 'url': page.url, 'title': page.document_title or page.url}
+
+
+async def settle():
+	for _ in range(3):
+		await asyncio.sleep(0)
+
+
+async def test_tabs_are_listed_from_events_without_reading_titles():
+	"""
+	Test that tabs opened before and after the registry started are listed in opening order,
+	with the titles reported by the CDP target events, and that closed tabs are dropped.
+	"""
+	context = FakeContext()
+	first = context.open('https://example.com/', 'Example')
+	registry = TabRegistry(context)  # type: ignore
+	await registry.start()
+	second = context.open('https://example.org/search', 'Search')
+	await settle()
+
+	tabs = await registry.get_tabs_info()
+	assert [(tab.page_id, tab.url, tab.title) for tab in tabs] == [
+		(0, 'https://example.com/', 'Example'),
+		(1, 'https://example.org/search', 'Search'),
+	]
+
+	second.navigate('https://example.org/results?q=hats', 'Results')
+	first.document_title = 'Example, updated without a navigation'
+	context.target_info_changed(first)
+	tabs = await registry.get_tabs_info()
+	assert [(tab.url, tab.title) for tab in tabs] == [
+		('https://example.com/', 'Example, updated without a navigation'),
+		('https://example.org/results?q=hats', 'Results'),
+	]
+	assert first.title_calls == second.title_calls == 0
+	assert registry.target_id(second) == 'target-1'
+
+	first.close()
+	assert first not in registry and second in registry
+	assert registry.pages == [second]
+	assert [tab.title for tab in await registry.get_tabs_info()] == ['Results']
+
+	await registry.close()
+	context.open('https://example.net/')
+	assert len(registry) == 1
+
+
+async def test_titles_are_read_once_per_navigation_without_cdp():
+	context = FakeContext(cdp_available=False)
+	page = context.open('https://example.com/', 'Example')
+	registry = TabRegistry(context)  # type: ignore
+	await registry.start()
+
+	for _ in range(3):
+		assert [tab.title for tab in await registry.get_tabs_info()] == ['Example']
+	assert page.title_calls == 1
+
+	page.navigate('https://example.com/about', 'About')
+	assert [tab.title for tab in await registry.get_tabs_info()] == ['About']
+	assert page.title_calls == 2
+
+
+def test_untitled_targets_have_an_empty_title():
+	assert target_title({'url': 'https://example.com/a', 'title': 'https://example.com/a'}) == ''
+	assert target_title({'url': 'https://example.com/a', 'title': 'example.com/a'}) == ''
+	assert target_title({'url': 'https://example.com/a', 'title': 'A'}) == 'A'
@@ -0,0 +1,196 @@
+import os
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from browser_use.agent.service import Agent
+from browser_use.agent.trajectory_cache.service import TrajectoryCache, normalize_url_pattern
+from browser_use.agent.views import ActionResult, AgentBrain
+from browser_use.browser.views import BrowserState
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+TASK = 'Add the wool hat to the cart'
+
+
+def page(products: list[str]) -> BrowserState:
+	"""A list of products with an add-to-cart button each, the buttons are highlighted"""
+	body = DOMElementNode(
+		tag_name='body', text_content='', xpath='/body', attributes={}, children=[], is_visible=True, parent=None
+	)
+	selector_map = {}
+	for position, name in enumerate(products, start=1):
+		button = DOMElementNode(
+			tag_name='button',
+			text_content=None,
+			xpath=f'html/body/button[{position}]',
+			attributes={'type': 'button', 'aria-label': f'Add {name}'},
+			children=[],
+			is_visible=True,
+			highlight_index=position * 2,
+			parent=body,
+		)
+		button.children.append(DOMTextNode(text='Add to cart', is_visible=True, parent=button))
+		body.children.append(button)
+		selector_map[button.highlight_index] = button
+	return BrowserState(
+		element_tree=body, selector_map=selector_map, url='https://shop.example.com/c/1234/hats?page=2', title='', tabs=[]
+	)
+
+
+def store(cache: TrajectoryCache, key: str, size: int = 0) -> None:
+	cache.put(key, TASK, 'https://shop.example.com/', {'padding': 'x' * size}, [])
+
+
+def test_url_patterns_drop_ids_and_query_values():
+	assert (
+		normalize_url_pattern('https://Shop.example.com/orders/12345/items?b=2&a=1#top')
+		== 'https://shop.example.com/orders/:id/items?a&b'
+	)
+	assert normalize_url_pattern('https://example.com/u/3f2b8c9e-1d2a-4c5b-9e8f-0a1b2c3d4e5f') == 'https://example.com/u/:id'
+	assert normalize_url_pattern('https://example.com/products/wool-hat') == 'https://example.com/products/wool-hat'
+
+
+def test_keys_ignore_element_indices_and_list_length():
+	"""
+	Test that the key of a state does not depend on the indices of the previous actions, on how many items a list has
+	or on the task, but does depend on the parameters of the previous actions, and on the task when scoped to it.
+	"""
+	short_page, long_page = page(['Wool hat', 'Rain hat']), page(['Wool hat', 'Rain hat', 'Sun hat'])
+	long_page.url = 'https://shop.example.com/c/98765/hats?page=3'
+
+	key = TrajectoryCache.make_key(short_page.url, short_page.selector_map, [{'click_element_by_index': {'index': 4}}])
+	assert key == TrajectoryCache.make_key(long_page.url, short_page.selector_map, [{'click_element_by_index': {'index': 9}}])
+	assert TrajectoryCache.make_key(short_page.url, short_page.selector_map, [{'input_text': {'index': 1, 'text': 'hat'}}]) != (
+		TrajectoryCache.make_key(short_page.url, short_page.selector_map, [{'input_text': {'index': 1, 'text': 'scarf'}}])
+	)
+
+	scoped_key = TrajectoryCache.make_key(short_page.url, short_page.selector_map, [], task=TASK)
+	assert scoped_key == TrajectoryCache.make_key(short_page.url, short_page.selector_map, [], task=f'  {TASK} ')
+	assert scoped_key != TrajectoryCache.make_key(
+		short_page.url, short_page.selector_map, [], task='Add the rain hat to the cart'
+	)
+	assert scoped_key != TrajectoryCache.make_key(short_page.url, short_page.selector_map, [])
+
+
+def test_entries_persist_and_are_counted(tmp_path):
+	cache = TrajectoryCache(tmp_path)
+	assert cache.get('a') is None
+	store(cache, 'a')
+
+	reopened = TrajectoryCache(tmp_path)
+	entry = reopened.get('a')
+	assert entry is not None and entry.task == TASK and entry.url_pattern == 'https://shop.example.com/'
+	assert (cache.stats.misses, cache.stats.stores) == (1, 1)
+	assert (reopened.stats.hits, reopened.stats.misses) == (1, 0)
+	assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+	"""
+	Test that the cache keeps at most max_entries and max_bytes, and that reading an entry keeps it,
+	also for the next process using the directory.
+	"""
+	cache = TrajectoryCache(tmp_path, max_entries=3)
+	for key in 'abc':
+		store(cache, key)
+		os.utime(tmp_path / f'{key}.json', (0, {'a': 1, 'b': 2, 'c': 3}[key]))
+	assert cache.get('a') is not None
+
+	store(cache, 'd')
+	assert len(cache) == 3 and cache.stats.evictions == 1
+	assert cache.get('b') is None and cache.get('a') is not None
+
+	# the order of use: c, d, a
+	for mtime, key in enumerate('cda', start=10):
+		os.utime(tmp_path / f'{key}.json', (0, mtime))
+	reopened = TrajectoryCache(tmp_path, max_entries=2)
+	store(reopened, 'e')
+	assert sorted(path.stem for path in tmp_path.glob('*.json')) == ['a', 'e']
+
+	size_limited = TrajectoryCache(tmp_path / 'small', max_bytes=3000)
+	for key in 'xyz':
+		store(size_limited, key, size=1000)
+	assert len(size_limited) == 2 and size_limited.get('x') is None
+
+
+@pytest.fixture
+def agent_factory(tmp_path):
+	def make_agent(task: str = TASK, scope_to_task: bool = True) -> Agent:
+		return Agent(
+			task=task,
+			llm=FakeListChatModel(responses=['{}']),
+			enable_memory=False,
+			trajectory_cache=TrajectoryCache(tmp_path, scope_to_task=scope_to_task),
+		)
+
+	return make_agent
+
+
+async def test_agent_replays_cached_actions_on_the_current_page(agent_factory):
+	"""
+	Test that a successful step of one run is replayed in the next run, with the index of the element on the new page,
+	and that failed steps and final answers are not cached.
+	"""
+	recorded_page = page(['Rain hat', 'Wool hat'])
+	agent = agent_factory()
+	key = agent._get_trajectory_key(recorded_page)
+	model_output = agent.AgentOutput(
+		current_state=AgentBrain(evaluation_previous_goal='', memory='', next_goal='add the hat'),
+		action=[agent.ActionModel(click_element_by_index={'index': 4})],  # type: ignore
+	)
+	agent._store_trajectory(key, recorded_page, model_output, [ActionResult(error='not clickable')])
+	assert agent.trajectory_cache.stats.stores == 0  # type: ignore
+	agent._store_trajectory(key, recorded_page, model_output, [ActionResult()])
+
+	# the next run sees the list with one more item, the wool hat button moved to index 6
+	next_agent = agent_factory()
+	current_page = page(['Sun hat', 'Rain hat', 'Wool hat'])
+	cached = await next_agent._get_cached_model_output(next_agent._get_trajectory_key(current_page), current_page)
+	assert cached is not None
+	assert cached.action[0].get_index() == 6
+	assert next_agent.trajectory_cache.stats.hits == 1  # type: ignore
+
+	# without the wool hat the cached step cannot be used
+	other_page = page(['Sun hat', 'Rain hat'])
+	assert await next_agent._get_cached_model_output(key, other_page) is None
+	assert next_agent.trajectory_cache.stats.rejections == 1  # type: ignore
+
+	done_output = agent.AgentOutput(
+		current_state=AgentBrain(evaluation_previous_goal='', memory='', next_goal='finish'),
+		action=[agent.ActionModel(done={'text': 'added', 'success': True})],  # type: ignore
+	)
+	agent._store_trajectory('done', recorded_page, done_output, [ActionResult(is_done=True)])
+	assert agent.trajectory_cache.stats.stores == 1  # type: ignore
+
+
+async def test_steps_of_other_tasks_are_only_replayed_when_task_independent(agent_factory):
+	"""
+	Test that entries are scoped to the task by default, and that without the scope a step of another task is only
+	replayed when its actions neither target an element nor carry text.
+	"""
+	current_page = page(['Rain hat', 'Wool hat'])
+	agent = agent_factory()
+	click = agent.AgentOutput(
+		current_state=AgentBrain(evaluation_previous_goal='', memory='', next_goal='add the hat'),
+		action=[agent.ActionModel(click_element_by_index={'index': 4})],  # type: ignore
+	)
+	agent._store_trajectory(agent._get_trajectory_key(current_page), current_page, click, [ActionResult()])
+	other_task = 'Add the rain hat to the cart'
+	assert agent_factory(other_task)._get_trajectory_key(current_page) != agent._get_trajectory_key(current_page)
+
+	unscoped = agent_factory(scope_to_task=False)
+	unscoped._store_trajectory(unscoped._get_trajectory_key(current_page), current_page, click, [ActionResult()])
+	other_agent = agent_factory(other_task, scope_to_task=False)
+	key = other_agent._get_trajectory_key(current_page)
+	assert await other_agent._get_cached_model_output(key, current_page) is None
+	assert other_agent.trajectory_cache.stats.rejections == 1  # type: ignore
+	# the task that recorded it still replays it
+	assert await unscoped._get_cached_model_output(key, current_page) is not None
+
+	scroll = agent.AgentOutput(
+		current_state=AgentBrain(evaluation_previous_goal='', memory='', next_goal='see more hats'),
+		action=[agent.ActionModel(scroll_down={'amount': 500})],  # type: ignore
+	)
+	unscoped._store_trajectory(key, current_page, scroll, [ActionResult()])
+	cached = await other_agent._get_cached_model_output(key, current_page)
+	assert cached is not None and cached.action[0].model_dump(exclude_unset=True) == {'scroll_down': {'amount': 500}}